@@ -1,12 +1,10 @@
 """Utility to initialize the SQLite database schema."""
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from models.artwork import Base, Artwork
-
-DB_URL = 'sqlite:///app.db'
+from models.engine import DB_URL, sqlite_engine
 
 def init_db(url: str = DB_URL):
-    engine = create_engine(url)
+    engine = sqlite_engine(url)
     Base.metadata.create_all(engine)
     Session = sessionmaker(bind=engine)
     # Uncomment the lines below to add a sample entry
@@ -48,6 +48,7 @@ from routes.openai_guidance import bp as openai_guidance_bp
 from auth import bp as auth_bp
 from routes.legal_routes import bp as info_bp
 import no_cache_toggle
+from routes import session_tracker
 from routes.session_tracker import is_active as session_is_active
 import login_bypass_toggle as login_bypass
 
@@ -73,11 +74,23 @@ if not app.config["SQLALCHEMY_DATABASE_URI"]:
     app.config["SQLALCHEMY_DATABASE_URI"] = cfg.SQLALCHEMY_DATABASE_URI
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+# ==== Worker Processes ====
+# Pool workers are forked from a separate single-threaded fork server, never
+# from this (threaded) web process. Run directly, this script would be
+# re-imported by every worker, so pools stay off.
+from utils import worker_pool
+worker_pool.start(enabled=__name__ != "__main__")
+
+from utils import db_engine
+db_engine.init_app(app)
 db.init_app(app)
 migrate = Migrate(app, db)
 
 with app.app_context():
+    db_engine.configure(db.engine)
     db.create_all()
+    db_engine.ensure_indexes(db.engine, db.metadata)
+session_tracker.init_app(app)
 
 # ==== Version Check ====
 def check_versions() -> None:
@@ -117,6 +130,11 @@ logging.basicConfig(
 from utils.db_logger import setup_logging
 setup_logging(app)
 
+# ==== Background Analysis Queue ====
+from utils import job_queue, content_index, metrics_rollup, log_retention  # noqa: F401
+job_queue.init_app(app)
+metrics_rollup.init_app(app)
+
 # ==== Blueprint Registration ====
 for bp in [
     artwork_bp, admin_bp, admin_routes_bp,
@@ -31,6 +31,15 @@ if not SQLALCHEMY_DATABASE_URI:
     DATA_DIR.mkdir(parents=True, exist_ok=True)
     SQLALCHEMY_DATABASE_URI = f"sqlite:///{(DATA_DIR / 'app.db').as_posix()}"
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+# SQLite engines (see utils/db_engine.py) run in WAL mode with these settings
+# so concurrent gunicorn workers wait for the write lock instead of failing
+# with "database is locked". DB_POOL_* size each process's connection pool.
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "64"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_POOL_OVERFLOW = int(os.getenv("DB_POOL_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
 
 # --- Input/Output Folders ---------------------------------------------------
 ARTWORKS_INPUT_DIR = Path(
@@ -60,6 +69,7 @@ OPENAI_PROMPT_LOG_DIR = Path(
 OPENAI_RESPONSE_LOG_DIR = Path(
     os.getenv("OPENAI_RESPONSE_LOG_DIR", LOGS_DIR / "openai_responses")
 )
+LOG_ARCHIVE_DIR = Path(os.getenv("LOG_ARCHIVE_DIR", LOGS_DIR / "archive"))
 GIT_LOG_DIR = Path(os.getenv("GIT_LOG_DIR", BASE_DIR / "git-update-push-logs"))
 SCRIPTS_DIR = Path(os.getenv("SCRIPTS_DIR", BASE_DIR / "scripts"))
 SIGNATURES_DIR = Path(os.getenv("SIGNATURES_DIR", BASE_DIR / "inputs" / "signatures"))
@@ -118,6 +128,37 @@ ALLOWED_EXTENSIONS = set(os.getenv("ALLOWED_EXTENSIONS", "jpg,jpeg,png").split("
 MAX_UPLOAD_SIZE_MB = int(os.getenv("MAX_UPLOAD_SIZE_MB", "32"))
 ANALYSE_MAX_DIM = int(os.getenv("ANALYSE_MAX_DIM", "2400"))
 ANALYSE_MAX_MB = int(os.getenv("ANALYSE_MAX_MB", "1"))
+# Uploads are streamed to disk in chunks of this many bytes.
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+# Resumable chunked uploads: session folders, chunk size and idle expiry.
+UPLOAD_SESSIONS_DIR = Path(
+    os.getenv("UPLOAD_SESSIONS_DIR", UPLOADS_TEMP_DIR / "sessions")
+)
+UPLOAD_SESSION_CHUNK_MB = float(os.getenv("UPLOAD_SESSION_CHUNK_MB", "4"))
+UPLOAD_SESSION_TTL_SECONDS = int(os.getenv("UPLOAD_SESSION_TTL_SECONDS", "86400"))
+# Open (incomplete) upload sessions allowed per user; each preallocates its
+# full file size on disk until it completes or expires.
+UPLOAD_SESSIONS_PER_USER = int(os.getenv("UPLOAD_SESSIONS_PER_USER", "20"))
+# Duplicate uploads: "reject" byte-identical repeats before QC, "flag" them
+# in the upload result only, or "off". Near duplicates (pHash within
+# UPLOAD_SIMILAR_MAX_DISTANCE bits, at most 7) are always just flagged.
+# Deleting an artwork forgets its fingerprint. Library folders without one
+# are fingerprinted every CONTENT_BACKFILL_INTERVAL_HOURS.
+UPLOAD_DEDUP_MODE = os.getenv("UPLOAD_DEDUP_MODE", "reject").lower()
+UPLOAD_SIMILAR_MAX_DISTANCE = int(os.getenv("UPLOAD_SIMILAR_MAX_DISTANCE", "6"))
+CONTENT_BACKFILL_INTERVAL_HOURS = float(
+    os.getenv("CONTENT_BACKFILL_INTERVAL_HOURS", "24")
+)
+# Visual similarity search: on-disk snapshot of the pHash/histogram arrays
+# and how often the similarity-refresh job rebuilds it from content_hashes.
+SIMILARITY_INDEX_PATH = Path(
+    os.getenv("SIMILARITY_INDEX_PATH", DATA_DIR / "similarity_index.npz")
+)
+SIMILARITY_REFRESH_SECONDS = float(os.getenv("SIMILARITY_REFRESH_SECONDS", "300"))
+# Files of one multi-file upload processed in parallel.
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "4"))
+# Threads writing THUMB/ANALYSE/QC derivatives concurrently (shared per process).
+DERIVATIVE_WRITERS = int(os.getenv("DERIVATIVE_WRITERS", "4"))
 
 # --- Image Dimensions -------------------------------------------------------
 THUMB_WIDTH = int(os.getenv("THUMB_WIDTH", "400"))
@@ -150,12 +191,75 @@ SIGNATURE_MARGIN_PERCENTAGE = float(os.getenv("SIGNATURE_MARGIN_PERCENTAGE", "0.
 SKU_TRACKER = Path(
     os.getenv("SKU_TRACKER_PATH", BASE_DIR / "settings" / "sku_tracker.json")
 )
+# SKUs each worker process reserves from the tracker at a time. 1 keeps SKUs
+# strictly sequential; larger blocks mean fewer tracker writes but a crashed
+# worker can leave gaps of up to one block, which validate_all_skus then
+# tolerates.
+SKU_LEASE_SIZE = int(os.getenv("SKU_LEASE_SIZE", "1"))
 
-# File used by the web UI to report progress of analysis jobs
-ANALYSIS_STATUS_FILE = Path(
-    os.getenv("ANALYSIS_STATUS_FILE", LOGS_DIR / "analysis_status.json")
+# Background analysis queue. Each web process runs ANALYSIS_WORKERS threads
+# but at most ANALYSIS_MAX_CONCURRENT jobs run at once across all processes.
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "1"))
+ANALYSIS_MAX_CONCURRENT = int(os.getenv("ANALYSIS_MAX_CONCURRENT", "2"))
+ANALYSIS_JOB_POLL_SECONDS = float(os.getenv("ANALYSIS_JOB_POLL_SECONDS", "2"))
+ANALYSIS_JOB_STALE_SECONDS = int(os.getenv("ANALYSIS_JOB_STALE_SECONDS", "1200"))
+# Job status updates. Plain sync gunicorn workers answer status requests at
+# once and clients poll every ANALYSIS_STATUS_POLL_SECONDS. Async
+# (gevent/eventlet) or threaded workers may instead hold a long-poll (?wait=)
+# for up to ANALYSIS_STATUS_MAX_WAIT seconds. Server-sent events hold a worker
+# for the whole job, so "auto" offers them only under an async worker;
+# "true"/"false" force them on or off.
+ANALYSIS_STATUS_POLL_SECONDS = float(os.getenv("ANALYSIS_STATUS_POLL_SECONDS", "2"))
+ANALYSIS_STATUS_MAX_WAIT = float(os.getenv("ANALYSIS_STATUS_MAX_WAIT", "20"))
+ANALYSIS_STATUS_SSE = os.getenv("ANALYSIS_STATUS_SSE", "auto").lower()
+
+# Run analyze/generate scripts in warm worker processes (utils/worker_pool.py)
+# instead of spawning a new interpreter per artwork. Each run gets its own
+# worker, so concurrency follows ANALYSIS_MAX_CONCURRENT. Set to false to
+# always use subprocesses.
+ANALYSIS_ENGINE_IN_PROCESS = (
+    os.getenv("ANALYSIS_ENGINE_IN_PROCESS", "true").lower() == "true"
 )
 
+# Mockup composites for one listing render in parallel across this many
+# processes; the artwork is decoded once and shared with them read-only.
+COMPOSITE_WORKERS = int(os.getenv("COMPOSITE_WORKERS", str(os.cpu_count() or 1)))
+COMPOSITE_JPEG_QUALITY = int(os.getenv("COMPOSITE_JPEG_QUALITY", "85"))
+# Decoded mockup templates and corner files kept in memory (MB) per web
+# worker. The budget is split evenly between the worker and its
+# COMPOSITE_WORKERS pool processes, each of which holds its own cache, so a
+# host uses up to (gunicorn workers x MOCKUP_CACHE_MB) in total.
+MOCKUP_CACHE_MB = float(os.getenv("MOCKUP_CACHE_MB", "256"))
+
+# Database log handler: rows are buffered and inserted in batches of
+# DB_LOG_BATCH_SIZE or every DB_LOG_FLUSH_MS. Past DB_LOG_HIGH_WATER of
+# DB_LOG_QUEUE_MAX buffered rows, DEBUG/INFO records are dropped first.
+DB_LOG_BATCH_SIZE = int(os.getenv("DB_LOG_BATCH_SIZE", "100"))
+DB_LOG_FLUSH_MS = int(os.getenv("DB_LOG_FLUSH_MS", "500"))
+DB_LOG_QUEUE_MAX = int(os.getenv("DB_LOG_QUEUE_MAX", "10000"))
+DB_LOG_HIGH_WATER = float(os.getenv("DB_LOG_HIGH_WATER", "0.8"))
+# log_entries rows older than LOG_RETENTION_DAYS are moved into gzipped
+# daily JSONL files under LOG_ARCHIVE_DIR by a job queued every
+# LOG_RETENTION_INTERVAL_HOURS. The admin log viewer pages LOG_PAGE_SIZE rows.
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "30"))
+LOG_RETENTION_INTERVAL_HOURS = float(os.getenv("LOG_RETENTION_INTERVAL_HOURS", "24"))
+LOG_PAGE_SIZE = int(os.getenv("LOG_PAGE_SIZE", "200"))
+
+# Seconds each worker trusts a cached "session is active" answer before
+# re-checking the user_sessions table. Revocations made in the same worker
+# apply immediately; other workers see them within this window.
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "5"))
+
+# Listing JSON writes (utils/listing_store.py). Compact output drops the
+# indentation, which makes large listings smaller and faster to rewrite.
+# Per-listing flock files live in LISTING_LOCK_DIR.
+LISTING_JSON_COMPACT = os.getenv("LISTING_JSON_COMPACT", "false").lower() == "true"
+LISTING_LOCK_DIR = Path(os.getenv("LISTING_LOCK_DIR", DATA_DIR / "listing-locks"))
+
+# Seconds the "latest analysed listing" shown in menus is cached between
+# rescans. Analysis and edit paths refresh it immediately when they write.
+LATEST_LISTING_TTL = float(os.getenv("LATEST_LISTING_TTL", "30"))
+
 # Feature flags --------------------------------------------------------------
 # Toggle visibility of Upgrade/Subscription links in the UI. Set the
 # environment variable ``ENABLE_UPGRADE`` to ``true`` to enable.
@@ -220,7 +324,10 @@ for folder in [
     SIGNED_OUTPUT_DIR,
     SELLBRITE_OUTPUT_DIR,
     UPLOADS_TEMP_DIR,
+    UPLOAD_SESSIONS_DIR,
+    LOG_ARCHIVE_DIR,
     DATA_DIR,
+    LISTING_LOCK_DIR,
     AIGW_PROMPTS_DIR,
 ]:
     try:
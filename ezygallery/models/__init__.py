@@ -13,6 +13,10 @@ db = SQLAlchemy()
 
 from .upload_event import UploadEvent  # noqa: E402  -- model registration
 from .log_entry import LogEntry  # noqa: E402  -- model registration
+from .analysis_job import AnalysisJob  # noqa: E402  -- model registration
+from .content_hash import ContentHash, PHashBand  # noqa: E402  -- model registration
+from .metric_rollup import MetricRollup  # noqa: E402  -- model registration
+from .user_session import UserSession  # noqa: E402  -- model registration
 
-__all__ = ["db", "UploadEvent", "LogEntry"]
+__all__ = ["db", "UploadEvent", "LogEntry", "AnalysisJob", "ContentHash", "PHashBand", "MetricRollup", "UserSession"]
 
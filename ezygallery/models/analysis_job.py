@@ -0,0 +1,58 @@
+"""SQLAlchemy model for queued artwork analysis jobs."""
+
+from __future__ import annotations
+
+import datetime as _dt
+import json
+
+from . import db
+
+
+class AnalysisJob(db.Model):
+    """A unit of out-of-band analysis work claimed by the job queue workers."""
+
+    __tablename__ = "analysis_jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default="{}")
+    status = db.Column(db.String(20), nullable=False, default="queued", index=True)
+    step = db.Column(db.String(50), nullable=False, default="queued")
+    percent = db.Column(db.Integer, nullable=False, default=0)
+    file = db.Column(db.String, nullable=True)
+    result = db.Column(db.Text, nullable=True)
+    error_msg = db.Column(db.Text, nullable=True)
+    user_id = db.Column(db.String, nullable=True)
+    upload_id = db.Column(db.String, nullable=True)
+    created_at = db.Column(
+        db.DateTime(timezone=True), default=_dt.datetime.utcnow, nullable=False
+    )
+    started_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    finished_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    updated_at = db.Column(
+        db.DateTime(timezone=True), default=_dt.datetime.utcnow, nullable=False
+    )
+
+    def payload_dict(self) -> dict:
+        """Return the decoded job payload."""
+
+        return json.loads(self.payload or "{}")
+
+    def result_dict(self) -> dict:
+        """Return the decoded job result, or an empty dict."""
+
+        return json.loads(self.result) if self.result else {}
+
+    def to_status(self) -> dict:
+        """Return the JSON shape served by ``/status/analyze``."""
+
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "step": self.step,
+            "percent": self.percent,
+            "file": self.file,
+            "error": self.error_msg,
+            "result": self.result_dict(),
+        }
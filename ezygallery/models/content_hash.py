@@ -0,0 +1,64 @@
+"""SQLAlchemy model for content fingerprints of uploads and library artworks."""
+
+from __future__ import annotations
+
+import datetime as _dt
+
+from . import db
+
+
+class ContentHash(db.Model):
+    """SHA-256 and perceptual hashes of one uploaded or catalogued image.
+
+    ``dhash``/``phash`` hold 64-bit hashes mapped to signed integers (see
+    :func:`utils.image_hash.to_signed`). ``seo_folder`` is filled in once the
+    upload has been analysed into a listing, or directly for library rows.
+    """
+
+    __tablename__ = "content_hashes"
+
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False, index=True)
+    dhash = db.Column(db.Integer, nullable=False)
+    phash = db.Column(db.Integer, nullable=False)
+    upload_id = db.Column(db.String, nullable=True, index=True)
+    seo_folder = db.Column(db.String, nullable=True, index=True)
+    filename = db.Column(db.String, nullable=True)
+    created_at = db.Column(
+        db.DateTime(timezone=True), default=_dt.datetime.utcnow, nullable=False
+    )
+
+    def describe(self) -> dict:
+        """Return the fields shown to users when this row matches an upload."""
+
+        return {
+            "upload_id": self.upload_id,
+            "seo_folder": self.seo_folder,
+            "filename": self.filename,
+        }
+
+
+class PHashBand(db.Model):
+    """One 8-bit slice of a :class:`ContentHash` pHash, for near-match lookups.
+
+    Two pHashes within 7 bits of each other agree exactly on at least one of
+    their eight bytes, so the ``(band, value)`` index narrows a near-duplicate
+    search to the rows sharing a byte with the probe.
+    """
+
+    __tablename__ = "content_hash_bands"
+
+    content_hash_id = db.Column(
+        db.Integer,
+        db.ForeignKey("content_hashes.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    band = db.Column(db.SmallInteger, primary_key=True)
+    value = db.Column(db.SmallInteger, nullable=False)
+
+    content_hash = db.relationship(
+        ContentHash,
+        backref=db.backref("bands", cascade="all, delete-orphan", passive_deletes=True),
+    )
+
+    __table_args__ = (db.Index("ix_content_hash_bands_band_value", "band", "value", "content_hash_id"),)
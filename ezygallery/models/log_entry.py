@@ -10,6 +10,11 @@ class LogEntry(db.Model):
     """Record of an event or error for admin visibility."""
 
     __tablename__ = "log_entries"
+    __table_args__ = (
+        db.Index("ix_log_entries_timestamp", "timestamp"),
+        db.Index("ix_log_entries_level_timestamp", "level", "timestamp"),
+        db.Index("ix_log_entries_user_id_timestamp", "user_id", "timestamp"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     timestamp = db.Column(db.DateTime(timezone=True), default=_dt.datetime.utcnow, nullable=False)
@@ -0,0 +1,22 @@
+"""SQLAlchemy model for pre-aggregated upload/analysis timing histograms."""
+
+from __future__ import annotations
+
+from . import db
+
+
+class MetricRollup(db.Model):
+    """Count and total duration of one metric, per hour and duration bin.
+
+    ``bin`` is a log-scale duration bucket (see :mod:`utils.metrics_rollup`),
+    so any time window's percentiles can be read from a few hundred rows no
+    matter how many ``UploadEvent`` rows the window covers.
+    """
+
+    __tablename__ = "metric_rollups"
+
+    metric = db.Column(db.String(20), primary_key=True)
+    bucket = db.Column(db.DateTime(timezone=True), primary_key=True)
+    bin = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total_ms = db.Column(db.Float, nullable=False, default=0.0)
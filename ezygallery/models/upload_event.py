@@ -31,7 +31,10 @@ class UploadEvent(db.Model):
     user_agent = db.Column(db.String, nullable=True)
 
     created_at = db.Column(
-        db.DateTime(timezone=True), default=_dt.datetime.utcnow, nullable=False
+        db.DateTime(timezone=True),
+        default=_dt.datetime.utcnow,
+        nullable=False,
+        index=True,
     )
 
     def upload_duration_ms(self) -> float | None:
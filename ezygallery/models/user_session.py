@@ -0,0 +1,23 @@
+"""SQLAlchemy model for the registry of signed-in user sessions."""
+
+from __future__ import annotations
+
+import datetime as _dt
+
+from . import db
+
+
+class UserSession(db.Model):
+    """One active login token for a user (see :mod:`routes.session_tracker`)."""
+
+    __tablename__ = "user_sessions"
+    __table_args__ = (
+        db.UniqueConstraint("username", "session_id", name="uq_user_sessions_username_session_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String, nullable=False)
+    session_id = db.Column(db.String, nullable=False)
+    created_at = db.Column(
+        db.DateTime(timezone=True), default=_dt.datetime.utcnow, nullable=False
+    )
@@ -202,18 +202,61 @@ def login_disabled():
     return render_template('admin/login-disabled.html', menu=utils.get_menu())
 
 
+@bp.route('/jobs')
+def active_jobs():
+    """Return every queued and running background job as JSON."""
+    if session.get('user') != ADMIN_USER:
+        abort(403)
+    from utils import job_queue
+    return jsonify({"jobs": [job.to_status() for job in job_queue.all_active_jobs()]})
+
+
 @bp.route('/logs')
 def view_logs():
-    """Display log entries with basic filtering."""
+    """Display log entries with basic filtering, newest first.
+
+    Pages are keyset-paginated on ``(timestamp, id)``: ``before_ts`` and
+    ``before_id`` name the last row of the previous page, so every page is an
+    index range scan no matter how deep the admin pages.
+    """
     if session.get('user') != ADMIN_USER:
         abort(403)
+    from datetime import datetime
+    from sqlalchemy import tuple_
     from models import LogEntry
+    from config import LOG_PAGE_SIZE
     level = request.args.get('level')
     user = request.args.get('user')
-    query = LogEntry.query.order_by(LogEntry.timestamp.desc())
+    query = LogEntry.query.order_by(LogEntry.timestamp.desc(), LogEntry.id.desc())
     if level:
         query = query.filter_by(level=level)
     if user:
         query = query.filter_by(user_id=user)
-    entries = query.limit(200).all()
-    return render_template('admin/logs.html', entries=entries, menu=utils.get_menu())
+    before_id = request.args.get('before_id', type=int)
+    try:
+        before_ts = datetime.fromisoformat(request.args.get('before_ts', ''))
+    except ValueError:
+        before_ts = None
+    if before_ts is not None and before_id is not None:
+        query = query.filter(
+            tuple_(LogEntry.timestamp, LogEntry.id) < (before_ts, before_id)
+        )
+    entries = query.limit(LOG_PAGE_SIZE + 1).all()
+    next_page = None
+    if len(entries) > LOG_PAGE_SIZE:
+        entries = entries[:LOG_PAGE_SIZE]
+        last = entries[-1]
+        next_page = url_for(
+            'admin_routes.view_logs',
+            level=level or None,
+            user=user or None,
+            before_ts=last.timestamp.isoformat(),
+            before_id=last.id,
+        )
+    return render_template(
+        'admin/logs.html',
+        entries=entries,
+        next_page=next_page,
+        paged=before_ts is not None,
+        menu=utils.get_menu(),
+    )
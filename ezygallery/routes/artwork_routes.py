@@ -7,6 +7,7 @@ lists and serving gallery pages for processed and finalised artworks.
 
 from __future__ import annotations
 
+import hashlib
 import json
 import subprocess
 import uuid
@@ -16,18 +17,21 @@ import shutil
 import os
 import datetime
 import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from config import (
     ARTWORKS_PROCESSED_DIR,
     ARTWORKS_FINALISED_DIR,
     BASE_DIR,
-    ANALYSIS_STATUS_FILE,
 )
 import config
 
 from PIL import Image
-import io
 import scripts.analyze_artwork as aa
 from models import db, UploadEvent
+from utils import job_queue, analysis_engine, upload_ingest, upload_sessions
+from utils import content_index, listing_store, metrics_rollup
+from utils.similarity_index import similarity_index
 
 from flask import (
     Blueprint,
@@ -39,7 +43,9 @@ from flask import (
     flash,
     send_from_directory,
     Response,
+    stream_with_context,
 )
+from werkzeug.datastructures import FileStorage
 import re
 
 from . import utils
@@ -62,26 +68,141 @@ bp = Blueprint("artwork", __name__)
 
 # --- SECTION: Helper Functions ---
 
+# Job ids queued from this browser session, newest last; status routes only
+# answer for these.
+_SESSION_JOBS_KEY = "analysis_jobs"
+_SESSION_JOBS_MAX = 20
 
-def _write_analysis_status(step: str, percent: int, file: str | None = None) -> None:
-    """Write simple progress info for frontend polling."""
-    try:
-        ANALYSIS_STATUS_FILE.parent.mkdir(parents=True, exist_ok=True)
-        ANALYSIS_STATUS_FILE.write_text(
-            json.dumps({"step": step, "percent": percent, "file": file})
-        )
-    except Exception:
-        pass
+
+def _remember_job(job_id: int) -> None:
+    """Record ``job_id`` as queued by the current session."""
+    jobs = [j for j in session.get(_SESSION_JOBS_KEY, []) if j != job_id]
+    jobs.append(job_id)
+    session[_SESSION_JOBS_KEY] = jobs[-_SESSION_JOBS_MAX:]
+
+
+def _owns_job(job_id: int) -> bool:
+    """Return True when ``job_id`` was queued by the current session."""
+    return job_id in session.get(_SESSION_JOBS_KEY, [])
 
 
 @bp.route("/status/analyze")
 def analysis_status():
-    """Return JSON progress info for the current analysis job."""
-    if ANALYSIS_STATUS_FILE.exists():
-        data = json.loads(ANALYSIS_STATUS_FILE.read_text())
+    """Return JSON progress for one queued job or the caller's active jobs.
+
+    Pass ``?job=<id>`` for a single job. Finished jobs include a
+    ``redirect_url`` pointing at the listing editor.
+    """
+    job_id = request.args.get("job", type=int)
+    if job_id is not None:
+        return analysis_job_status(job_id)
+    jobs = job_queue.active_jobs(session.get("user"))
+    return {"jobs": [_job_status(j) for j in jobs]}
+
+
+@bp.route("/status/analyze/<int:job_id>")
+def analysis_job_status(job_id: int):
+    """Return progress for one job, optionally long-polling for a change.
+
+    ``?since=<version>&wait=<seconds>`` blocks (up to :func:`_max_wait`)
+    until the job state is newer than ``since``. Sync workers ignore
+    ``wait`` and answer at once. Jobs queued by another session are
+    reported as unknown.
+    """
+    if not _owns_job(job_id):
+        return {"error": "Unknown job", "job_id": job_id}, 404
+    since = request.args.get("since", default=-1, type=int)
+    wait = min(max(request.args.get("wait", default=0, type=float), 0), _max_wait())
+    if wait:
+        entry = job_queue.wait_for_change(job_id, since, wait)
     else:
-        data = {"step": "idle", "percent": 0}
-    return Response(json.dumps(data), mimetype="application/json")
+        entry = job_queue.job_state(job_id)
+    if entry is None:
+        return {"error": "Unknown job", "job_id": job_id}, 404
+    return _with_redirect(entry[1], entry[0])
+
+
+def _async_worker() -> bool:
+    """Return True when gevent or eventlet has patched the socket module."""
+    gevent = sys.modules.get("gevent.monkey")
+    if gevent is not None and gevent.is_module_patched("socket"):
+        return True
+    eventlet = sys.modules.get("eventlet.patcher")
+    return eventlet is not None and eventlet.is_monkey_patched("socket")
+
+
+def _max_wait() -> float:
+    """Longest a status request may be held open by this worker.
+
+    Zero under plain sync workers, which serve one request at a time; a
+    parked long-poll there would block every other visitor.
+    """
+    if _async_worker() or request.environ.get("wsgi.multithread"):
+        return config.ANALYSIS_STATUS_MAX_WAIT
+    return 0.0
+
+
+def _sse_enabled() -> bool:
+    """Whether job progress may be streamed (see ``ANALYSIS_STATUS_SSE``)."""
+    if config.ANALYSIS_STATUS_SSE == "auto":
+        return _async_worker()
+    return config.ANALYSIS_STATUS_SSE == "true"
+
+
+@bp.route("/status/analyze/<int:job_id>/stream")
+def analysis_job_stream(job_id: int):
+    """Server-sent events stream of a job's progress until it finishes.
+
+    Only served when :func:`_sse_enabled`; a sync worker would be pinned for
+    the whole job and killed by gunicorn's timeout. Clients poll
+    :func:`analysis_job_status` otherwise.
+    """
+    if not _sse_enabled():
+        return {"error": "Streaming disabled", "job_id": job_id}, 404
+    if not _owns_job(job_id):
+        return {"error": "Unknown job", "job_id": job_id}, 404
+
+    def events():
+        since = -1
+        while True:
+            entry = job_queue.wait_for_change(job_id, since, 15)
+            if entry is None:
+                yield 'event: error\ndata: {"error": "Unknown job"}\n\n'
+                return
+            version, state = entry
+            if version <= since:
+                yield ": keep-alive\n\n"
+                continue
+            since = version
+            yield f"data: {json.dumps(_with_redirect(state, version))}\n\n"
+            if state.get("status") in ("done", "failed"):
+                return
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _job_status(job) -> dict:
+    """Serialise an analysis job row for the status endpoint."""
+    return _with_redirect(job.to_status())
+
+
+def _with_redirect(state: dict, version: int | None = None) -> dict:
+    """Add ``redirect_url`` (and ``version``) to a job state for clients."""
+    data = dict(state)
+    result = data.get("result") or {}
+    if data.get("status") == "done" and result.get("filename"):
+        data["redirect_url"] = url_for(
+            "artwork.edit_listing",
+            aspect=result.get("aspect", ""),
+            filename=result["filename"],
+        )
+    if version is not None:
+        data["version"] = version
+    return data
 
 
 def validate_listing_fields(data: dict, generic_text: str) -> list[str]:
@@ -209,10 +330,7 @@ def upload_artwork():
     """Upload new artwork files and run pre-QC then AI analysis."""
     if request.method == "POST":
         files = request.files.getlist("images")
-        results = []
-        for f in files:
-            res = _process_upload_file(f)
-            results.append(res)
+        results = _process_upload_files(files)
 
         if (
             request.accept_mimetypes.accept_json
@@ -230,7 +348,130 @@ def upload_artwork():
         if request.accept_mimetypes.accept_html:
             return redirect(url_for("artwork.artworks"))
         return json.dumps(results), 200, {"Content-Type": "application/json"}
-    return render_template("upload.html", menu=utils.get_menu())
+    return render_template(
+        "upload.html",
+        menu=utils.get_menu(),
+        upload_chunk_bytes=int(config.UPLOAD_SESSION_CHUNK_MB * 1024 * 1024),
+    )
+
+
+def _upload_session_error(exc: Exception, status: int = 400):
+    return {"error": str(exc)}, status
+
+
+@bp.route("/upload/sessions", methods=["POST"])
+def upload_session_create():
+    """Open a resumable chunked upload for ``{"filename", "size"}``."""
+    data = request.get_json(silent=True) or {}
+    filename = str(data.get("filename") or "")
+    size = data.get("size")
+    ext = Path(filename).suffix.lower().lstrip(".")
+    if not filename or ext not in config.ALLOWED_EXTENSIONS:
+        return {"error": "Invalid file type"}, 400
+    if isinstance(size, bool) or not isinstance(size, int):
+        return {"error": "Missing size"}, 400
+    if size > config.MAX_UPLOAD_SIZE_MB * 1024 * 1024:
+        return {"error": "File too large"}, 400
+    try:
+        state = upload_sessions.create(filename, size, session.get("user"))
+    except upload_sessions.TooManySessions as exc:
+        return _upload_session_error(exc, 429)
+    except upload_sessions.UploadSessionError as exc:
+        return _upload_session_error(exc)
+    return state, 201
+
+
+@bp.route("/upload/sessions/<session_id>", methods=["GET"])
+def upload_session_status(session_id):
+    """Return received and missing chunk indices so a client can resume."""
+    try:
+        return upload_sessions.status(session_id, session.get("user"))
+    except FileNotFoundError:
+        return {"error": "Unknown upload session"}, 404
+
+
+@bp.route("/upload/sessions/<session_id>/chunks/<int:index>", methods=["PUT"])
+def upload_session_chunk(session_id, index):
+    """Store one chunk; the body is the raw chunk bytes."""
+    try:
+        return upload_sessions.write_chunk(
+            session_id, index, request.stream, session.get("user")
+        )
+    except FileNotFoundError:
+        return {"error": "Unknown upload session"}, 404
+    except upload_sessions.UploadSessionError as exc:
+        return _upload_session_error(exc)
+
+
+@bp.route("/upload/sessions/<session_id>", methods=["DELETE"])
+def upload_session_cancel(session_id):
+    """Abandon an upload session and delete its data."""
+    try:
+        upload_sessions.status(session_id, session.get("user"))
+    except FileNotFoundError:
+        return {"error": "Unknown upload session"}, 404
+    upload_sessions.discard(session_id)
+    return {"cancelled": session_id}
+
+
+@bp.route("/upload/sessions/<session_id>/complete", methods=["POST"])
+def upload_session_complete(session_id):
+    """Assemble a finished session and run it through the upload QC stage.
+
+    Returns the same result object as one entry of the ``/upload`` response.
+    """
+    try:
+        filename, data_path = upload_sessions.assembled_file(
+            session_id, session.get("user")
+        )
+    except FileNotFoundError:
+        return {"error": "Unknown upload session"}, 404
+    except upload_sessions.UploadSessionError as exc:
+        return _upload_session_error(exc, 409)
+    with open(data_path, "rb") as fh:
+        result = _process_upload_file(FileStorage(stream=fh, filename=filename))
+    upload_sessions.discard(session_id)
+    return result
+
+
+def _similarity_args() -> tuple[int, int]:
+    """Return ``limit`` (1-100) and ``max_distance`` (0-64) from the query."""
+    limit = min(max(request.args.get("limit", 20, type=int), 1), 100)
+    max_distance = min(max(request.args.get("max_distance", 64, type=int), 0), 64)
+    return limit, max_distance
+
+
+@bp.route("/similar/<seo_folder>")
+def similar_artworks(seo_folder):
+    """Return artworks that look like ``seo_folder`` (JSON)."""
+    limit, max_distance = _similarity_args()
+    try:
+        matches = similarity_index.query_folder(
+            seo_folder, limit=limit, max_distance=max_distance
+        )
+    except KeyError:
+        return {"error": "Artwork not indexed"}, 404
+    return {"seo_folder": seo_folder, "matches": matches}
+
+
+@bp.route("/similar", methods=["POST"])
+def similar_to_upload():
+    """Return artworks that look like the uploaded ``image`` (JSON)."""
+    file = request.files.get("image")
+    if file is None or not file.filename:
+        return {"error": "No image"}, 400
+    limit, max_distance = _similarity_args()
+    try:
+        img = Image.open(file.stream)
+        img.draft("RGB", (config.THUMB_WIDTH, config.THUMB_HEIGHT))
+        img.load()
+    except Exception:  # noqa: BLE001 - PIL raises many types for bad files
+        return {"error": "Corrupted image"}, 400
+    with img:
+        matches = similarity_index.query_image(
+            img, limit=limit, max_distance=max_distance
+        )
+    return {"matches": matches}
 
 
 @bp.route("/artworks")
@@ -299,18 +540,13 @@ def proceed():
         json.dump(slots, f, indent=2)
     log_file = utils.LOGS_DIR / f"composites_{selection_id}.log"
     try:
-        result = subprocess.run(
-            ["python3", str(utils.GENERATE_SCRIPT_PATH), str(selection_file)],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
+        result = _run_logged(
+            utils.GENERATE_SCRIPT_PATH,
+            [str(selection_file)],
+            log_file,
+            timeout=600,
             cwd=utils.BASE_DIR,
         )
-        with open(log_file, "w") as log:
-            log.write("=== STDOUT ===\n")
-            log.write(result.stdout)
-            log.write("\n\n=== STDERR ===\n")
-            log.write(result.stderr)
         if result.returncode == 0:
             flash("Composites generated successfully!", "success")
         else:
@@ -330,11 +566,58 @@ def proceed():
 # --- SECTION: Artwork Analysis ---
 
 
+def _run_logged(
+    script: Path, args: list[str], log_file: Path, timeout: int, cwd: Path | None = None
+) -> subprocess.CompletedProcess:
+    """Run ``script`` through the analysis engine and log its stdout/stderr."""
+    result = analysis_engine.run_script(script, args, timeout=timeout, cwd=cwd)
+    with open(log_file, "w") as log:
+        log.write("=== STDOUT ===\n")
+        log.write(result.stdout)
+        log.write("\n\n=== STDERR ===\n")
+        log.write(result.stderr)
+    return result
+
+
+def _queued_response(job_id: int, name: str):
+    """Reply to an analysis POST once its job has been queued."""
+    _remember_job(job_id)
+    status_url = url_for("artwork.analysis_job_status", job_id=job_id)
+    if request.accept_mimetypes.accept_json and not request.accept_mimetypes.accept_html:
+        data = {
+            "job_id": job_id,
+            "status_url": status_url,
+            "max_wait": _max_wait(),
+            "poll_interval": config.ANALYSIS_STATUS_POLL_SECONDS,
+        }
+        if _sse_enabled():
+            data["stream_url"] = url_for("artwork.analysis_job_stream", job_id=job_id)
+        return data, 202
+    flash(f"Analysis queued for {name} (job {job_id})", "info")
+    return redirect(url_for("artwork.artworks"))
+
+
 @bp.route("/analyze/<aspect>/<filename>", methods=["POST"], endpoint="analyze_artwork")
 def analyze_artwork_route(aspect, filename):
-    """Run the AI analysis pipeline for a stored artwork."""
+    """Queue the AI analysis pipeline for a stored artwork."""
+    job_id = job_queue.enqueue(
+        "artwork",
+        {"aspect": aspect, "filename": filename},
+        file=filename,
+        user_id=session.get("user"),
+    )
+    return _queued_response(job_id, filename)
+
+
+@job_queue.register("artwork")
+def _analyze_artwork_job(job_id: int, payload: dict, progress) -> dict:
+    """Run analysis and composite generation for a stored artwork."""
+    aspect = payload["aspect"]
+    filename = payload["filename"]
+    warnings: list[str] = []
+
     artwork_path = utils.ARTWORKS_DIR / aspect / filename
-    _write_analysis_status("starting", 0, filename)
+    progress("starting", 0)
     if not artwork_path.exists():
         try:
             fallback_folder = utils.find_seo_folder_from_filename(aspect, filename)
@@ -348,55 +631,43 @@ def analyze_artwork_route(aspect, filename):
     log_id = str(uuid.uuid4())
     log_file = utils.LOGS_DIR / f"analyze_{log_id}.log"
     try:
-        cmd = ["python3", str(utils.ANALYZE_SCRIPT_PATH), str(artwork_path)]
-        _write_analysis_status("openai_call", 20, filename)
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
+        progress("openai_call", 20)
+        result = _run_logged(
+            utils.ANALYZE_SCRIPT_PATH,
+            [str(artwork_path)],
+            log_file,
             timeout=300,
         )
-        with open(log_file, "w") as log:
-            log.write("=== STDOUT ===\n")
-            log.write(result.stdout)
-            log.write("\n\n=== STDERR ===\n")
-            log.write(result.stderr)
-        if result.returncode != 0:
-            flash(
-                f"❌ Analysis failed for {filename}: {result.stderr}",
-                "danger",
-            )
-            _write_analysis_status("failed", 100, filename)
     except Exception as e:
         with open(log_file, "a") as log:
             log.write(f"\n\n=== Exception ===\n{str(e)}")
-        flash(f"❌ Error running analysis: {str(e)}", "danger")
-        _write_analysis_status("failed", 100, filename)
+        progress("failed", 100)
+        raise job_queue.JobError(f"Error running analysis: {e}")
+    if result.returncode != 0:
+        progress("failed", 100)
+        raise job_queue.JobError(f"Analysis failed for {filename}: {result.stderr}")
 
     try:
         seo_folder = utils.find_seo_folder_from_filename(aspect, filename)
     except FileNotFoundError:
-        flash(
-            f"Analysis complete, but no SEO folder/listing found for {filename} ({aspect}).",
-            "warning",
+        progress("failed", 100)
+        raise job_queue.JobError(
+            f"Analysis complete, but no SEO folder/listing found for {filename} ({aspect})."
         )
-        return redirect(url_for("artwork.artworks"))
 
     listing_path = (
         utils.ARTWORK_PROCESSED_DIR
         / seo_folder
         / config.FILENAME_TEMPLATES["listing_json"].format(seo_slug=seo_folder)
     )
+    listing_store.notify(listing_path)
     locked, _, _, _ = utils.listing_lock_info(listing_path)
     if locked:
-        flash("Artwork is locked", "danger")
         logging.getLogger(__name__).warning(
             "Blocked by lock %s", seo_folder, extra={"event_type": "lock"}
         )
-        return redirect(
-            url_for("artwork.edit_listing", aspect=aspect, filename=filename)
-        )
+        progress("failed", 100)
+        raise job_queue.JobError("Artwork is locked")
     new_filename = f"{seo_folder}.jpg"
     try:
         with open(listing_path, "r", encoding="utf-8") as lf:
@@ -406,54 +677,62 @@ def analyze_artwork_route(aspect, filename):
         pass
 
     try:
-        cmd = ["python3", str(utils.GENERATE_SCRIPT_PATH), seo_folder]
-        _write_analysis_status("generating", 60, filename)
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            cwd=utils.BASE_DIR,
+        progress("generating", 60)
+        result = _run_logged(
+            utils.GENERATE_SCRIPT_PATH,
+            [seo_folder],
+            utils.LOGS_DIR / f"composite_gen_{log_id}.log",
             timeout=600,
+            cwd=utils.BASE_DIR,
         )
-        composite_log_file = utils.LOGS_DIR / f"composite_gen_{log_id}.log"
-        with open(composite_log_file, "w") as log:
-            log.write("=== STDOUT ===\n")
-            log.write(result.stdout)
-            log.write("\n\n=== STDERR ===\n")
-            log.write(result.stderr)
         if result.returncode != 0:
-            flash("Artwork analyzed, but mockup generation failed. See logs.", "danger")
+            warnings.append("Artwork analyzed, but mockup generation failed. See logs.")
     except Exception as e:
-        flash(f"Composites generation error: {e}", "danger")
+        warnings.append(f"Composites generation error: {e}")
 
-    _write_analysis_status("done", 100, filename)
-    return redirect(
-        url_for("artwork.edit_listing", aspect=aspect, filename=new_filename)
-    )
+    progress("done", 100)
+    return {"aspect": aspect, "filename": new_filename, "warnings": warnings}
 
 
 @bp.post("/analyze-upload/<base>")
 def analyze_upload(base):
-    """Analyze an uploaded image from the temporary folder."""
-    logger = logging.getLogger(__name__)
+    """Queue analysis of an uploaded image from the temporary folder."""
     qc_path = config.UPLOADS_TEMP_DIR / f"{base}.qc.json"
     if not qc_path.exists():
+        if request.accept_mimetypes.accept_json and not request.accept_mimetypes.accept_html:
+            return {"error": "Artwork not found"}, 404
         flash("Artwork not found", "danger")
         return redirect(url_for("artwork.artworks"))
+    job_id = job_queue.enqueue(
+        "upload",
+        {"base": base},
+        file=base,
+        user_id=session.get("user"),
+        upload_id=base,
+    )
+    return _queued_response(job_id, base)
+
+
+@job_queue.register("upload")
+def _analyze_upload_job(job_id: int, payload: dict, progress) -> dict:
+    """Analyze an uploaded image, relocate it and generate composites."""
+    logger = logging.getLogger(__name__)
+    base = payload["base"]
+    qc_path = config.UPLOADS_TEMP_DIR / f"{base}.qc.json"
     try:
         with open(qc_path, "r", encoding="utf-8") as f:
             qc = json.load(f)
     except Exception:
-        flash("Invalid QC data", "danger")
-        return redirect(url_for("artwork.artworks"))
+        raise job_queue.JobError("Invalid QC data")
 
     ext = qc.get("extension", "jpg")
     orig_path = config.UPLOADS_TEMP_DIR / f"{base}.{ext}"
     processed_root = ARTWORKS_PROCESSED_DIR
     log_id = uuid.uuid4().hex
     log_file = utils.LOGS_DIR / f"analyze_{log_id}.log"
-    _write_analysis_status("starting", 0, orig_path.name)
+    warnings: list[str] = []
+
+    progress("starting", 0)
     logger.info("Analysis start %s", base, extra={"event_type": "analysis"})
     event = (
         UploadEvent.query.filter_by(upload_id=base)
@@ -465,52 +744,46 @@ def analyze_upload(base):
         event.status = "started"
         db.session.commit()
 
+    def fail(message: str) -> job_queue.JobError:
+        progress("failed", 100)
+        if event:
+            event.status = "error"
+            event.error_msg = message[:1024]
+            db.session.commit()
+        return job_queue.JobError(message)
+
     try:
-        cmd = ["python3", str(utils.ANALYZE_SCRIPT_PATH), str(orig_path)]
-        _write_analysis_status("openai_call", 20, orig_path.name)
-        result = subprocess.run(
-            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=300
+        progress("openai_call", 20)
+        result = _run_logged(
+            utils.ANALYZE_SCRIPT_PATH,
+            [str(orig_path)],
+            log_file,
+            timeout=300,
         )
-        with open(log_file, "w") as log:
-            log.write("=== STDOUT ===\n")
-            log.write(result.stdout)
-            log.write("\n\n=== STDERR ===\n")
-            log.write(result.stderr)
         if result.returncode != 0:
-            flash(f"❌ Analysis failed: {result.stderr}", "danger")
             logger.error(
                 "Analysis subprocess failed: %s",
                 result.stderr,
                 extra={"event_type": "analysis"},
             )
-            _write_analysis_status("failed", 100, orig_path.name)
-            if event:
-                event.status = "error"
-                event.error_msg = result.stderr[:1024]
-                db.session.commit()
-            return redirect(url_for("artwork.artworks"))
+            raise fail(f"Analysis failed: {result.stderr}")
+    except job_queue.JobError:
+        raise
     except Exception as e:  # noqa: BLE001
         with open(log_file, "a") as log:
             log.write(f"\n\n=== Exception ===\n{str(e)}")
-        flash(f"❌ Error running analysis: {e}", "danger")
         logger.error("Analysis exception: %s", e, extra={"event_type": "analysis"})
-        _write_analysis_status("failed", 100, orig_path.name)
-        if event:
-            event.status = "error"
-            event.error_msg = str(e)[:1024]
-            db.session.commit()
-        return redirect(url_for("artwork.artworks"))
+        raise fail(f"Error running analysis: {e}")
 
     try:
         seo_folder = utils.find_seo_folder_from_filename(
             qc.get("aspect_ratio", ""), orig_path.name
         )
     except FileNotFoundError:
-        flash(
-            f"Analysis complete, but no SEO folder/listing found for {orig_path.name} ({qc.get('aspect_ratio','')}).",
-            "warning",
+        progress("failed", 100)
+        raise job_queue.JobError(
+            f"Analysis complete, but no SEO folder/listing found for {orig_path.name} ({qc.get('aspect_ratio','')})."
         )
-        return redirect(url_for("artwork.artworks"))
 
     listing_data = None
     listing_path = (
@@ -518,6 +791,8 @@ def analyze_upload(base):
         / seo_folder
         / config.FILENAME_TEMPLATES["listing_json"].format(seo_slug=seo_folder)
     )
+    listing_store.notify(listing_path)
+    content_index.assign_folder(base, seo_folder)
     if listing_path.exists():
         try:
             with open(listing_path, "r", encoding="utf-8") as lf:
@@ -556,40 +831,26 @@ def analyze_upload(base):
                 exc,
                 extra={"event_type": "analysis"},
             )
-            flash(f"File move failed for {temp_file.name}: {exc}", "danger")
-            _write_analysis_status("failed", 100, orig_path.name)
-            if event:
-                event.status = "error"
-                event.error_msg = str(exc)[:1024]
-                db.session.commit()
-            return redirect(url_for("artwork.artworks"))
+            raise fail(f"File move failed for {temp_file.name}: {exc}")
 
     try:
-        cmd = ["python3", str(utils.GENERATE_SCRIPT_PATH), seo_folder]
-        _write_analysis_status("generating", 60, orig_path.name)
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            cwd=utils.BASE_DIR,
+        progress("generating", 60)
+        result = _run_logged(
+            utils.GENERATE_SCRIPT_PATH,
+            [seo_folder],
+            utils.LOGS_DIR / f"composite_gen_{log_id}.log",
             timeout=600,
+            cwd=utils.BASE_DIR,
         )
-        composite_log = utils.LOGS_DIR / f"composite_gen_{log_id}.log"
-        with open(composite_log, "w") as log:
-            log.write("=== STDOUT ===\n")
-            log.write(result.stdout)
-            log.write("\n\n=== STDERR ===\n")
-            log.write(result.stderr)
         if result.returncode != 0:
-            flash("Artwork analyzed, but mockup generation failed.", "danger")
+            warnings.append("Artwork analyzed, but mockup generation failed.")
             logger.error(
                 "Mockup generation failed for %s",
                 seo_folder,
                 extra={"event_type": "analysis"},
             )
     except Exception as e:  # noqa: BLE001
-        flash(f"Composites generation error: {e}", "danger")
+        warnings.append(f"Composites generation error: {e}")
         logger.error(
             "Composites generation exception: %s", e, extra={"event_type": "analysis"}
         )
@@ -602,15 +863,16 @@ def analyze_upload(base):
     new_filename = f"{seo_folder}.jpg"
     if listing_data:
         new_filename = listing_data.get("seo_filename", new_filename)
-    _write_analysis_status("done", 100, orig_path.name)
+    progress("done", 100)
     if event:
         event.analysis_end_time = datetime.datetime.utcnow()
         event.status = "analysed"
+        metrics_rollup.record(
+            "analysis", event.analysis_end_time, event.analysis_duration_ms()
+        )
         db.session.commit()
     logger.info("Analysis finished %s", base, extra={"event_type": "analysis"})
-    return redirect(
-        url_for("artwork.edit_listing", aspect=aspect, filename=new_filename)
-    )
+    return {"aspect": aspect, "filename": new_filename, "warnings": warnings}
 
 
 @bp.route("/review/<aspect>/<filename>")
@@ -784,6 +1046,7 @@ def edit_listing(aspect, filename):
         if action == "delete":
             shutil.rmtree(utils.ARTWORK_PROCESSED_DIR / seo_folder, ignore_errors=True)
             shutil.rmtree(utils.FINALISED_DIR / seo_folder, ignore_errors=True)
+            content_index.forget(seo_folder)
             try:
                 os.remove(utils.ARTWORKS_DIR / aspect / filename)
             except Exception:
@@ -857,17 +1120,17 @@ def edit_listing(aspect, filename):
                 generic_text=generic_text,
             )
 
-        data.update(form_data)
-        data["generic_text"] = generic_text
-
         full_desc = re.sub(r"\s+$", "", form_data["description"])
         gen = generic_text.strip()
         if gen and not full_desc.endswith(gen):
             full_desc = re.sub(r"\n{3,}", "\n\n", full_desc.rstrip()) + "\n\n" + gen
-        data["description"] = full_desc.strip()
 
-        with open(listing_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        # Merge into the current file so fields written since the page was
+        # loaded (mockups, lock state) are not clobbered.
+        with listing_store.listing_txn(listing_path) as current:
+            current.update(form_data)
+            current["generic_text"] = generic_text
+            current["description"] = full_desc.strip()
 
         logging.getLogger(__name__).info(
             "Listing updated %s", seo_folder, extra={"event_type": "listing"}
@@ -1141,6 +1404,20 @@ def regenerate_composite(seo_folder, slot_index):
     return redirect(url_for("artwork.composites_specific", seo_folder=seo_folder))
 
 
+@bp.route("/composites/<seo_folder>/regenerate", methods=["POST"])
+def regenerate_all_composites(seo_folder):
+    """Regenerate every composite for a listing in one parallel batch."""
+    results = utils.regenerate_all_mockups(seo_folder)
+    failed = [idx for idx, ok in results.items() if not ok]
+    if not results:
+        flash("No mockups to regenerate", "warning")
+    elif failed:
+        flash(f"Failed to regenerate slots: {', '.join(str(i + 1) for i in failed)}", "danger")
+    else:
+        flash("Composites regenerated", "success")
+    return redirect(url_for("artwork.composites_specific", seo_folder=seo_folder))
+
+
 @bp.route("/approve_composites/<seo_folder>", methods=["POST"])
 def approve_composites(seo_folder):
     """Mark composites as approved (placeholder)."""
@@ -1148,6 +1425,28 @@ def approve_composites(seo_folder):
     return redirect(url_for("artwork.composites_specific", seo_folder=seo_folder))
 
 
+def _finalise_listing_paths(listing_data: dict, final_dir: Path) -> None:
+    """Point a listing's stored paths at its new finalised folder."""
+    listing_data.setdefault("locked", False)
+
+    def _swap_path(p: str) -> str:
+        return p.replace(str(utils.ARTWORK_PROCESSED_DIR), str(utils.FINALISED_DIR))
+
+    for key in (
+        "main_jpg_path",
+        "orig_jpg_path",
+        "thumb_jpg_path",
+        "processed_folder",
+    ):
+        if isinstance(listing_data.get(key), str):
+            listing_data[key] = _swap_path(listing_data[key])
+
+    imgs = [
+        p for p in final_dir.iterdir() if p.suffix.lower() in {".jpg", ".jpeg", ".png"}
+    ]
+    listing_data["images"] = [utils.relative_to_base(p) for p in sorted(imgs)]
+
+
 @bp.route("/finalise/<aspect>/<filename>", methods=["GET", "POST"])
 def finalise_artwork(aspect, filename):
     """Move processed artwork to finalised location and update listing data."""
@@ -1169,15 +1468,29 @@ def finalise_artwork(aspect, filename):
     # Move processed artwork into the finalised location and update paths
     # ------------------------------------------------------------------
     try:
-        if final_dir.exists():
-            raise FileExistsError(f"{final_dir} already exists")
+        listing_file = final_dir / f"{seo_folder}-listing.json"
+        # The lock is keyed by SEO folder, so holding it across the move keeps
+        # edits and SKU writes from landing in the old path mid-move.
+        with listing_store.locked(listing_file):
+            if final_dir.exists():
+                raise FileExistsError(f"{final_dir} already exists")
 
-        shutil.move(str(processed_dir), str(final_dir))
+            shutil.move(str(processed_dir), str(final_dir))
 
-        # Marker file indicating finalisation time
-        (final_dir / "finalised.txt").write_text(
-            datetime.datetime.now().isoformat(), encoding="utf-8"
-        )
+            # Marker file indicating finalisation time
+            (final_dir / "finalised.txt").write_text(
+                datetime.datetime.now().isoformat(), encoding="utf-8"
+            )
+
+            # Update any stored paths within the listing JSON
+            if listing_file.exists():
+                with listing_store.listing_txn(listing_file) as listing_data:
+                    # Always allocate a fresh SKU on finalisation
+                    utils.assign_or_get_sku(
+                        listing_file, config.SKU_TRACKER, force=True, txn=listing_data
+                    )
+                    _finalise_listing_paths(listing_data, final_dir)
+            listing_store.notify(processed_dir / f"{seo_folder}-listing.json")
 
         # Remove original artwork from input directory if it still exists
         orig_input = utils.ARTWORKS_DIR / aspect / filename
@@ -1186,45 +1499,6 @@ def finalise_artwork(aspect, filename):
         except FileNotFoundError:
             pass
 
-        # Update any stored paths within the listing JSON
-        listing_file = final_dir / f"{seo_folder}-listing.json"
-        if listing_file.exists():
-            # Always allocate a fresh SKU on finalisation
-            utils.assign_or_get_sku(listing_file, config.SKU_TRACKER, force=True)
-            with open(listing_file, "r", encoding="utf-8") as lf:
-                listing_data = json.load(lf)
-            listing_data.setdefault("locked", False)
-
-            def _swap_path(p: str) -> str:
-                return p.replace(
-                    str(utils.ARTWORK_PROCESSED_DIR), str(utils.FINALISED_DIR)
-                )
-
-            for key in (
-                "main_jpg_path",
-                "orig_jpg_path",
-                "thumb_jpg_path",
-                "processed_folder",
-            ):
-                if isinstance(listing_data.get(key), str):
-                    listing_data[key] = _swap_path(listing_data[key])
-
-            if isinstance(listing_data.get("images"), list):
-                listing_data["images"] = [
-                    _swap_path(img) if isinstance(img, str) else img
-                    for img in listing_data["images"]
-                ]
-
-            imgs = [
-                p
-                for p in final_dir.iterdir()
-                if p.suffix.lower() in {".jpg", ".jpeg", ".png"}
-            ]
-            listing_data["images"] = [utils.relative_to_base(p) for p in sorted(imgs)]
-
-            with open(listing_file, "w", encoding="utf-8") as lf:
-                json.dump(listing_data, lf, indent=2, ensure_ascii=False)
-
         with open(log_path, "a", encoding="utf-8") as log:
             user = session.get("user", "anonymous")
             log.write(
@@ -1248,61 +1522,50 @@ def finalise_artwork(aspect, filename):
 def finalised_gallery():
     """Display all finalised artworks in a gallery view."""
     artworks = []
-    if utils.FINALISED_DIR.exists():
-        for folder in utils.FINALISED_DIR.iterdir():
-            if not folder.is_dir():
-                continue
-            listing_file = folder / f"{folder.name}-listing.json"
-            if not listing_file.exists():
-                continue
-            try:
-                with open(listing_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-            except Exception:
-                continue
-            entry = {
-                "seo_folder": folder.name,
-                "title": data.get("title") or utils.prettify_slug(folder.name),
-                "description": data.get("description", ""),
-                "sku": data.get("sku", ""),
-                "primary_colour": data.get("primary_colour", ""),
-                "secondary_colour": data.get("secondary_colour", ""),
-                "price": data.get("price", ""),
-                "seo_filename": data.get("seo_filename", f"{folder.name}.jpg"),
-                "tags": data.get("tags", []),
-                "materials": data.get("materials", []),
-                "aspect": data.get("aspect_ratio", ""),
-                "filename": data.get("filename", f"{folder.name}.jpg"),
-                "locked": data.get("locked", False),
-                "mockups": [],
-            }
-
-            for mp in data.get("mockups", []):
-                if isinstance(mp, dict):
-                    out = folder / mp.get("composite", "")
-                else:
-                    p = Path(mp)
-                    out = folder / f"{folder.name}-{p.stem}.jpg"
-                if out.exists():
-                    entry["mockups"].append({"filename": out.name})
-
-            # Filter images that actually exist on disk
-            images = []
-            for img in data.get("images", []):
-                img_path = utils.BASE_DIR / img
-                if img_path.exists():
-                    images.append(img)
-            entry["images"] = images
-
-            ts = folder / "finalised.txt"
-            entry["date"] = (
-                ts.stat().st_mtime if ts.exists() else listing_file.stat().st_mtime
-            )
+    for record in utils.listing_index.records(utils.FINALISED_TREE):
+        data = record.data
+        folder = record.folder
+        entry = {
+            "seo_folder": folder.name,
+            "title": data.get("title") or utils.prettify_slug(folder.name),
+            "description": data.get("description", ""),
+            "sku": data.get("sku", ""),
+            "primary_colour": data.get("primary_colour", ""),
+            "secondary_colour": data.get("secondary_colour", ""),
+            "price": data.get("price", ""),
+            "seo_filename": data.get("seo_filename", f"{folder.name}.jpg"),
+            "tags": data.get("tags", []),
+            "materials": data.get("materials", []),
+            "aspect": data.get("aspect_ratio", ""),
+            "filename": data.get("filename", f"{folder.name}.jpg"),
+            "locked": data.get("locked", False),
+            "mockups": [],
+        }
+
+        for mp in data.get("mockups", []):
+            if isinstance(mp, dict):
+                out = folder / mp.get("composite", "")
+            else:
+                p = Path(mp)
+                out = folder / f"{folder.name}-{p.stem}.jpg"
+            if out.exists():
+                entry["mockups"].append({"filename": out.name})
+
+        # Filter images that actually exist on disk
+        images = []
+        for img in data.get("images", []):
+            img_path = utils.BASE_DIR / img
+            if img_path.exists():
+                images.append(img)
+        entry["images"] = images
 
-            main_img = folder / f"{folder.name}.jpg"
-            entry["main_image"] = main_img.name if main_img.exists() else None
+        ts = folder / "finalised.txt"
+        entry["date"] = ts.stat().st_mtime if ts.exists() else record.mtime
 
-            artworks.append(entry)
+        main_img = folder / f"{folder.name}.jpg"
+        entry["main_image"] = main_img.name if main_img.exists() else None
+
+        artworks.append(entry)
     artworks.sort(key=lambda x: x.get("date", 0), reverse=True)
     return render_template("finalised.html", artworks=artworks, menu=utils.get_menu())
 
@@ -1356,14 +1619,11 @@ def update_links(aspect, filename):
         )
 
     try:
-        with open(listing_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
         imgs = [
             p for p in folder.iterdir() if p.suffix.lower() in {".jpg", ".jpeg", ".png"}
         ]
-        data["images"] = [utils.relative_to_base(p) for p in sorted(imgs)]
-        with open(listing_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        with listing_store.listing_txn(listing_file) as data:
+            data["images"] = [utils.relative_to_base(p) for p in sorted(imgs)]
         msg = "Image links updated"
         if wants_json:
             return {"success": True, "message": msg, "images": data["images"]}
@@ -1397,6 +1657,7 @@ def delete_finalised(aspect, filename):
         )
     try:
         shutil.rmtree(folder)
+        content_index.forget(seo_folder)
         flash("Finalised artwork deleted", "success")
     except Exception as e:  # noqa: BLE001
         flash(f"Delete failed: {e}", "danger")
@@ -1418,8 +1679,6 @@ def lock_listing(aspect, filename):
         )
     reason = request.form.get("reason", "").strip()
     try:
-        with open(listing, "r", encoding="utf-8") as f:
-            data = json.load(f)
         utils.update_listing_lock(listing, True, session.get("user", "unknown"), reason)
         logging.getLogger(__name__).info(
             "Listing locked %s", seo, extra={"event_type": "lock"}
@@ -1440,8 +1699,6 @@ def unlock_listing(aspect, filename):
         return redirect(url_for("artwork.artworks"))
     reason = request.form.get("reason", "").strip()
     try:
-        with open(listing, "r", encoding="utf-8") as f:
-            data = json.load(f)
         utils.update_listing_lock(
             listing, False, session.get("user", "unknown"), reason
         )
@@ -1504,107 +1761,155 @@ def preview_next_sku():
     return Response(next_sku, mimetype="text/plain")
 
 
-def _process_upload_file(file_storage):
-    """Handle single uploaded file through QC, AI and relocation."""
+def _upload_request_fields() -> dict:
+    """Request metadata recorded on every ``UploadEvent`` of this request."""
+    return {
+        "user_id": session.get("user"),
+        "session_id": session.get("token"),
+        "ip_address": request.remote_addr,
+        "user_agent": request.headers.get("User-Agent"),
+    }
+
+
+def _ingest_upload(
+    file_storage, dedup: content_index.DedupBatch
+) -> tuple[dict, dict | None, content_index.Fingerprint | None]:
+    """Validate, spool, dedupe and derive one upload.
+
+    Touches neither the request context nor the database so it can run on a
+    worker thread. Returns the JSON result, for files that passed
+    verification the fields of their ``UploadEvent``, and for accepted files
+    their fingerprint.
+    """
     logger = logging.getLogger(__name__)
     result = {"original": file_storage.filename, "success": False, "error": ""}
     filename = file_storage.filename
     if not filename:
         result["error"] = "No filename"
         logger.error("Upload missing filename")
-        return result
+        return result, None, None
     ext = Path(filename).suffix.lower().lstrip(".")
     if ext not in config.ALLOWED_EXTENSIONS:
         result["error"] = "Invalid file type"
         logger.warning("Rejected file type: %s", ext, extra={"event_type": "upload"})
-        return result
-    data = file_storage.read()
-    if len(data) > config.MAX_UPLOAD_SIZE_MB * 1024 * 1024:
+        return result, None, None
+
+    safe = aa.slugify(Path(filename).stem)
+    unique = uuid.uuid4().hex[:8]
+    base = f"{safe}-{unique}"
+
+    config.UPLOADS_TEMP_DIR.mkdir(parents=True, exist_ok=True)
+    orig_path = config.UPLOADS_TEMP_DIR / f"{base}.{ext}"
+    digest = hashlib.sha256()
+    try:
+        filesize = upload_ingest.spool_upload(
+            file_storage.stream,
+            orig_path,
+            config.MAX_UPLOAD_SIZE_MB * 1024 * 1024,
+            digest=digest,
+        )
+    except upload_ingest.UploadTooLarge as exc:
         result["error"] = "File too large"
         logger.warning(
-            "Upload too large: %s bytes", len(data), extra={"event_type": "upload"}
+            "Upload too large: %s bytes", exc.size, extra={"event_type": "upload"}
         )
-        return result
-    try:
-        with Image.open(io.BytesIO(data)) as im:
-            im.verify()
-    except Exception:
+        return result, None, None
+    if not upload_ingest.verify_image(orig_path):
+        orig_path.unlink(missing_ok=True)
         result["error"] = "Corrupted image"
         logger.error(
             "Corrupted image uploaded: %s", filename, extra={"event_type": "upload"}
         )
-        return result
-
-    safe = aa.slugify(Path(filename).stem)
-    unique = uuid.uuid4().hex[:8]
-    base = f"{safe}-{unique}"
+        return result, None, None
+
+    sha256 = digest.hexdigest()
+    duplicate = None
+    if config.UPLOAD_DEDUP_MODE != "off":
+        duplicate = dedup.claim(sha256, base, filename)
+    if duplicate is not None:
+        result["duplicate_of"] = duplicate
+        if config.UPLOAD_DEDUP_MODE == "reject":
+            orig_path.unlink(missing_ok=True)
+            result["error"] = "Duplicate upload"
+            logger.info(
+                "Duplicate upload %s skipped",
+                filename,
+                extra={"event_type": "upload", "details": sha256},
+            )
+            return result, None, None
 
-    start_ts = datetime.datetime.utcnow()
-    event = UploadEvent(
-        user_id=session.get("user"),
-        upload_id=base,
-        filename=filename,
-        upload_start_time=start_ts,
-        upload_end_time=start_ts,
-        status="started",
-        session_id=session.get("token"),
-        ip_address=request.remote_addr,
-        user_agent=request.headers.get("User-Agent"),
-    )
-    db.session.add(event)
-    db.session.flush()
-    config.UPLOADS_TEMP_DIR.mkdir(parents=True, exist_ok=True)
-    orig_path = config.UPLOADS_TEMP_DIR / f"{base}.{ext}"
-    with open(orig_path, "wb") as f:
-        f.write(data)
-
-    with Image.open(orig_path) as img:
-        width, height = img.size
-        thumb_path = config.UPLOADS_TEMP_DIR / f"{base}-thumb.jpg"
-        thumb = img.copy()
-        thumb.thumbnail((config.THUMB_WIDTH, config.THUMB_HEIGHT))
-        thumb.save(thumb_path, "JPEG", quality=80)
-
-    analyse_path = config.UPLOADS_TEMP_DIR / f"{base}-analyse.jpg"
-    with Image.open(orig_path) as img:
-        w, h = img.size
-        scale = config.ANALYSE_MAX_DIM / max(w, h)
-        if scale < 1.0:
-            img = img.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
-        img = img.convert("RGB")
-
-        q = 85
-        while True:
-            img.save(analyse_path, "JPEG", quality=q, optimize=True)
-            if (
-                analyse_path.stat().st_size <= config.ANALYSE_MAX_MB * 1024 * 1024
-                or q <= 60
-            ):
-                break
-            q -= 5
-
-    aspect = aa.get_aspect_ratio(orig_path)
-
-    qc_data = {
-        "original_filename": filename,
-        "extension": ext,
-        "image_shape": [width, height],
-        "filesize_bytes": len(data),
-        "aspect_ratio": aspect,
-        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    event = {
+        "upload_id": base,
+        "filename": filename,
+        "upload_start_time": datetime.datetime.utcnow(),
     }
-    qc_path = config.UPLOADS_TEMP_DIR / f"{base}.qc.json"
-    qc_path.write_text(json.dumps(qc_data, indent=2))
-
-    event.upload_end_time = datetime.datetime.utcnow()
-    event.status = "uploaded"
-    db.session.commit()
+    try:
+        derived = upload_ingest.build_derivatives(
+            orig_path,
+            base,
+            config.UPLOADS_TEMP_DIR,
+            utils.get_aspect_ratios(),
+            {"original_filename": filename, "extension": ext, "filesize_bytes": filesize},
+        )
+    except Exception as exc:  # noqa: BLE001
+        logger.error(
+            "Upload processing failed for %s: %s",
+            filename,
+            exc,
+            extra={"event_type": "upload"},
+        )
+        result["error"] = "Processing failed"
+        event.update(upload_end_time=datetime.datetime.utcnow(), status="failed")
+        return result, event, None
 
+    event.update(upload_end_time=datetime.datetime.utcnow(), status="uploaded")
     logger.info(
         "Uploaded %s", filename, extra={"event_type": "upload", "details": base}
     )
+    result.update({"success": True, "base": base, "aspect": derived.aspect})
+    fingerprint = content_index.Fingerprint(sha256, derived.dhash, derived.phash)
+    return result, event, fingerprint
 
-    result.update(
-        {"success": True, "base": base, "aspect": aspect, "event_id": event.id}
-    )
-    return result
+
+def _process_upload_files(files) -> list[dict]:
+    """Handle uploaded files through QC in a bounded thread pool.
+
+    Decoding and encoding release the GIL, so files are processed in
+    parallel. All ``UploadEvent`` and fingerprint rows are written in one
+    commit and the results keep the order of ``files``. Near duplicates of
+    known artworks are listed under ``similar_to``.
+    """
+    fields = _upload_request_fields()
+    dedup = content_index.DedupBatch()
+    workers = min(config.UPLOAD_WORKERS, len(files))
+    if workers <= 1:
+        outcomes = [_ingest_upload(f, dedup) for f in files]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload") as pool:
+            outcomes = list(pool.map(lambda f: _ingest_upload(f, dedup), files))
+
+    events = []
+    for result, event, fingerprint in outcomes:
+        if event is not None:
+            events.append((result, UploadEvent(**event, **fields)))
+        if fingerprint is not None:
+            similar = dedup.similar(fingerprint.phash, exclude_upload=result["base"])
+            if similar:
+                result["similar_to"] = similar
+            content_index.record(fingerprint, result["base"], result["original"])
+    if events:
+        db.session.add_all([event for _, event in events])
+        metrics_rollup.record_many(
+            ("upload", event.upload_end_time, event.upload_duration_ms())
+            for _, event in events
+        )
+        db.session.commit()
+        for result, event in events:
+            if result["success"]:
+                result["event_id"] = event.id
+    return [result for result, _, _ in outcomes]
+
+
+def _process_upload_file(file_storage):
+    """Handle single uploaded file through QC, AI and relocation."""
+    return _process_upload_files([file_storage])[0]
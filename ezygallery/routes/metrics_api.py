@@ -2,36 +2,58 @@
 
 from __future__ import annotations
 
-import statistics
-from flask import Blueprint, jsonify
+import datetime
+
+from flask import Blueprint, jsonify, request
+from sqlalchemy import func
 
 from models import db, UploadEvent
+from utils import metrics_rollup
 
 bp = Blueprint("metrics", __name__, url_prefix="/api")
 
+WINDOWS = {
+    "overall": None,
+    "24h": datetime.timedelta(hours=24),
+    "7d": datetime.timedelta(days=7),
+}
+
+
+def _window(since: datetime.datetime | None) -> dict:
+    upload = metrics_rollup.summary("upload", since)
+    analysis = metrics_rollup.summary("analysis", since)
+    return {
+        "median_upload_ms": upload["p50_ms"],
+        "median_analysis_ms": analysis["p50_ms"],
+        "upload": upload,
+        "analysis": analysis,
+    }
+
 
 @bp.get("/metrics")
 def metrics() -> "tuple[str, int]":
-    """Return median upload and analysis times in milliseconds."""
+    """Return upload and analysis timings in milliseconds.
 
-    events = UploadEvent.query.all()
-    upload_times = [e.upload_duration_ms() for e in events if e.upload_duration_ms()]
-    analysis_times = [
-        e.analysis_duration_ms() for e in events if e.analysis_duration_ms()
-    ]
-
-    median_upload = statistics.median(upload_times) if upload_times else 0
-    median_analysis = statistics.median(analysis_times) if analysis_times else 0
+    Every window reports count, mean and approximate p50/p90/p99 from the
+    hourly rollup. ``?hours=N`` adds a custom ``window`` entry. Upload counts
+    by status over the last 24 hours come from the indexed ``created_at``.
+    """
 
+    now = datetime.datetime.utcnow()
     data = {
-        "overall": {
-            "median_upload_ms": median_upload,
-            "median_analysis_ms": median_analysis,
-        }
+        name: _window(now - delta if delta else None)
+        for name, delta in WINDOWS.items()
     }
-
-    # Additional stats such as averages or percentiles can be added using
-    # SQLAlchemy queries with ``func.avg`` or Postgres ``percentile_cont``.
+    hours = request.args.get("hours", type=float)
+    if hours and hours > 0:
+        data["window"] = {"hours": hours, **_window(now - datetime.timedelta(hours=hours))}
+
+    rows = (
+        db.session.query(UploadEvent.status, func.count(UploadEvent.id))
+        .filter(UploadEvent.created_at >= now - WINDOWS["24h"])
+        .group_by(UploadEvent.status)
+        .all()
+    )
+    data["24h"]["status_counts"] = {status: count for status, count in rows}
 
     return jsonify(data)
-
@@ -1,78 +1,146 @@
-"""Utilities for tracking and limiting active user sessions."""
+"""Utilities for tracking and limiting active user sessions.
+
+Sessions used to live in ``logs/session_registry.json``. ``require_login``
+calls :func:`is_active` on every request, and each call took a thread lock,
+opened the file under ``flock`` and parsed the whole registry. The registry
+is now the ``user_sessions`` table, which has a unique index on
+``(username, session_id)``, so a check is a single indexed lookup. Each
+worker also keeps positive answers for ``SESSION_CACHE_TTL`` seconds, which
+means most requests never reach the database. :func:`remove_session` drops
+the cached entry in its own worker; other workers notice the revocation once
+their entry expires.
+
+:func:`init_app` imports an existing JSON registry once and renames the file
+to ``session_registry.json.migrated``.
+"""
 
 from __future__ import annotations
 
+import contextlib
+import datetime
 import json
 import threading
-import datetime
-from pathlib import Path
-import contextlib
-import fcntl
+import time
+from typing import Dict, Tuple
 
-from config import LOGS_DIR
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
 
-REGISTRY_FILE = LOGS_DIR / "session_registry.json"
-_LOCK = threading.Lock()
+from config import LOGS_DIR, SESSION_CACHE_TTL
+from models import db, UserSession
 
+REGISTRY_FILE = LOGS_DIR / "session_registry.json"
+MAX_SESSIONS = 5
+_CACHE_MAX = 4096
 
-def _load_registry() -> dict:
-    """Load the session registry JSON file."""
-    if not REGISTRY_FILE.exists():
-        return {}
-    try:
-        with open(REGISTRY_FILE, "r", encoding="utf-8") as f:
-            with contextlib.suppress(OSError):
-                fcntl.flock(f, fcntl.LOCK_SH)
-            data = json.load(f)
-    except Exception:
-        REGISTRY_FILE.unlink(missing_ok=True)
-        return {}
-    return data
+_LOCK = threading.Lock()
+_active: Dict[Tuple[str, str], float] = {}
 
 
-def _save_registry(data: dict) -> None:
-    """Safely write the session registry back to disk."""
-    REGISTRY_FILE.parent.mkdir(parents=True, exist_ok=True)
-    tmp = REGISTRY_FILE.with_suffix(".tmp")
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
-    tmp.replace(REGISTRY_FILE)
+def _forget(username: str, session_id: str) -> None:
+    with _LOCK:
+        _active.pop((username, session_id), None)
 
 
 def register_session(username: str, session_id: str) -> bool:
     """Register a session ID for the given user. Return False if limit reached."""
-    with _LOCK:
-        data = _load_registry()
-        sessions = data.get(username, [])
-        if len(sessions) >= 5:
-            return False
-        sessions.append({
-            "session_id": session_id,
-            "timestamp": datetime.datetime.utcnow().isoformat()
-        })
-        data[username] = sessions
-        _save_registry(data)
-    return True
+    try:
+        added = db.session.execute(
+            text(
+                "INSERT INTO user_sessions (username, session_id, created_at) "
+                "SELECT :username, :session_id, :now "
+                "WHERE (SELECT COUNT(*) FROM user_sessions WHERE username = :username) < :limit"
+            ),
+            {
+                "username": username,
+                "session_id": session_id,
+                "now": datetime.datetime.utcnow(),
+                "limit": MAX_SESSIONS,
+            },
+        )
+        db.session.commit()
+    except IntegrityError:  # (username, session_id) is already registered
+        db.session.rollback()
+        return True
+    if added.rowcount == 1:
+        return True
+    return (
+        UserSession.query.filter_by(username=username, session_id=session_id).first()
+        is not None
+    )
 
 
 def remove_session(username: str, session_id: str) -> None:
     """Remove a session entry for ``username``."""
-    with _LOCK:
-        data = _load_registry()
-        if username in data:
-            data[username] = [s for s in data[username] if s.get("session_id") != session_id]
-            if not data[username]:
-                data.pop(username, None)
-            _save_registry(data)
+    UserSession.query.filter_by(username=username, session_id=session_id).delete()
+    db.session.commit()
+    _forget(username, session_id)
 
 
 def all_sessions() -> dict:
-    """Return the entire session registry."""
-    with _LOCK:
-        return _load_registry()
+    """Return the registry as ``{username: [{session_id, timestamp}, ...]}``."""
+    data: dict = {}
+    rows = UserSession.query.order_by(UserSession.username, UserSession.id).all()
+    for row in rows:
+        data.setdefault(row.username, []).append(
+            {"session_id": row.session_id, "timestamp": row.created_at.isoformat()}
+        )
+    return data
 
 
 def is_active(username: str, session_id: str) -> bool:
     """Check if the given session ID is active for ``username``."""
-    data = all_sessions()
-    return any(s.get("session_id") == session_id for s in data.get(username, []))
+    key = (username, session_id)
+    now = time.monotonic()
+    expires = _active.get(key)
+    if expires is not None and expires > now:
+        return True
+    found = (
+        db.session.query(UserSession.id)
+        .filter_by(username=username, session_id=session_id)
+        .first()
+        is not None
+    )
+    with _LOCK:
+        if not found:
+            _active.pop(key, None)
+            return False
+        if len(_active) >= _CACHE_MAX:
+            for stale in [k for k, exp in _active.items() if exp <= now]:
+                del _active[stale]
+            if len(_active) >= _CACHE_MAX:
+                _active.clear()
+        _active[key] = now + SESSION_CACHE_TTL
+    return True
+
+
+def init_app(app) -> None:
+    """Move sessions from the legacy JSON registry into the table, once."""
+    if not REGISTRY_FILE.exists():
+        return
+    try:
+        with open(REGISTRY_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        data = {}
+    with app.app_context():
+        known = {(row.username, row.session_id) for row in UserSession.query.all()}
+        for username, sessions in data.items():
+            for entry in sessions:
+                sid = entry.get("session_id")
+                if not sid or (username, sid) in known:
+                    continue
+                try:
+                    created = datetime.datetime.fromisoformat(entry["timestamp"])
+                except (KeyError, TypeError, ValueError):
+                    created = datetime.datetime.utcnow()
+                db.session.add(
+                    UserSession(username=username, session_id=sid, created_at=created)
+                )
+                known.add((username, sid))
+        try:
+            db.session.commit()
+        except IntegrityError:  # another worker migrated concurrently
+            db.session.rollback()
+    with contextlib.suppress(FileNotFoundError):
+        REGISTRY_FILE.replace(REGISTRY_FILE.with_name(REGISTRY_FILE.name + ".migrated"))
@@ -11,13 +11,24 @@ from pathlib import Path
 from typing import List, Tuple, Dict, Optional, Iterable
 import datetime
 
-from utils.sku_assigner import get_next_sku, peek_next_sku
+from utils.sku_assigner import get_next_sku, peek_next_sku, unallocated
+from utils import listing_store
+from utils.text import slugify
+from utils.listing_index import (
+    listing_index,
+    PROCESSED,
+    FINALISED as FINALISED_TREE,
+)
+from utils.composites import (
+    CompositeJob,
+    render_composites,
+    resize_image_for_long_edge,
+    apply_perspective_transform,
+)
 
 from dotenv import load_dotenv
 from flask import session
 from PIL import Image
-import cv2
-import numpy as np
 
 from config import (
     BASE_DIR,
@@ -35,6 +46,7 @@ from config import (
     GENERATE_SCRIPT_PATH,
     FILENAME_TEMPLATES,
     UPLOADS_TEMP_DIR,
+    SKU_LEASE_SIZE,
 )
 
 # ==============================
@@ -149,32 +161,6 @@ def relative_to_base(path: Path | str) -> str:
     return str(Path(path).resolve().relative_to(BASE_DIR))
 
 
-def resize_image_for_long_edge(image: Image.Image, target_long_edge: int = 2000) -> Image.Image:
-    """Resize image maintaining aspect ratio."""
-    width, height = image.size
-    if width > height:
-        new_width = target_long_edge
-        new_height = int(height * (target_long_edge / width))
-    else:
-        new_height = target_long_edge
-        new_width = int(width * (target_long_edge / height))
-    return image.resize((new_width, new_height), Image.LANCZOS)
-
-
-def apply_perspective_transform(art_img: Image.Image, mockup_img: Image.Image, dst_coords: list) -> Image.Image:
-    """Overlay artwork onto mockup using perspective transform."""
-    w, h = art_img.size
-    src_points = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
-    dst_points = np.float32(dst_coords)
-    matrix = cv2.getPerspectiveTransform(src_points, dst_points)
-    art_np = np.array(art_img)
-    warped = cv2.warpPerspective(art_np, matrix, (mockup_img.width, mockup_img.height))
-    mask = np.any(warped > 0, axis=-1).astype(np.uint8) * 255
-    mask = Image.fromarray(mask).convert("L")
-    composite = Image.composite(Image.fromarray(warped), mockup_img, mask)
-    return composite
-
-
 def latest_composite_folder() -> Optional[str]:
     """Return the most recent composite output folder name."""
     latest_time = 0
@@ -194,27 +180,13 @@ def latest_composite_folder() -> Optional[str]:
 
 def latest_analyzed_artwork() -> Optional[Dict[str, str]]:
     """Return info about the most recently analysed artwork."""
-    latest_time = 0
-    latest_info = None
-    for folder in ARTWORK_PROCESSED_DIR.iterdir():
-        if not folder.is_dir():
-            continue
-        listing = folder / f"{folder.name}-listing.json"
-        if not listing.exists():
-            continue
-        t = listing.stat().st_mtime
-        if t > latest_time:
-            latest_time = t
-            try:
-                with open(listing, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                latest_info = {
-                    "aspect": data.get("aspect_ratio"),
-                    "filename": data.get("filename"),
-                }
-            except Exception:
-                continue
-    return latest_info
+    latest = listing_index.latest()
+    if not latest:
+        return None
+    return {
+        "aspect": latest.data.get("aspect_ratio"),
+        "filename": latest.data.get("filename"),
+    }
 
 
 def clean_display_text(text: str) -> str:
@@ -233,13 +205,6 @@ def build_full_listing_text(ai_desc: str, generic_text: str) -> str:
     return clean_display_text(combined)
 
 
-def slugify(text: str) -> str:
-    """Return a slug suitable for filenames."""
-    text = re.sub(r"[^\w\- ]+", "", text)
-    text = text.strip().replace(" ", "-")
-    return re.sub("-+", "-", text).lower()
-
-
 def prettify_slug(slug: str) -> str:
     """Return a human friendly title from a slug or filename."""
     name = os.path.splitext(slug)[0]
@@ -252,27 +217,19 @@ def list_processed_artworks() -> Tuple[List[Dict], set]:
     """Collect processed artworks and set of original filenames."""
     items: List[Dict] = []
     processed_names: set = set()
-    for folder in ARTWORK_PROCESSED_DIR.iterdir():
-        if not folder.is_dir():
-            continue
-        listing_path = folder / f"{folder.name}-listing.json"
-        if not listing_path.exists():
-            continue
-        try:
-            with open(listing_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except Exception:
-            continue
+    for record in listing_index.records(PROCESSED):
+        data = record.data
+        name = record.seo_folder
         original_name = data.get("filename")
         if original_name:
             processed_names.add(original_name)
         items.append(
             {
-                "seo_folder": folder.name,
-                "filename": original_name or f"{folder.name}.jpg",
+                "seo_folder": name,
+                "filename": original_name or f"{name}.jpg",
                 "aspect": data.get("aspect_ratio", ""),
-                "title": data.get("title") or prettify_slug(folder.name),
-                "thumb": f"{folder.name}-THUMB.jpg",
+                "title": data.get("title") or prettify_slug(name),
+                "thumb": f"{name}-THUMB.jpg",
             }
         )
     items.sort(key=lambda x: x["title"].lower())
@@ -308,27 +265,18 @@ def list_ready_to_analyze(_: set) -> List[Dict]:
 def list_finalised_artworks() -> List[Dict]:
     """Return artworks that have been finalised."""
     items: List[Dict] = []
-    if FINALISED_DIR.exists():
-        for folder in FINALISED_DIR.iterdir():
-            if not folder.is_dir():
-                continue
-            listing_file = folder / f"{folder.name}-listing.json"
-            if not listing_file.exists():
-                continue
-            try:
-                with open(listing_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-            except Exception:
-                continue
-            items.append(
-                {
-                    "seo_folder": folder.name,
-                    "filename": data.get("filename", f"{folder.name}.jpg"),
-                    "aspect": data.get("aspect_ratio", ""),
-                    "title": data.get("title") or prettify_slug(folder.name),
-                    "thumb": f"{folder.name}-THUMB.jpg",
-                }
-            )
+    for record in listing_index.records(FINALISED_TREE):
+        data = record.data
+        name = record.seo_folder
+        items.append(
+            {
+                "seo_folder": name,
+                "filename": data.get("filename", f"{name}.jpg"),
+                "aspect": data.get("aspect_ratio", ""),
+                "title": data.get("title") or prettify_slug(name),
+                "thumb": f"{name}-THUMB.jpg",
+            }
+        )
     items.sort(key=lambda x: x["title"].lower())
     return items
 
@@ -336,40 +284,31 @@ def list_finalised_artworks() -> List[Dict]:
 def list_finalised_artworks_extended() -> List[Dict]:
     """Return detailed info for finalised artworks including locked state."""
     items: List[Dict] = []
-    if FINALISED_DIR.exists():
-        for folder in FINALISED_DIR.iterdir():
-            if not folder.is_dir():
-                continue
-            listing_file = folder / f"{folder.name}-listing.json"
-            if not listing_file.exists():
-                continue
-            try:
-                with open(listing_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-            except Exception:
-                continue
-            items.append(
-                {
-                    "seo_folder": folder.name,
-                    "title": data.get("title") or prettify_slug(folder.name),
-                    "description": data.get("description", ""),
-                    "sku": data.get("sku", ""),
-                    "primary_colour": data.get("primary_colour", ""),
-                    "secondary_colour": data.get("secondary_colour", ""),
-                    "price": data.get("price", ""),
-                    "seo_filename": data.get("seo_filename", f"{folder.name}.jpg"),
-                    "tags": data.get("tags", []),
-                    "materials": data.get("materials", []),
-                    "aspect": data.get("aspect_ratio", ""),
-                    "filename": data.get("filename", f"{folder.name}.jpg"),
-                    "locked": data.get("locked", False),
-                    "images": [
-                        str(p)
-                        for p in data.get("images", [])
-                        if (BASE_DIR / p).exists()
-                    ],
-                }
-            )
+    for record in listing_index.records(FINALISED_TREE):
+        data = record.data
+        name = record.seo_folder
+        items.append(
+            {
+                "seo_folder": name,
+                "title": data.get("title") or prettify_slug(name),
+                "description": data.get("description", ""),
+                "sku": data.get("sku", ""),
+                "primary_colour": data.get("primary_colour", ""),
+                "secondary_colour": data.get("secondary_colour", ""),
+                "price": data.get("price", ""),
+                "seo_filename": data.get("seo_filename", f"{name}.jpg"),
+                "tags": data.get("tags", []),
+                "materials": data.get("materials", []),
+                "aspect": data.get("aspect_ratio", ""),
+                "filename": data.get("filename", f"{name}.jpg"),
+                "locked": data.get("locked", False),
+                "images": [
+                    str(p)
+                    for p in data.get("images", [])
+                    if (BASE_DIR / p).exists()
+                ],
+            }
+        )
     items.sort(key=lambda x: x["title"].lower())
     return items
 
@@ -379,135 +318,123 @@ def find_seo_folder_from_filename(aspect: str, filename: str) -> str:
 
     This searches both processed and finalised outputs and compares the given
     base name against multiple permutations found in each listing file. If
-    multiple folders match, the most recently modified one is returned.
+    multiple folders match, the most recently modified one is returned. The
+    permutations are served from the reverse map in :mod:`utils.listing_index`.
     """
 
-    basename = Path(filename).stem.lower()
-    slug_base = slugify(basename)
-    candidates: list[tuple[float, str]] = []
+    return listing_index.find_seo_folder(filename)
 
-    for base in (ARTWORK_PROCESSED_DIR, FINALISED_DIR):
-        for folder in base.iterdir():
-            if not folder.is_dir():
-                continue
-            listing_file = folder / FILENAME_TEMPLATES["listing_json"].format(seo_slug=folder.name)
-            if not listing_file.exists():
-                continue
-            try:
-                with open(listing_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-            except Exception:
-                continue
-
-            stems = {
-                Path(data.get("filename", "")).stem.lower(),
-                Path(data.get("seo_filename", "")).stem.lower(),
-                folder.name.lower(),
-                slugify(Path(data.get("filename", "")).stem),
-                slugify(Path(data.get("seo_filename", "")).stem),
-                slugify(folder.name),
-            }
-
-            if basename in stems or slug_base in stems:
-                candidates.append((listing_file.stat().st_mtime, folder.name))
 
-    if not candidates:
-        raise FileNotFoundError(f"SEO folder not found for {filename}")
-
-    return max(candidates, key=lambda x: x[0])[1]
+def _listing_location(seo_folder: str) -> Optional[Tuple[Path, Path]]:
+    """Return ``(folder, listing_file)`` for a processed or finalised listing."""
+    for root in (ARTWORK_PROCESSED_DIR, FINALISED_DIR):
+        folder = root / seo_folder
+        listing_file = folder / f"{seo_folder}-listing.json"
+        if listing_file.exists():
+            return folder, listing_file
+    return None
 
 
-def regenerate_one_mockup(seo_folder: str, slot_idx: int) -> bool:
-    """Regenerate a single mockup in-place."""
-    folder = ARTWORK_PROCESSED_DIR / seo_folder
-    listing_file = folder / f"{seo_folder}-listing.json"
-    if not listing_file.exists():
-        folder = FINALISED_DIR / seo_folder
-        listing_file = folder / f"{seo_folder}-listing.json"
-        if not listing_file.exists():
-            return False
-    with open(listing_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    mockups = data.get("mockups", [])
-    if slot_idx < 0 or slot_idx >= len(mockups):
-        return False
-    entry = mockups[slot_idx]
+def _slot_category(entry) -> Optional[str]:
     if isinstance(entry, dict):
-        category = entry.get("category")
-    else:
-        category = Path(entry).parent.name
-    mockup_files = list((MOCKUPS_DIR / category).glob("*.png"))
-    if not mockup_files:
-        return False
-    new_mockup = random.choice(mockup_files)
+        return entry.get("category")
+    return Path(entry).parent.name
+
+
+def _render_slots(
+    seo_folder: str,
+    slots: Dict[int, str],
+    action: str,
+    data: Optional[Dict] = None,
+) -> Dict[int, bool]:
+    """Render random mockups from ``slots`` (``index -> category``) in one batch.
+
+    The artwork is decoded once for the whole batch. Rendering happens
+    outside the listing lock; the rendered slots are then applied in one
+    :func:`~utils.listing_store.listing_txn`, so edits saved meanwhile are
+    kept. ``data`` is the already loaded listing, if the caller has it.
+    Returns success per slot.
+    """
+    location = _listing_location(seo_folder)
+    if location is None:
+        return {idx: False for idx in slots}
+    folder, listing_file = location
+    if data is None:
+        data = listing_store.read(listing_file)
+    mockups = data.get("mockups", [])
     aspect = data.get("aspect_ratio")
-    coords_path = COORDS_ROOT / aspect / f"{new_mockup.stem}.json"
     art_path = folder / f"{seo_folder}.jpg"
-    output_path = folder / f"{seo_folder}-{new_mockup.stem}.jpg"
+    status = {idx: False for idx in slots}
+    planned: List[Tuple[int, str, Path]] = []
+    for idx, category in slots.items():
+        if idx < 0 or idx >= len(mockups) or not category:
+            continue
+        mockup_files = list((MOCKUPS_DIR / category).glob("*.png"))
+        if not mockup_files:
+            continue
+        planned.append((idx, category, random.choice(mockup_files)))
+    if not planned:
+        return status
+    jobs = [
+        CompositeJob(
+            mockup_path=mockup,
+            coords_path=COORDS_ROOT / aspect / f"{mockup.stem}.json",
+            output_path=folder / f"{seo_folder}-{mockup.stem}.jpg",
+        )
+        for _, _, mockup in planned
+    ]
     try:
-        with open(coords_path, "r", encoding="utf-8") as cf:
-            c = json.load(cf)["corners"]
-        dst = [[c[0]["x"], c[0]["y"]], [c[1]["x"], c[1]["y"]], [c[3]["x"], c[3]["y"]], [c[2]["x"], c[2]["y"]]]
-        art_img = Image.open(art_path).convert("RGBA")
-        art_img = resize_image_for_long_edge(art_img)
-        mock_img = Image.open(new_mockup).convert("RGBA")
-        composite = apply_perspective_transform(art_img, mock_img, dst)
-        composite.convert("RGB").save(output_path, "JPEG", quality=85)
-        data.setdefault("mockups", [])[slot_idx] = {
-            "category": category,
-            "source": f"{category}/{new_mockup.name}",
-            "composite": output_path.name,
+        outputs = render_composites(art_path, jobs)
+        rendered = {
+            idx: {
+                "category": category,
+                "source": f"{category}/{mockup.name}",
+                "composite": output.name,
+            }
+            for (idx, category, mockup), output in zip(planned, outputs)
+            if output is not None
         }
-        with open(listing_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
-        return True
+        if rendered:
+            with listing_store.listing_txn(listing_file) as txn:
+                current = txn.setdefault("mockups", [])
+                for idx, entry in rendered.items():
+                    if idx < len(current):
+                        current[idx] = entry
+                        status[idx] = True
     except Exception as e:
-        logging.error("Regenerate error: %s", e)
-        return False
+        logging.error("%s error: %s", action, e)
+        return {idx: False for idx in slots}
+    return status
 
 
-def swap_one_mockup(seo_folder: str, slot_idx: int, new_category: str) -> bool:
-    """Swap a mockup to a new category and regenerate."""
-    folder = ARTWORK_PROCESSED_DIR / seo_folder
-    listing_file = folder / f"{seo_folder}-listing.json"
-    if not listing_file.exists():
-        folder = FINALISED_DIR / seo_folder
-        listing_file = folder / f"{seo_folder}-listing.json"
-        if not listing_file.exists():
-            return False
-    with open(listing_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
+def regenerate_one_mockup(seo_folder: str, slot_idx: int) -> bool:
+    """Regenerate a single mockup in-place."""
+    location = _listing_location(seo_folder)
+    if location is None:
+        return False
+    data = listing_store.read(location[1])
     mockups = data.get("mockups", [])
     if slot_idx < 0 or slot_idx >= len(mockups):
         return False
-    mockup_files = list((MOCKUPS_DIR / new_category).glob("*.png"))
-    if not mockup_files:
-        return False
-    new_mockup = random.choice(mockup_files)
-    aspect = data.get("aspect_ratio")
-    coords_path = COORDS_ROOT / aspect / f"{new_mockup.stem}.json"
-    art_path = folder / f"{seo_folder}.jpg"
-    output_path = folder / f"{seo_folder}-{new_mockup.stem}.jpg"
-    try:
-        with open(coords_path, "r", encoding="utf-8") as cf:
-            c = json.load(cf)["corners"]
-        dst = [[c[0]["x"], c[0]["y"]], [c[1]["x"], c[1]["y"]], [c[3]["x"], c[3]["y"]], [c[2]["x"], c[2]["y"]]]
-        art_img = Image.open(art_path).convert("RGBA")
-        art_img = resize_image_for_long_edge(art_img)
-        mock_img = Image.open(new_mockup).convert("RGBA")
-        composite = apply_perspective_transform(art_img, mock_img, dst)
-        composite.convert("RGB").save(output_path, "JPEG", quality=85)
-        data.setdefault("mockups", [])[slot_idx] = {
-            "category": new_category,
-            "source": f"{new_category}/{new_mockup.name}",
-            "composite": output_path.name,
-        }
-        with open(listing_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
-        return True
-    except Exception as e:
-        logging.error("Swap error: %s", e)
-        return False
+    category = _slot_category(mockups[slot_idx])
+    return _render_slots(seo_folder, {slot_idx: category}, "Regenerate", data)[slot_idx]
+
+
+def regenerate_all_mockups(seo_folder: str) -> Dict[int, bool]:
+    """Regenerate every mockup slot of a listing in parallel."""
+    location = _listing_location(seo_folder)
+    if location is None:
+        return {}
+    data = listing_store.read(location[1])
+    slots = {
+        idx: _slot_category(entry) for idx, entry in enumerate(data.get("mockups", []))
+    }
+    return _render_slots(seo_folder, slots, "Regenerate", data)
+
+
+def swap_one_mockup(seo_folder: str, slot_idx: int, new_category: str) -> bool:
+    """Swap a mockup to a new category and regenerate."""
+    return _render_slots(seo_folder, {slot_idx: new_category}, "Swap")[slot_idx]
 
 
 def get_menu() -> List[Dict[str, str | None]]:
@@ -598,27 +525,32 @@ def listing_lock_info(listing: Path) -> tuple[bool, str | None, str | None, str
     return locked, locked_by, locked_at, reason
 
 
-def update_listing_lock(listing: Path, lock: bool, user: str, reason: str | None = None) -> None:
-    """Set or clear lock details on ``listing`` and manage ``.lock`` file."""
-    data = {}
-    if listing.exists():
-        try:
-            with open(listing, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except Exception:
-            pass
-    data["locked"] = lock
+def update_listing_lock(
+    listing: Path,
+    lock: bool,
+    user: str,
+    reason: str | None = None,
+    *,
+    txn: listing_store.ListingData | None = None,
+) -> None:
+    """Set or clear lock details on ``listing`` and manage ``.lock`` file.
+
+    Pass ``txn`` to apply the change to an open listing transaction.
+    """
+    if txn is None:
+        with listing_store.listing_txn(listing) as data:
+            update_listing_lock(listing, lock, user, reason, txn=data)
+        return
+    txn["locked"] = lock
     if lock:
-        data["locked_by"] = user
-        data["locked_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        txn["locked_by"] = user
+        txn["locked_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
         if reason:
-            data["lock_reason"] = reason
+            txn["lock_reason"] = reason
     else:
-        data.pop("locked_by", None)
-        data.pop("locked_at", None)
-        data.pop("lock_reason", None)
-    with open(listing, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+        txn.pop("locked_by", None)
+        txn.pop("locked_at", None)
+        txn.pop("lock_reason", None)
     lock_file = listing.parent / ".lock"
     if lock:
         lock_file.touch(exist_ok=True)
@@ -733,7 +665,11 @@ def find_aspect_filename_from_seo_folder(seo_folder: str) -> Optional[Tuple[str,
 
 
 def assign_or_get_sku(
-    listing_json_path: Path, tracker_path: Path, *, force: bool = False
+    listing_json_path: Path,
+    tracker_path: Path,
+    *,
+    force: bool = False,
+    txn: listing_store.ListingData | None = None,
 ) -> str:
     """Return existing SKU or assign the next sequential one.
 
@@ -745,47 +681,41 @@ def assign_or_get_sku(
         Path to ``sku_tracker.json`` storing ``last_sku``.
     force:
         If ``True`` always allocate a new SKU even if one exists.
+    txn:
+        An open :func:`utils.listing_store.listing_txn` for this listing. The
+        SKU is set on it and written when the caller's transaction ends;
+        without one the helper opens and commits its own.
     """
     listing_json_path = Path(listing_json_path)
     tracker_path = Path(tracker_path)
 
     logger = logging.getLogger(__name__)
 
-    if not listing_json_path.exists():
-        raise FileNotFoundError(listing_json_path)
+    if txn is None:
+        if not listing_json_path.exists():
+            raise FileNotFoundError(listing_json_path)
+        try:
+            with listing_store.listing_txn(listing_json_path) as data:
+                return assign_or_get_sku(
+                    listing_json_path, tracker_path, force=force, txn=data
+                )
+        except Exception as exc:  # pragma: no cover - unexpected IO
+            logger.error("Failed updating SKU in %s: %s", listing_json_path, exc)
+            raise
 
-    try:
-        with open(listing_json_path, "r", encoding="utf-8") as lf:
-            data = json.load(lf)
-    except Exception as exc:  # pragma: no cover - unexpected IO
-        logger.error("Failed reading %s: %s", listing_json_path, exc)
-        raise
-
-    existing = str(data.get("sku") or "").strip()
-    seo_field = str(data.get("seo_filename") or "").strip()
+    existing = str(txn.get("sku") or "").strip()
+    seo_field = str(txn.get("seo_filename") or "").strip()
     if existing and not force:
         new_seo = sync_filename_with_sku(seo_field, existing)
         if new_seo != seo_field:
-            data["seo_filename"] = new_seo
-            try:
-                with open(listing_json_path, "w", encoding="utf-8") as lf:
-                    json.dump(data, lf, indent=2, ensure_ascii=False)
-            except Exception as exc:  # pragma: no cover - unexpected IO
-                logger.error("Failed writing SEO filename to %s: %s", listing_json_path, exc)
-                raise
+            txn["seo_filename"] = new_seo
         return existing
 
     # Allocate the next SKU using the central assigner
     sku = get_next_sku(tracker_path)
-    data["sku"] = sku
+    txn["sku"] = sku
     if seo_field:
-        data["seo_filename"] = sync_filename_with_sku(seo_field, sku)
-    try:
-        with open(listing_json_path, "w", encoding="utf-8") as lf:
-            json.dump(data, lf, indent=2, ensure_ascii=False)
-    except Exception as exc:  # pragma: no cover - unexpected IO
-        logger.error("Failed writing SKU %s to %s: %s", sku, listing_json_path, exc)
-        raise
+        txn["seo_filename"] = sync_filename_with_sku(seo_field, sku)
 
     logger.info("Assigned SKU %s to %s", sku, listing_json_path.name)
     return sku
@@ -797,11 +727,15 @@ def assign_sequential_sku(listing_json_path: Path, tracker_path: Path) -> str:
 
 
 def validate_all_skus(listings: Iterable[Dict], tracker_path: Path) -> list[str]:
-    """Return a list of SKU validation errors for the given listings."""
-    tracker_last = 0
+    """Return a list of SKU validation errors for the given listings.
+
+    Duplicates and a lagging tracker are always reported. Numbers in the
+    tracker's ``free`` list are not gaps, and with ``SKU_LEASE_SIZE`` above 1
+    a gap is only reported when it is longer than one leased block.
+    """
+    tracker_last, free = 0, []
     try:
-        with open(tracker_path, "r", encoding="utf-8") as tf:
-            tracker_last = int(json.load(tf).get("last_sku", 0))
+        tracker_last, free = unallocated(tracker_path)
     except Exception:
         pass
 
@@ -823,8 +757,13 @@ def validate_all_skus(listings: Iterable[Dict], tracker_path: Path) -> list[str]
 
     if nums:
         nums.sort()
+        returned = {n for first, last in free for n in range(first, last + 1)}
+        # Leased blocks can leave gaps: a running worker holds the unused rest
+        # of its block until it exits, and a crashed worker never returns it.
+        # Such a gap is at most one block long, so only longer ones are errors.
+        allowed = SKU_LEASE_SIZE if SKU_LEASE_SIZE > 1 else 0
         for a, b in zip(nums, nums[1:]):
-            if b != a + 1:
+            if len(set(range(a + 1, b)) - returned) > allowed:
                 errors.append(f"Gap or out-of-sequence SKU between {a:04d} and {b:04d}")
                 break
         if nums[-1] > tracker_last:
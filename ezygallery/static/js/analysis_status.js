@@ -0,0 +1,133 @@
+/* ==========================================================================
+   File: analysis_status.js
+   Purpose: Queue analysis jobs from .analyze-form buttons and follow each
+            job's own progress. Polls every poll_interval seconds, long-polls
+            when the server offers max_wait, or uses server-sent events when
+            it offers a stream_url.
+   ========================================================================== */
+
+document.addEventListener('DOMContentLoaded', () => {
+    /**
+     * Create (or reuse) a progress row under the given form.
+     * @param {HTMLFormElement} form
+     * @returns {{bar: HTMLElement, txt: HTMLElement}}
+     */
+    function progressRow(form) {
+        let wrap = form.querySelector('.analysis-progress');
+        if (!wrap) {
+            wrap = document.createElement('div');
+            wrap.className = 'analysis-progress';
+            wrap.innerHTML =
+                '<div class="upload-progress"><div class="upload-progress-bar"></div></div>' +
+                '<span class="upload-percent"></span>';
+            form.appendChild(wrap);
+        }
+        return {
+            bar: wrap.querySelector('.upload-progress-bar'),
+            txt: wrap.querySelector('.upload-percent'),
+        };
+    }
+
+    /**
+     * Render one job state; returns true once the job has finished.
+     * Finished jobs with warnings show them and a link instead of redirecting.
+     * @param {Object} state JSON from /status/analyze/<job_id>
+     * @param {{bar: HTMLElement, txt: HTMLElement}} row
+     */
+    function render(state, row) {
+        row.bar.style.width = (state.percent || 0) + '%';
+        if (state.status === 'failed') {
+            row.txt.textContent = state.error || 'Analysis failed';
+            return true;
+        }
+        row.txt.textContent = state.step + ' ' + (state.percent || 0) + '%';
+        if (state.status === 'done') {
+            const warnings = (state.result && state.result.warnings) || [];
+            if (!warnings.length) {
+                if (state.redirect_url) window.location.href = state.redirect_url;
+                return true;
+            }
+            // Stay on the page so the warnings are read before moving on.
+            row.txt.textContent = warnings.join(' ');
+            if (state.redirect_url) {
+                const link = document.createElement('a');
+                link.href = state.redirect_url;
+                link.textContent = 'Continue to listing';
+                row.txt.append(' ', link);
+            }
+            return true;
+        }
+        return false;
+    }
+
+    /**
+     * Follow a job by polling its status URL; long-polls when max_wait > 0.
+     * @param {Object} job JSON from the queue request
+     * @param {{bar: HTMLElement, txt: HTMLElement}} row
+     * @param {number} since last version already rendered
+     */
+    function poll(job, row, since) {
+        const longPoll = job.max_wait > 0;
+        const url = longPoll
+            ? job.status_url + '?wait=' + job.max_wait + '&since=' + since
+            : job.status_url;
+        fetch(url)
+            .then(r => r.json())
+            .then(state => {
+                if (!state.status) throw new Error(state.error);
+                if (render(state, row)) return;
+                if (longPoll) {
+                    poll(job, row, state.version);
+                } else {
+                    const delay = (job.poll_interval || 2) * 1000;
+                    setTimeout(() => poll(job, row, state.version), delay);
+                }
+            })
+            .catch(err => { row.txt.textContent = err.message || 'Status unavailable'; });
+    }
+
+    /**
+     * Follow a job via SSE when offered, otherwise (or on error) poll.
+     * @param {Object} job JSON from the queue request
+     * @param {{bar: HTMLElement, txt: HTMLElement}} row
+     */
+    function follow(job, row) {
+        if (!job.stream_url || !window.EventSource) {
+            poll(job, row, -1);
+            return;
+        }
+        let since = -1;
+        let finished = false;
+        const source = new EventSource(job.stream_url);
+        source.onmessage = e => {
+            const state = JSON.parse(e.data);
+            since = state.version;
+            finished = render(state, row);
+            if (finished) source.close();
+        };
+        source.onerror = () => {
+            source.close();
+            if (!finished) poll(job, row, since);
+        };
+    }
+
+    document.querySelectorAll('form.analyze-form').forEach(form => {
+        form.addEventListener('submit', e => {
+            e.preventDefault();
+            const button = form.querySelector('button');
+            if (button) button.disabled = true;
+            const row = progressRow(form);
+            row.txt.textContent = 'Queued';
+            fetch(form.action, {method: 'POST', headers: {'Accept': 'application/json'}})
+                .then(r => r.json())
+                .then(res => {
+                    if (!res.status_url) throw new Error(res.error || 'Queue failed');
+                    follow(res, row);
+                })
+                .catch(err => {
+                    row.txt.textContent = err.message;
+                    if (button) button.disabled = false;
+                });
+        });
+    });
+});
@@ -1,8 +1,13 @@
 /* ==========================================================================
    File: upload.js
    Purpose: Handles drag-and-drop artwork uploads with progress feedback.
+            Files larger than one chunk go through the resumable
+            /upload/sessions API with several chunks in flight at once.
    ========================================================================== */
 
+const CHUNK_PARALLEL = 3;
+const CHUNK_RETRIES = 3;
+
 /**
  * Initialise upload handling once the DOM is ready.
  */
@@ -78,6 +83,102 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
+    /**
+     * Update a row's progress bar.
+     * @param {Object} row Row elements returned from createRow
+     * @param {number} p Percentage 0-100
+     */
+    function setProgress(row, p) {
+        row.bar.style.width = p + '%';
+        row.txt.textContent = p + '%';
+    }
+
+    /**
+     * Send JSON (or nothing) and parse a JSON reply, throwing on HTTP errors.
+     * @param {string} url
+     * @param {Object} opts fetch options
+     */
+    async function fetchJson(url, opts = {}) {
+        const headers = Object.assign({'Accept': 'application/json'}, opts.headers || {});
+        const resp = await fetch(url, Object.assign({}, opts, {headers}));
+        const body = await resp.json().catch(() => ({}));
+        if (!resp.ok) throw new Error(body.error || ('Error ' + resp.status));
+        return body;
+    }
+
+    /**
+     * Upload a file in chunks, resuming a previous session when possible.
+     * @param {File} file
+     * @param {Object} row Row elements returned from createRow
+     * @returns {Promise<boolean>} success indicator
+     */
+    async function uploadChunked(file, row) {
+        const key = 'upload-session:' + [file.name, file.size, file.lastModified].join(':');
+        let state = null;
+        const saved = localStorage.getItem(key);
+        if (saved) {
+            state = await fetchJson('/upload/sessions/' + saved).catch(() => null);
+        }
+        if (!state) {
+            state = await fetchJson('/upload/sessions', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({filename: file.name, size: file.size}),
+            });
+            localStorage.setItem(key, state.session_id);
+        }
+        const base = '/upload/sessions/' + state.session_id;
+        const queue = state.missing.slice();
+        let done = state.chunks - queue.length;
+        setProgress(row, Math.round(done / state.chunks * 100));
+
+        async function sendChunk(index) {
+            const start = index * state.chunk_size;
+            const blob = file.slice(start, Math.min(start + state.chunk_size, file.size));
+            for (let attempt = 1; ; attempt++) {
+                try {
+                    await fetchJson(base + '/chunks/' + index, {method: 'PUT', body: blob});
+                    return;
+                } catch (err) {
+                    if (attempt >= CHUNK_RETRIES) throw err;
+                }
+            }
+        }
+
+        async function worker() {
+            while (queue.length) {
+                await sendChunk(queue.shift());
+                done += 1;
+                setProgress(row, Math.round(done / state.chunks * 100));
+            }
+        }
+
+        await Promise.all(Array.from({length: CHUNK_PARALLEL}, worker));
+        row.txt.textContent = 'Processing...';
+        const res = await fetchJson(base + '/complete', {method: 'POST'});
+        localStorage.removeItem(key);
+        row.txt.textContent = res.success ? 'Uploaded!' : (res.error || 'Failed');
+        row.li.classList.add(res.success ? 'success' : 'error');
+        return !!res.success;
+    }
+
+    /**
+     * Upload a file, using chunks when it is larger than one chunk.
+     * @param {File} file
+     * @param {Object} row Row elements returned from createRow
+     * @returns {Promise<boolean>} success indicator
+     */
+    function sendFile(file, row) {
+        if (file.size <= (window.UPLOAD_CHUNK_BYTES || 4 * 1024 * 1024)) {
+            return uploadFile(file, row);
+        }
+        return uploadChunked(file, row).catch(err => {
+            row.li.classList.add('error');
+            row.txt.textContent = err.message + ' (drop the file again to resume)';
+            return false;
+        });
+    }
+
     /**
      * Preview and upload a set of files.
      * @param {FileList|File[]} files
@@ -89,7 +190,7 @@ document.addEventListener('DOMContentLoaded', () => {
         overlay.classList.add('active');
         zone.classList.add('disabled');
         for (const row of rows) {
-            await uploadFile(row.file, row);
+            await sendFile(row.file, row);
         }
         overlay.classList.remove('active');
         zone.classList.remove('disabled');
@@ -0,0 +1,132 @@
+"""Warm worker processes for the analysis and composite generation scripts.
+
+Each analysis used to fork a fresh ``python3`` for ``ANALYZE_SCRIPT_PATH`` and
+another for ``GENERATE_SCRIPT_PATH``, paying interpreter start-up plus the
+OpenCV/NumPy/PIL/OpenAI imports on every artwork. :func:`run_script` instead
+executes the script in a process forked from :mod:`utils.worker_pool`'s fork
+server, which has those libraries imported already. The server also imports
+:mod:`utils.analysis_warmup`, so the scripts themselves, the OpenAI clients
+and the decoded mockups are built once and inherited by every run rather
+than rebuilt in each fresh worker. Scripts that live in the
+``scripts`` package and expose ``main()`` are imported and their ``main`` is
+called with ``sys.argv`` patched; any other script is executed with
+:mod:`runpy` as ``__main__``.
+
+Every call gets a process of its own. A script that exceeds its timeout is
+killed alone, and concurrent analyses (which may be paying for OpenAI calls)
+carry on undisturbed.
+
+The result is a :class:`subprocess.CompletedProcess` so callers are unchanged.
+When the engine is disabled (``ANALYSIS_ENGINE_IN_PROCESS=false``) or no
+worker process can be started, the script is run with ``subprocess.run`` as
+before. A worker that dies mid-script is reported as a failed run rather than
+retried.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import importlib
+import io
+import logging
+import os
+import runpy
+import subprocess
+import sys
+import traceback
+from pathlib import Path
+from typing import Optional, Sequence
+
+from config import BASE_DIR, ANALYSIS_ENGINE_IN_PROCESS
+from utils import worker_pool
+
+logger = logging.getLogger(__name__)
+
+worker_pool.preload("utils.analysis_warmup")
+
+
+# --- Worker process side -------------------------------------------------
+
+
+def _module_for(script: Path) -> Optional[str]:
+    """Return ``scripts.<stem>`` if ``script`` lives in the project package."""
+    try:
+        rel = script.resolve().relative_to(BASE_DIR)
+    except ValueError:
+        return None
+    if rel.suffix != ".py" or rel.parts[0] != "scripts":
+        return None
+    return ".".join(rel.with_suffix("").parts)
+
+
+def _execute(script: str, args: Sequence[str], cwd: Optional[str]) -> tuple[int, str, str]:
+    """Run ``script`` as if invoked from the command line; capture its output."""
+    out, err = io.StringIO(), io.StringIO()
+    old_argv, old_cwd = sys.argv, os.getcwd()
+    code = 0
+    sys.argv = [script, *args]
+    try:
+        if cwd:
+            os.chdir(cwd)
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            try:
+                module_name = _module_for(Path(script))
+                module = importlib.import_module(module_name) if module_name else None
+                main = getattr(module, "main", None)
+                if callable(main):
+                    result = main()
+                    code = result if isinstance(result, int) else 0
+                else:
+                    runpy.run_path(script, run_name="__main__")
+            except SystemExit as exc:
+                if isinstance(exc.code, int):
+                    code = exc.code
+                elif exc.code is not None:
+                    err.write(f"{exc.code}\n")
+                    code = 1
+            except BaseException:  # noqa: BLE001 - mirror a crashed interpreter
+                traceback.print_exc(file=err)
+                code = 1
+    finally:
+        sys.argv = old_argv
+        os.chdir(old_cwd)
+    return code, out.getvalue(), err.getvalue()
+
+
+# --- Parent side ---------------------------------------------------------
+
+
+def _run_subprocess(script: Path, args: Sequence[str], timeout: float, cwd) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        ["python3", str(script), *args],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        timeout=timeout,
+        cwd=cwd,
+    )
+
+
+def run_script(
+    script: Path, args: Sequence[str], *, timeout: float, cwd: Path | str | None = None
+) -> subprocess.CompletedProcess:
+    """Run ``script`` with ``args`` in a warm worker, or as a subprocess fallback.
+
+    Raises :class:`subprocess.TimeoutExpired` if the script exceeds ``timeout``.
+    """
+    cmd = ["python3", str(script), *args]
+    if not ANALYSIS_ENGINE_IN_PROCESS:
+        return _run_subprocess(script, args, timeout, cwd)
+    try:
+        code, stdout, stderr = worker_pool.run_isolated(
+            _execute, [str(script), list(args), str(cwd) if cwd else None], timeout=timeout
+        )
+    except TimeoutError:
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    except worker_pool.WorkerCrashed as exc:
+        # The script may already have made paid API calls; report, don't re-run.
+        return subprocess.CompletedProcess(cmd, exc.exitcode or 1, "", f"{exc}\n")
+    except worker_pool.PoolUnavailable as exc:
+        logger.warning("Analysis engine unavailable, using subprocess: %s", exc)
+        return _run_subprocess(script, args, timeout, cwd)
+    return subprocess.CompletedProcess(cmd, code, stdout, stderr)
@@ -0,0 +1,80 @@
+"""Shared state the fork server builds once for every worker process.
+
+:mod:`utils.analysis_engine` adds this module to
+:data:`utils.worker_pool.PRELOAD`, so it is imported in the fork server, not
+in the web worker. Every process forked for
+:func:`utils.analysis_engine.run_script` or the composite pool then starts
+with:
+
+* the analysis and composite scripts imported, including whatever
+  module-level setup they do;
+* the OpenAI clients of :mod:`utils.openai_utils` and
+  :mod:`utils.ai_services` constructed (no connection is opened until a
+  worker makes a request, so none is shared across processes);
+* the categorised mockups and their corner files decoded into
+  :data:`utils.mockup_cache.mockup_cache`, up to its byte bound.
+
+The fork server only tolerates ``ImportError`` from a preloaded module, so
+each step logs its failure and leaves that piece to be built on demand. The
+server must stay single-threaded, so nothing imported here may start a
+thread at import time.
+"""
+
+from __future__ import annotations
+
+import importlib
+import logging
+
+from config import (
+    ANALYZE_SCRIPT_PATH,
+    COORDS_DIR,
+    GENERATE_SCRIPT_PATH,
+    MOCKUPS_CATEGORISED_DIR,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _import_scripts() -> None:
+    from utils.analysis_engine import _module_for
+
+    for script in (ANALYZE_SCRIPT_PATH, GENERATE_SCRIPT_PATH):
+        name = _module_for(script)
+        if name:
+            importlib.import_module(name)
+
+
+def _build_clients() -> None:
+    # ai_services builds its client at import; openai_utils builds it lazily.
+    from utils import ai_services, openai_utils  # noqa: F401
+
+    if openai_utils.OPENAI_API_KEY:
+        openai_utils._get_client()
+
+
+def _decode_mockups() -> int:
+    from utils.mockup_cache import mockup_cache
+
+    aspect = MOCKUPS_CATEGORISED_DIR.name.replace("-categorised", "")
+    loaded = 0
+    for mockup in sorted(MOCKUPS_CATEGORISED_DIR.glob("*/*.png")):
+        if mockup_cache.bytes >= mockup_cache.max_bytes:
+            break
+        mockup_cache.mockup(mockup)
+        coords = COORDS_DIR / aspect / f"{mockup.stem}.json"
+        if coords.exists():
+            mockup_cache.corners(coords)
+        loaded += 1
+    return loaded
+
+
+def warm() -> None:
+    """Run every warm-up step, logging (not raising) failures."""
+    for step in (_import_scripts, _build_clients, _decode_mockups):
+        try:
+            step()
+        except Exception as exc:  # noqa: BLE001 - must not kill the fork server
+            logger.warning("Worker warm-up step %s failed: %s", step.__name__, exc)
+
+
+warm()
@@ -0,0 +1,270 @@
+"""Mockup composite rendering, one slot or a whole listing at a time.
+
+A listing has up to nine mockup slots and each composite is a LANCZOS resize,
+a perspective warp and a blend on a single core. :func:`render_composites`
+takes one artwork and a batch of :class:`CompositeJob` entries, decodes and
+resizes the artwork once, places the pixels in a shared memory block and
+renders the slots in the ``composites`` pool of :mod:`utils.worker_pool`,
+whose workers are forked from a clean fork server rather than from the
+threaded web worker. Workers map that block read-only instead of receiving a
+pickled copy of the artwork per slot.
+
+Single-slot batches (regenerate/swap) skip the pool and render in-process.
+Mockup templates and corner files come from :mod:`utils.mockup_cache` as
+decoded arrays rather than being re-read for every slot.
+
+Artworks are always resized to a 2000px long edge, so the homography for a
+given corner set and artwork size never changes. :func:`warp_plan` computes
+it once together with the destination bounding box (ROI), and the artwork is
+warped only into that box instead of a full mockup-sized canvas, then
+alpha-blended into the output with NumPy using per-thread scratch buffers.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import logging
+import math
+import threading
+from functools import lru_cache
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from config import COMPOSITE_WORKERS, COMPOSITE_JPEG_QUALITY
+from utils import worker_pool
+from utils.mockup_cache import mockup_cache
+
+logger = logging.getLogger(__name__)
+
+Image.MAX_IMAGE_PIXELS = None
+
+ART_LONG_EDGE = 2000
+
+Corners = Tuple[Tuple[float, float], ...]
+
+POOL_NAME = "composites"
+
+_local = threading.local()
+
+
+@dataclass(frozen=True)
+class CompositeJob:
+    """One mockup slot to render: template, its corner file and the output."""
+
+    mockup_path: Path
+    coords_path: Path
+    output_path: Path
+
+
+def resize_image_for_long_edge(image: Image.Image, target_long_edge: int = ART_LONG_EDGE) -> Image.Image:
+    """Resize image maintaining aspect ratio."""
+    width, height = image.size
+    if width > height:
+        new_width = target_long_edge
+        new_height = int(height * (target_long_edge / width))
+    else:
+        new_height = target_long_edge
+        new_width = int(width * (target_long_edge / height))
+    return image.resize((new_width, new_height), Image.LANCZOS)
+
+
+@dataclass(frozen=True)
+class WarpPlan:
+    """Homography into the destination ROI and the ROI on the mockup canvas."""
+
+    matrix: np.ndarray
+    x0: int
+    y0: int
+    x1: int
+    y1: int
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.x1 - self.x0, self.y1 - self.y0
+
+
+@lru_cache(maxsize=4096)
+def _plan(dst: Corners, art_size: Tuple[int, int], canvas_size: Tuple[int, int]) -> WarpPlan:
+    w, h = art_size
+    cw, ch = canvas_size
+    xs = [x for x, _ in dst]
+    ys = [y for _, y in dst]
+    x0 = min(max(math.floor(min(xs)), 0), cw)
+    y0 = min(max(math.floor(min(ys)), 0), ch)
+    x1 = max(min(math.ceil(max(xs)) + 1, cw), x0)
+    y1 = max(min(math.ceil(max(ys)) + 1, ch), y0)
+    src_points = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
+    dst_points = np.float32(dst) - np.float32([x0, y0])
+    matrix = cv2.getPerspectiveTransform(src_points, dst_points)
+    matrix.flags.writeable = False
+    return WarpPlan(matrix, x0, y0, x1, y1)
+
+
+def warp_plan(dst, art_shape: tuple, canvas_shape: tuple) -> WarpPlan:
+    """Return the memoised :class:`WarpPlan` for corners and image shapes.
+
+    ``art_shape``/``canvas_shape`` are NumPy ``(height, width, ...)`` shapes.
+    """
+    corners = tuple((float(x), float(y)) for x, y in np.asarray(dst).tolist())
+    return _plan(corners, (art_shape[1], art_shape[0]), (canvas_shape[1], canvas_shape[0]))
+
+
+def _scratch(name: str, shape: tuple, dtype=np.uint8) -> np.ndarray:
+    """Return a per-thread scratch buffer, reallocated only if the shape changes."""
+    buffers = _local.__dict__.setdefault("buffers", {})
+    buf = buffers.get(name)
+    if buf is None or buf.shape != shape or buf.dtype != dtype:
+        buf = buffers[name] = np.empty(shape, dtype=dtype)
+    return buf
+
+
+def _blend_into(roi: np.ndarray, warped: np.ndarray) -> None:
+    """Alpha-blend RGBA ``warped`` over ``roi`` in place using its alpha channel.
+
+    Transparency comes only from the warp (pixels outside the artwork and its
+    anti-aliased edges), so dark artwork pixels are no longer punched out.
+    """
+    shape = warped.shape[:2] + (3,)
+    alpha = warped[..., 3:4]
+    inv = _scratch("inv", warped.shape[:2] + (1,), np.uint16)
+    acc = _scratch("acc", shape, np.uint16)
+    tmp = _scratch("tmp", shape, np.uint16)
+    np.subtract(255, alpha, out=inv, dtype=np.uint16)
+    np.multiply(warped[..., :3], alpha, out=acc, dtype=np.uint16)
+    np.multiply(roi[..., :3], inv, out=tmp, dtype=np.uint16)
+    np.add(acc, tmp, out=acc)
+    np.add(acc, 127, out=acc)
+    np.floor_divide(acc, 255, out=acc)
+    np.copyto(roi[..., :3], acc, casting="unsafe")
+    if roi.shape[2] == 4:
+        # Standard "over" for the alpha channel of RGBA outputs.
+        np.multiply(roi[..., 3:4], inv, out=inv, dtype=np.uint16)
+        np.floor_divide(inv, 255, out=inv)
+        np.add(inv, alpha, out=inv)
+        np.copyto(roi[..., 3:4], inv, casting="unsafe")
+
+
+def _composite(
+    art_np: np.ndarray, mock_np: np.ndarray, dst: np.ndarray, out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Warp RGBA ``art_np`` onto ``mock_np`` at ``dst`` and return ``out``.
+
+    ``out`` is filled with the mockup's channels (3 for RGB output, 4 for
+    RGBA) and then blended; a new array is allocated if it is not given.
+    """
+    if out is None:
+        out = np.empty(mock_np.shape, dtype=np.uint8)
+    channels = out.shape[2]
+    np.copyto(out, mock_np[..., :channels])
+    plan = warp_plan(dst, art_np.shape, mock_np.shape)
+    width, height = plan.size
+    if width == 0 or height == 0:
+        return out
+    warped = _scratch("warped", (height, width, 4))
+    cv2.warpPerspective(
+        art_np,
+        plan.matrix,
+        plan.size,
+        dst=warped,
+        flags=cv2.INTER_LINEAR,
+        borderMode=cv2.BORDER_CONSTANT,
+        borderValue=(0, 0, 0, 0),
+    )
+    _blend_into(out[plan.y0:plan.y1, plan.x0:plan.x1], warped)
+    return out
+
+
+def apply_perspective_transform(art_img: Image.Image, mockup_img: Image.Image, dst_coords: list) -> Image.Image:
+    """Overlay artwork onto mockup using perspective transform."""
+    art_np = np.asarray(art_img.convert("RGBA"))
+    mock_np = np.asarray(mockup_img.convert("RGBA"))
+    return Image.fromarray(_composite(art_np, mock_np, dst_coords))
+
+
+def load_artwork(art_path: Path) -> np.ndarray:
+    """Decode ``art_path`` once and resize it for compositing (RGBA array)."""
+    with Image.open(art_path) as img:
+        art = resize_image_for_long_edge(img.convert("RGBA"))
+    return np.asarray(art)
+
+
+def _render(art_np: np.ndarray, job: CompositeJob) -> Path:
+    dst = mockup_cache.corners(job.coords_path)
+    mock_np = mockup_cache.mockup(job.mockup_path)
+    # Render straight to RGB in a reused buffer; JPEG drops alpha anyway.
+    out = _scratch("out", mock_np.shape[:2] + (3,))
+    _composite(art_np, mock_np, dst, out=out)
+    Image.fromarray(out).save(job.output_path, "JPEG", quality=COMPOSITE_JPEG_QUALITY)
+    return job.output_path
+
+
+def _render_shared(shm_name: str, shape: tuple, job: CompositeJob) -> Path:
+    """Pool task: render ``job`` against the artwork in shared memory."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    art_np = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    art_np.flags.writeable = False
+    try:
+        return _render(art_np, job)
+    finally:
+        del art_np  # release the view so the mapping can close
+        shm.close()
+
+
+def _render_serial(art_np: np.ndarray, jobs: Sequence[CompositeJob]) -> List[Optional[Path]]:
+    results: List[Optional[Path]] = []
+    for job in jobs:
+        try:
+            results.append(_render(art_np, job))
+        except Exception as exc:  # noqa: BLE001
+            logger.error("Composite error for %s: %s", job.mockup_path.name, exc)
+            results.append(None)
+    return results
+
+
+def render_composites(art_path: Path, jobs: Sequence[CompositeJob]) -> List[Optional[Path]]:
+    """Render every job against the artwork at ``art_path``.
+
+    Returns the output path per job, in order, or ``None`` for slots that
+    failed. Failures are logged and never abort the rest of the batch.
+    """
+    if not jobs:
+        return []
+    art_np = load_artwork(art_path)
+    if len(jobs) == 1 or COMPOSITE_WORKERS <= 1:
+        return _render_serial(art_np, jobs)
+
+    shm = shared_memory.SharedMemory(create=True, size=art_np.nbytes)
+    try:
+        shared = np.ndarray(art_np.shape, dtype=np.uint8, buffer=shm.buf)
+        shared[:] = art_np
+        del shared
+        try:
+            pool = worker_pool.executor(POOL_NAME, COMPOSITE_WORKERS)
+            futures = [pool.submit(_render_shared, shm.name, art_np.shape, job) for job in jobs]
+        except (BrokenProcessPool, OSError, RuntimeError) as exc:
+            logger.warning("Composite pool unavailable, rendering serially: %s", exc)
+            worker_pool.discard(POOL_NAME)
+            return _render_serial(art_np, jobs)
+        results: List[Optional[Path]] = []
+        for job, future in zip(jobs, futures):
+            try:
+                results.append(future.result())
+            except BrokenProcessPool as exc:
+                logger.warning("Composite pool broke, rendering %s serially: %s", job.mockup_path.name, exc)
+                worker_pool.discard(POOL_NAME)
+                results.extend(_render_serial(art_np, [job]))
+            except Exception as exc:  # noqa: BLE001
+                logger.error("Composite error for %s: %s", job.mockup_path.name, exc)
+                results.append(None)
+        return results
+    finally:
+        shm.close()
+        with contextlib.suppress(FileNotFoundError):
+            shm.unlink()
@@ -0,0 +1,290 @@
+"""Content-addressed index of uploads used to catch repeat uploads.
+
+Every upload used to get a fresh ``slugify(stem)-uuid8`` name and go through
+QC, OpenAI analysis and composite generation even when the same artwork was
+already in the library. Each accepted upload now records a
+:class:`~models.ContentHash` row with the SHA-256 of the original bytes and the
+dHash/pHash of its analyse frame. The row is linked to its ``seo_folder`` once
+analysis places it, and :func:`forget` drops it when the folder is deleted, so
+a deleted artwork can be uploaded again. A row without a folder only counts
+while its upload is still waiting in ``UPLOADS_TEMP_DIR``; once the temp
+files are gone (never analysed, or cleaned up) lookups ignore it and the
+``content-backfill`` job deletes it.
+
+The same job, scheduled through :func:`utils.job_queue.every` rather than
+queued on every start, adds rows for processed and finalised listings that
+have none. Those rows hash the processed ``{seo}.jpg`` because the original
+upload is no longer kept, so their SHA-256 does not match a re-upload of the
+original file; such re-uploads are caught by pHash as near duplicates.
+
+During an upload batch a :class:`DedupBatch` answers two questions:
+
+* :meth:`DedupBatch.claim` - is this byte-identical to something we have
+  (including earlier files of the same batch)? Depending on
+  ``UPLOAD_DEDUP_MODE`` the upload is rejected before any derivatives are
+  built (``reject``) or only flagged (``flag``). Each file is one lookup on
+  the ``sha256`` index.
+* :meth:`DedupBatch.similar` - which entries are within
+  ``UPLOAD_SIMILAR_MAX_DISTANCE`` bits of its pHash? Each pHash is also
+  stored as eight 8-bit :class:`~models.PHashBand` rows. Two hashes at most 7
+  bits apart share at least one byte, so one indexed ``(band, value)``
+  lookup yields every candidate, and only those are compared bit by bit.
+  Near duplicates are only ever flagged.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+from sqlalchemy import and_, or_, select
+
+from config import (
+    CONTENT_BACKFILL_INTERVAL_HOURS,
+    FILENAME_TEMPLATES,
+    UPLOAD_SIMILAR_MAX_DISTANCE,
+    UPLOADS_TEMP_DIR,
+)
+from models import db, ContentHash, PHashBand
+from utils import job_queue
+from utils.image_hash import dhash, phash, hamming, to_signed, to_unsigned
+from utils.listing_index import listing_index, PROCESSED, FINALISED
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_KIND = "content-backfill"
+BANDS = 8
+# The band index only guarantees recall up to BANDS - 1 differing bits.
+MAX_DISTANCE = min(UPLOAD_SIMILAR_MAX_DISTANCE, BANDS - 1)
+
+_hashes = ContentHash.__table__
+_bands = PHashBand.__table__
+
+
+@dataclass
+class Fingerprint:
+    """SHA-256 of the original file plus perceptual hashes of its image."""
+
+    sha256: str
+    dhash: int
+    phash: int
+
+
+def fingerprint_image(sha256: str, img: Image.Image) -> Fingerprint:
+    """Build a :class:`Fingerprint` from a digest and a decoded frame."""
+    return Fingerprint(sha256, dhash(img), phash(img))
+
+
+def phash_bands(value: int) -> List[int]:
+    """Split an unsigned 64-bit pHash into its ``BANDS`` byte values."""
+    return [(value >> (8 * band)) & 0xFF for band in range(BANDS)]
+
+
+def _is_live(row) -> bool:
+    """True for rows with a listing folder or whose upload still awaits analysis."""
+    if row.seo_folder:
+        return True
+    if not row.upload_id:
+        return False
+    return (UPLOADS_TEMP_DIR / f"{row.upload_id}.qc.json").exists()
+
+
+def _band_rows(row: ContentHash) -> List[PHashBand]:
+    return [
+        PHashBand(content_hash=row, band=band, value=value)
+        for band, value in enumerate(phash_bands(to_unsigned(row.phash)))
+    ]
+
+
+class DedupBatch:
+    """Duplicate lookups for one upload request.
+
+    Lookups go through the engine rather than the request's session, so
+    :meth:`claim` can run in the batch's worker threads. It is thread-safe
+    and also catches duplicates among files of the same batch.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._engine = db.engine
+        self._claimed: Dict[str, dict] = {}
+
+    def _describe(self, row) -> dict:
+        return {
+            "upload_id": row.upload_id,
+            "seo_folder": row.seo_folder,
+            "filename": row.filename,
+        }
+
+    def claim(self, sha256: str, upload_id: str, filename: str) -> Optional[dict]:
+        """Return the existing match for ``sha256`` or register this upload."""
+        with self._lock:
+            match = self._claimed.get(sha256)
+            if match is not None:
+                return match
+            self._claimed[sha256] = {
+                "upload_id": upload_id,
+                "seo_folder": None,
+                "filename": filename,
+            }
+        with self._engine.connect() as conn:
+            rows = conn.execute(
+                select(_hashes.c.upload_id, _hashes.c.seo_folder, _hashes.c.filename)
+                .where(_hashes.c.sha256 == sha256)
+                .order_by(_hashes.c.id)
+            ).all()
+        row = next((r for r in rows if _is_live(r)), None)
+        if row is None:
+            return None
+        match = self._describe(row)
+        with self._lock:
+            self._claimed[sha256] = match
+        return match
+
+    def similar(self, value: int, exclude_upload: str | None = None) -> List[dict]:
+        """Return known images within the near-duplicate distance of ``value``."""
+        probe = or_(
+            *(
+                and_(_bands.c.band == band, _bands.c.value == byte)
+                for band, byte in enumerate(phash_bands(value))
+            )
+        )
+        candidates = select(_bands.c.content_hash_id).where(probe)
+        with self._engine.connect() as conn:
+            rows = conn.execute(
+                select(
+                    _hashes.c.phash,
+                    _hashes.c.upload_id,
+                    _hashes.c.seo_folder,
+                    _hashes.c.filename,
+                )
+                .where(_hashes.c.id.in_(candidates))
+                .order_by(_hashes.c.id)
+            ).all()
+        if not rows:
+            return []
+        phashes = np.array([to_unsigned(row.phash) for row in rows], dtype=np.uint64)
+        distances = hamming(phashes, value)
+        hits = np.flatnonzero(distances <= MAX_DISTANCE)
+        matches = []
+        for idx in hits[np.argsort(distances[hits], kind="stable")]:
+            row = rows[idx]
+            if exclude_upload and row.upload_id == exclude_upload:
+                continue
+            if not _is_live(row):
+                continue
+            matches.append({**self._describe(row), "distance": int(distances[idx])})
+        return matches
+
+
+def record(fp: Fingerprint, upload_id: str, filename: str) -> ContentHash:
+    """Add a row for an accepted upload; committed by the caller."""
+    row = ContentHash(
+        sha256=fp.sha256,
+        dhash=to_signed(fp.dhash),
+        phash=to_signed(fp.phash),
+        upload_id=upload_id,
+        filename=filename,
+    )
+    db.session.add(row)
+    db.session.add_all(_band_rows(row))
+    return row
+
+
+def assign_folder(upload_id: str, seo_folder: str) -> None:
+    """Link an analysed upload's fingerprint to its listing folder."""
+    ContentHash.query.filter_by(upload_id=upload_id).update({"seo_folder": seo_folder})
+    db.session.commit()
+
+
+def _delete(where) -> int:
+    """Delete the hash rows matching ``where`` and their bands."""
+    ids = select(_hashes.c.id).where(where)
+    db.session.execute(_bands.delete().where(_bands.c.content_hash_id.in_(ids)))
+    return db.session.execute(_hashes.delete().where(where)).rowcount
+
+
+def forget(seo_folder: str) -> int:
+    """Drop the fingerprints of a deleted listing folder. Returns the count."""
+    removed = _delete(_hashes.c.seo_folder == seo_folder)
+    db.session.commit()
+    return removed
+
+
+def _expire_orphans() -> int:
+    """Delete folderless rows whose temp upload no longer exists."""
+    rows = db.session.execute(
+        select(_hashes.c.id, _hashes.c.upload_id, _hashes.c.seo_folder).where(
+            _hashes.c.seo_folder.is_(None)
+        )
+    ).all()
+    stale = [row.id for row in rows if not _is_live(row)]
+    removed = _delete(_hashes.c.id.in_(stale)) if stale else 0
+    db.session.commit()
+    return removed
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@job_queue.register(BACKFILL_KIND)
+def backfill_library(job_id: int, payload: dict, progress) -> dict:
+    """Fingerprint listings that have no row yet and expire orphaned uploads."""
+    expired = _expire_orphans()
+    known = {
+        folder for (folder,) in db.session.query(ContentHash.seo_folder).distinct()
+    }
+    records = listing_index.records(PROCESSED) + listing_index.records(FINALISED)
+    pending = [r for r in records if r.seo_folder not in known]
+    added = 0
+    for idx, rec in enumerate(pending, start=1):
+        seo = rec.seo_folder
+        art = rec.folder / FILENAME_TEMPLATES["artwork"].format(seo_slug=seo)
+        thumb = rec.folder / FILENAME_TEMPLATES["thumbnail"].format(seo_slug=seo)
+        if not art.exists():
+            continue
+        try:
+            with Image.open(thumb if thumb.exists() else art) as img:
+                fp = fingerprint_image(_file_sha256(art), img)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Could not fingerprint %s: %s", seo, exc)
+            continue
+        row = ContentHash(
+            sha256=fp.sha256,
+            dhash=to_signed(fp.dhash),
+            phash=to_signed(fp.phash),
+            seo_folder=seo,
+            filename=art.name,
+        )
+        db.session.add(row)
+        db.session.add_all(_band_rows(row))
+        known.add(seo)
+        added += 1
+        if idx % 50 == 0:
+            db.session.commit()
+            progress("fingerprinting", int(idx * 100 / len(pending)))
+    db.session.commit()
+
+    # Rows recorded before the band index existed.
+    unbanded = ContentHash.query.filter(
+        ~ContentHash.id.in_(select(_bands.c.content_hash_id))
+    ).all()
+    for row in unbanded:
+        db.session.add_all(_band_rows(row))
+    db.session.commit()
+    return {"added": added, "banded": len(unbanded), "expired": expired}
+
+
+job_queue.every(BACKFILL_KIND, CONTENT_BACKFILL_INTERVAL_HOURS * 3600)
+
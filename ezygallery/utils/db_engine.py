@@ -0,0 +1,83 @@
+"""Central SQLAlchemy engine settings for the gallery database.
+
+Flask-SQLAlchemy and the log writer each used to open the database with
+default settings: rollback journal, ``synchronous=FULL`` and no busy timeout.
+Under four gunicorn workers, concurrent ``UploadEvent``/``LogEntry`` inserts
+failed straight away with "database is locked". Every engine now takes its
+options from :func:`engine_options` (a sized ``QueuePool`` plus a driver
+timeout), and every new SQLite connection is configured with:
+
+* ``journal_mode=WAL`` - readers no longer block the single writer;
+* ``synchronous=SQLITE_SYNCHRONOUS`` - ``NORMAL`` is durable in WAL mode
+  except for the last transactions on power loss;
+* ``busy_timeout=SQLITE_BUSY_TIMEOUT_MS`` - wait for the write lock;
+* ``mmap_size=SQLITE_MMAP_MB`` - serve reads from the page cache.
+
+Pooled connections remember the pid that opened them and are discarded when
+checked out in a forked child, so gunicorn ``--preload`` and the fork-based
+worker pools never share a SQLite handle across processes.
+
+The engine code itself lives in :mod:`utils.sqlite_engine`, which takes its
+settings as arguments; this module binds it to the gallery's ``config``.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy.engine import Engine
+
+from config import (
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_SYNCHRONOUS,
+    SQLITE_MMAP_MB,
+    DB_POOL_SIZE,
+    DB_POOL_OVERFLOW,
+    DB_POOL_TIMEOUT,
+)
+from utils import sqlite_engine
+
+SETTINGS = sqlite_engine.EngineSettings(
+    busy_timeout_ms=SQLITE_BUSY_TIMEOUT_MS,
+    synchronous=SQLITE_SYNCHRONOUS,
+    mmap_mb=SQLITE_MMAP_MB,
+    pool_size=DB_POOL_SIZE,
+    pool_overflow=DB_POOL_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+)
+
+
+def engine_options(uri: str) -> dict:
+    """Return ``create_engine`` keyword arguments for ``uri``."""
+    return sqlite_engine.engine_options(uri, SETTINGS)
+
+
+def create_db_engine(uri: str) -> Engine:
+    """Create an engine for ``uri`` with the shared pool settings."""
+    return sqlite_engine.create_engine_for(uri, SETTINGS)
+
+
+def init_app(app) -> None:
+    """Merge the shared engine options into the Flask-SQLAlchemy config.
+
+    Must run before ``db.init_app(app)``; explicit ``SQLALCHEMY_ENGINE_OPTIONS``
+    entries win over the defaults. Pass the resulting engine to
+    :func:`configure` before it opens its first connection.
+    """
+    options = engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
+    options.update(app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}))
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+
+
+def configure(engine: Engine) -> Engine:
+    """Apply the shared pragmas and fork guard to an engine built elsewhere."""
+    return sqlite_engine.configure(engine, SETTINGS)
+
+
+def ensure_indexes(engine: Engine, metadata) -> None:
+    """Create indexes declared on models whose tables already exist.
+
+    ``create_all`` skips existing tables entirely, so indexes added to a
+    model later would otherwise never reach deployed databases.
+    """
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
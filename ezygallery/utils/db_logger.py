@@ -1,42 +1,202 @@
 from __future__ import annotations
 
-"""Custom logging handler writing entries to the database."""
+"""Custom logging handler writing entries to the database.
 
+``emit`` used to add a ``LogEntry`` to the request's own SQLAlchemy session
+and commit it, costing an SQLite fsync per log line and committing whatever
+half-finished state the request had pending. :class:`DBLogHandler` now only
+captures the record (plus the request's user/session/IP) into an in-memory
+buffer. A background writer thread flushes the buffer through its own engine
+with one ``executemany`` insert every ``DB_LOG_BATCH_SIZE`` records or
+``DB_LOG_FLUSH_MS`` milliseconds, whichever comes first.
+
+The buffer holds at most ``DB_LOG_QUEUE_MAX`` records. Once it is
+``DB_LOG_HIGH_WATER`` full, DEBUG/INFO records are dropped so warnings and
+errors still fit; when it is completely full a warning evicts the oldest
+DEBUG/INFO entry. Dropped counts are written as a single WARNING row. A
+batch the database rejects is reported on stderr, one line per batch.
+"""
+
+import atexit
+import collections
+import datetime
 import logging
-from flask import has_app_context, has_request_context, session, request
-from models import db, LogEntry
+import os
+import sys
+import threading
+import time
+from typing import Deque, Optional
+
+from flask import has_request_context, session, request
+from sqlalchemy import insert
+
+from config import (
+    DB_LOG_BATCH_SIZE,
+    DB_LOG_FLUSH_MS,
+    DB_LOG_QUEUE_MAX,
+    DB_LOG_HIGH_WATER,
+)
+from models import LogEntry
+from utils.db_engine import create_db_engine
 
 
 class DBLogHandler(logging.Handler):
-    """Logging handler that persists records to ``LogEntry``."""
+    """Logging handler that persists records to ``LogEntry`` in batches."""
+
+    def __init__(self, database_uri: str, level: int = logging.NOTSET) -> None:
+        super().__init__(level)
+        self.database_uri = database_uri
+        self._engine = None
+        self._buffer: Deque[dict] = collections.deque()
+        self._cond = threading.Condition()
+        self._dropped = 0
+        self._writer_pid: Optional[int] = None
+        self._closed = False
+
+    # --- producer side ---------------------------------------------------
 
     def emit(self, record: logging.LogRecord) -> None:  # pragma: no cover - side effects
-        if not has_app_context():
-            return
         try:
-            entry = LogEntry(
-                level=record.levelname,
-                event_type=getattr(record, "event_type", record.name),
-                message=record.getMessage(),
-                details=getattr(record, "details", None),
-                user_id=session.get("user") if has_request_context() else None,
-                session_id=session.get("token") if has_request_context() else None,
-                ip_address=request.remote_addr if has_request_context() else None,
-            )
-            db.session.add(entry)
-            db.session.commit()
+            in_request = has_request_context()
+            row = {
+                "timestamp": datetime.datetime.utcfromtimestamp(record.created),
+                "level": record.levelname,
+                "event_type": getattr(record, "event_type", record.name),
+                "message": record.getMessage(),
+                "details": getattr(record, "details", None),
+                "user_id": session.get("user") if in_request else None,
+                "session_id": session.get("token") if in_request else None,
+                "ip_address": request.remote_addr if in_request else None,
+            }
         except Exception:  # pragma: no cover - logging failure
-            db.session.rollback()
+            self.handleError(record)
+            return
+        self._ensure_writer()
+        with self._cond:
+            if not self._admit(record.levelno):
+                self._dropped += 1
+                return
+            self._buffer.append(row)
+            if len(self._buffer) in (1, DB_LOG_BATCH_SIZE):
+                self._cond.notify()
+
+    def _admit(self, levelno: int) -> bool:
+        """Apply back-pressure; caller holds ``self._cond``."""
+        size = len(self._buffer)
+        low = levelno <= logging.INFO
+        if low and size >= DB_LOG_QUEUE_MAX * DB_LOG_HIGH_WATER:
+            return False
+        if size < DB_LOG_QUEUE_MAX:
+            return True
+        if low:
+            return False
+        for idx, queued in enumerate(self._buffer):
+            if queued["level"] in ("DEBUG", "INFO"):
+                del self._buffer[idx]
+                self._dropped += 1
+                return True
+        self._buffer.popleft()
+        self._dropped += 1
+        return True
+
+    # --- writer side -----------------------------------------------------
+
+    def _ensure_writer(self) -> None:
+        """Start the writer thread once per process (safe after a fork)."""
+        pid = os.getpid()
+        if self._writer_pid == pid:
+            return
+        with self._cond:
+            if self._writer_pid == pid:
+                return
+            self._engine = None  # never share a pooled connection across fork
+            self._writer_pid = pid
+            threading.Thread(
+                target=self._run, name="db-log-writer", daemon=True
+            ).start()
+
+    def _take_batch(self) -> list[dict]:
+        """Block until a batch is due and return it (caller holds no lock)."""
+        with self._cond:
+            while not self._buffer and not self._dropped and not self._closed:
+                self._cond.wait()
+            deadline = time.monotonic() + DB_LOG_FLUSH_MS / 1000
+            while len(self._buffer) < DB_LOG_BATCH_SIZE and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = [
+                self._buffer.popleft()
+                for _ in range(min(len(self._buffer), DB_LOG_BATCH_SIZE))
+            ]
+            if self._dropped:
+                batch.append(
+                    {
+                        "timestamp": datetime.datetime.utcnow(),
+                        "level": "WARNING",
+                        "event_type": "logging",
+                        "message": f"Dropped {self._dropped} log record(s) under load",
+                        "details": None,
+                        "user_id": None,
+                        "session_id": None,
+                        "ip_address": None,
+                    }
+                )
+                self._dropped = 0
+            return batch
+
+    def _write(self, batch: list[dict]) -> None:
+        if not batch:
+            return
+        try:
+            if self._engine is None:
+                self._engine = create_db_engine(self.database_uri)
+            with self._engine.begin() as conn:
+                conn.execute(insert(LogEntry.__table__), batch)
+        except Exception as exc:  # pragma: no cover - logging failure
+            # Never log through ``logging`` here: this handler would receive it.
+            try:
+                sys.stderr.write(
+                    f"DBLogHandler: dropped {len(batch)} log record(s): "
+                    f"{type(exc).__name__}: {exc}\n"
+                )
+            except Exception:
+                pass
+
+    def _run(self) -> None:
+        pid = os.getpid()
+        while not self._closed and self._writer_pid == pid:
+            self._write(self._take_batch())
+
+    def flush(self) -> None:
+        """Write everything buffered so far from the calling thread."""
+        while True:
+            with self._cond:
+                batch = [
+                    self._buffer.popleft()
+                    for _ in range(min(len(self._buffer), DB_LOG_BATCH_SIZE))
+                ]
+            if not batch:
+                return
+            self._write(batch)
+
+    def close(self) -> None:
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        super().close()
 
 
 def setup_logging(app) -> None:
     """Configure file and DB logging handlers on the given Flask app."""
 
-    handler = DBLogHandler()
+    handler = DBLogHandler(app.config["SQLALCHEMY_DATABASE_URI"])
     handler.setLevel(logging.INFO)
     formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
     handler.setFormatter(formatter)
     app.logger.addHandler(handler)
     if app.logger.level > logging.INFO:
         app.logger.setLevel(logging.INFO)
-
+    atexit.register(handler.flush)
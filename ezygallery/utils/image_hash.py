@@ -0,0 +1,61 @@
+"""Perceptual image hashes computed with NumPy.
+
+``dhash`` compares neighbouring pixels of a 9x8 greyscale thumbnail and
+``phash`` keeps the sign of the low 8x8 DCT coefficients of a 32x32 one, so
+re-encoded, resized or lightly edited copies of an image land within a few
+bits of each other. Hashes are 64-bit unsigned ints; :func:`to_signed` and
+:func:`to_unsigned` convert them for SQLite's signed ``INTEGER`` columns.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+from PIL import Image
+
+_DCT_SIZE = 32
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix.astype(np.float32)
+
+
+_DCT = _dct_matrix(_DCT_SIZE)
+
+
+def _pack(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def dhash(img: Image.Image) -> int:
+    """Return the 64-bit difference hash of ``img``."""
+    grey = np.asarray(img.convert("L").resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    return _pack(grey[:, 1:] > grey[:, :-1])
+
+
+def phash(img: Image.Image) -> int:
+    """Return the 64-bit DCT perceptual hash of ``img``."""
+    grey = img.convert("L").resize((_DCT_SIZE, _DCT_SIZE), Image.LANCZOS)
+    pixels = np.asarray(grey, dtype=np.float32)
+    low = (_DCT @ pixels @ _DCT.T)[:8, :8]
+    median = np.median(low.ravel()[1:])  # skip the DC term
+    return _pack(low > median)
+
+
+def to_signed(value: int) -> int:
+    """Map an unsigned 64-bit hash onto SQLite's signed integer range."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def to_unsigned(value: int) -> int:
+    """Inverse of :func:`to_signed`."""
+    return value + (1 << 64) if value < 0 else value
+
+
+def hamming(hashes: np.ndarray, value: int) -> np.ndarray:
+    """Bit distance from ``value`` to every hash in the ``uint64`` array."""
+    diff = np.bitwise_xor(hashes.astype(np.uint64, copy=False), np.uint64(value))
+    return np.unpackbits(diff.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
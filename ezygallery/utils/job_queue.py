@@ -0,0 +1,359 @@
+"""SQLite-backed background queue for long running analysis work.
+
+Analysis and composite generation used to run inside the request with
+blocking ``subprocess.run`` calls, pinning a gunicorn worker for up to 15
+minutes. Routes now :func:`enqueue` an :class:`~models.AnalysisJob` and return
+immediately. Every web process runs a small pool of worker threads that claim
+queued rows with a conditional ``UPDATE`` so no more than
+``ANALYSIS_MAX_CONCURRENT`` jobs run at once across all processes.
+
+Handlers are registered per job ``kind`` with :func:`register` and receive the
+job id, its payload and a ``progress(step, percent)`` callback. Raise
+:class:`JobError` to fail a job with a user facing message; the return value
+is stored as the job result.
+
+Progress is published to :data:`utils.progress_store.progress_store` by the
+process that claimed the job, so status reads served by that process never
+touch the database. The job row is still updated on each step as the
+cross-process source of truth.
+"""
+
+from __future__ import annotations
+
+import datetime
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import text
+
+from config import (
+    ANALYSIS_WORKERS,
+    ANALYSIS_MAX_CONCURRENT,
+    ANALYSIS_JOB_POLL_SECONDS,
+    ANALYSIS_JOB_STALE_SECONDS,
+)
+from models import db, AnalysisJob
+from utils.progress_store import progress_store, Entry, TERMINAL_STATES
+
+logger = logging.getLogger(__name__)
+
+Progress = Callable[[str, int], None]
+Handler = Callable[[int, dict, Progress], Optional[dict]]
+
+_HANDLERS: Dict[str, Handler] = {}
+_PERIODIC: Dict[str, float] = {}
+_next_check: Dict[str, float] = {}
+_wake = threading.Event()
+_start_lock = threading.Lock()
+_started_pid: Optional[int] = None
+_app = None
+
+
+class JobError(Exception):
+    """Raised by a handler to fail a job with a readable message."""
+
+
+def register(kind: str) -> Callable[[Handler], Handler]:
+    """Decorator registering ``func`` as the handler for ``kind`` jobs."""
+
+    def decorator(func: Handler) -> Handler:
+        _HANDLERS[kind] = func
+        return func
+
+    return decorator
+
+
+def every(kind: str, seconds: float) -> None:
+    """Queue a ``kind`` job (empty payload) at most once per ``seconds``.
+
+    Checked by idle workers; a job is only added when none of that kind is
+    queued, running or was created within the interval, in any process.
+    """
+    _PERIODIC[kind] = seconds
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.utcnow()
+
+
+def _key(job_id: int) -> str:
+    return f"job:{job_id}"
+
+
+def _publish(job: AnalysisJob) -> None:
+    progress_store.publish(_key(job.id), job.to_status())
+
+
+def _row_entry(job: AnalysisJob) -> Entry:
+    updated = job.updated_at.replace(tzinfo=datetime.timezone.utc)
+    return int(updated.timestamp() * 1000), job.to_status()
+
+
+# --- Producer side -------------------------------------------------------
+
+
+def enqueue(
+    kind: str,
+    payload: dict,
+    *,
+    file: str | None = None,
+    user_id: str | None = None,
+    upload_id: str | None = None,
+) -> int:
+    """Persist a new queued job and wake a local worker. Returns the job id."""
+    job = AnalysisJob(
+        kind=kind,
+        payload=json.dumps(payload),
+        file=file,
+        user_id=user_id,
+        upload_id=upload_id,
+    )
+    db.session.add(job)
+    db.session.commit()
+    ensure_started()
+    _wake.set()
+    logger.info("Queued %s job %s", kind, job.id, extra={"event_type": "analysis"})
+    return job.id
+
+
+def enqueue_once(kind: str, payload: dict) -> bool:
+    """Queue a ``kind`` job unless one is already queued, running or done.
+
+    A single ``INSERT ... WHERE NOT EXISTS``, so processes booting together
+    add at most one between them; failed jobs do not count, so a failure is
+    retried on the next boot. Returns True when this call queued the job.
+    """
+    now = _now()
+    added = db.session.execute(
+        text(
+            "INSERT INTO analysis_jobs "
+            "(kind, payload, status, step, percent, created_at, updated_at) "
+            "SELECT :kind, :payload, 'queued', 'queued', 0, :now, :now "
+            "WHERE NOT EXISTS (SELECT 1 FROM analysis_jobs WHERE kind = :kind "
+            "AND status != 'failed')"
+        ),
+        {"kind": kind, "payload": json.dumps(payload), "now": now},
+    )
+    db.session.commit()
+    if not added.rowcount:
+        return False
+    ensure_started()
+    _wake.set()
+    logger.info("Queued %s job", kind, extra={"event_type": "analysis"})
+    return True
+
+
+def job_state(job_id: int) -> Optional[Entry]:
+    """Return ``(version, state)`` for a job from memory, else from its row."""
+    entry = progress_store.get(_key(job_id))
+    if entry:
+        return entry
+    job = db.session.get(AnalysisJob, job_id, populate_existing=True)
+    return _row_entry(job) if job else None
+
+
+def wait_for_change(job_id: int, since: int, timeout: float) -> Optional[Entry]:
+    """Block until the job's state is newer than ``since`` or ``timeout`` passes.
+
+    Jobs run by this process wake the caller immediately; jobs running in
+    another process are re-read from the database once a second.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        entry = progress_store.wait(_key(job_id), since, max(min(remaining, 1.0), 0))
+        if entry is None or entry[0] <= since:
+            entry = job_state(job_id)
+        if entry is None or entry[0] > since or remaining <= 0:
+            return entry
+        if entry[1].get("status") in TERMINAL_STATES:
+            return entry
+
+
+def _active_query():
+    return AnalysisJob.query.filter(AnalysisJob.status.in_(("queued", "running")))
+
+
+def active_jobs(user_id: str | None) -> list[AnalysisJob]:
+    """Return queued and running jobs owned by ``user_id``.
+
+    Anonymous callers get an empty list; use :func:`all_active_jobs` for the
+    unfiltered admin view.
+    """
+    if not user_id:
+        return []
+    return _active_query().filter_by(user_id=user_id).order_by(AnalysisJob.id).all()
+
+
+def all_active_jobs() -> list[AnalysisJob]:
+    """Return every queued and running job. Admin views only."""
+    return _active_query().order_by(AnalysisJob.id).all()
+
+
+# --- Worker side ---------------------------------------------------------
+
+
+def set_progress(job_id: int, step: str, percent: int) -> None:
+    """Record progress for ``job_id``; also serves as the worker heartbeat."""
+    entry = progress_store.get(_key(job_id))
+    state = entry[1] if entry else {"job_id": job_id}
+    state.update(status="running", step=step, percent=percent)
+    progress_store.publish(_key(job_id), state)
+    db.session.execute(
+        text(
+            "UPDATE analysis_jobs SET step = :step, percent = :percent, "
+            "updated_at = :now WHERE id = :id"
+        ),
+        {"step": step, "percent": percent, "now": _now(), "id": job_id},
+    )
+    db.session.commit()
+
+
+def _reap_stale() -> None:
+    """Fail running jobs whose worker stopped heart-beating (e.g. was killed)."""
+    cutoff = _now() - datetime.timedelta(seconds=ANALYSIS_JOB_STALE_SECONDS)
+    db.session.execute(
+        text(
+            "UPDATE analysis_jobs SET status = 'failed', step = 'failed', "
+            "percent = 100, error_msg = 'Worker lost', finished_at = :now "
+            "WHERE status = 'running' AND updated_at < :cutoff"
+        ),
+        {"now": _now(), "cutoff": cutoff},
+    )
+    db.session.commit()
+
+
+def _schedule_periodic() -> None:
+    """Queue due periodic jobs; one atomic INSERT per kind keeps processes in step."""
+    clock = time.monotonic()
+    for kind, seconds in list(_PERIODIC.items()):
+        if _next_check.get(kind, 0.0) > clock:
+            continue
+        _next_check[kind] = clock + min(seconds, 60.0)
+        now = _now()
+        added = db.session.execute(
+            text(
+                "INSERT INTO analysis_jobs "
+                "(kind, payload, status, step, percent, created_at, updated_at) "
+                "SELECT :kind, '{}', 'queued', 'queued', 0, :now, :now "
+                "WHERE NOT EXISTS (SELECT 1 FROM analysis_jobs WHERE kind = :kind "
+                "AND (status IN ('queued', 'running') OR created_at >= :cutoff))"
+            ),
+            {
+                "kind": kind,
+                "now": now,
+                "cutoff": now - datetime.timedelta(seconds=seconds),
+            },
+        )
+        db.session.commit()
+        if added.rowcount:
+            logger.info("Queued periodic %s job", kind, extra={"event_type": "analysis"})
+
+
+def _claim() -> Optional[AnalysisJob]:
+    """Atomically move the oldest queued job to ``running`` if under the limit."""
+    row = db.session.execute(
+        text("SELECT id FROM analysis_jobs WHERE status = 'queued' ORDER BY id LIMIT 1")
+    ).first()
+    if row is None:
+        return None
+    now = _now()
+    claimed = db.session.execute(
+        text(
+            "UPDATE analysis_jobs SET status = 'running', step = 'starting', "
+            "started_at = :now, updated_at = :now "
+            "WHERE id = :id AND status = 'queued' AND "
+            "(SELECT COUNT(*) FROM analysis_jobs WHERE status = 'running') < :limit"
+        ),
+        {"now": now, "id": row.id, "limit": ANALYSIS_MAX_CONCURRENT},
+    )
+    db.session.commit()
+    if claimed.rowcount != 1:
+        return None
+    job = db.session.get(AnalysisJob, row.id, populate_existing=True)
+    _publish(job)
+    return job
+
+
+def _finish(job_id: int, status: str, *, result: dict | None = None, error: str | None = None) -> None:
+    job = db.session.get(AnalysisJob, job_id)
+    if job is None:
+        return
+    job.status = status
+    job.step = "done" if status == "done" else "failed"
+    job.percent = 100
+    job.result = json.dumps(result) if result is not None else None
+    job.error_msg = error[:1024] if error else None
+    job.finished_at = job.updated_at = _now()
+    db.session.commit()
+    _publish(job)
+
+
+def run_job(job: AnalysisJob) -> None:
+    """Execute a claimed job with its registered handler."""
+    job_id = job.id
+    handler = _HANDLERS.get(job.kind)
+    if handler is None:
+        _finish(job_id, "failed", error=f"No handler for job kind {job.kind}")
+        return
+    payload = job.payload_dict()
+    progress = functools.partial(set_progress, job_id)
+    try:
+        result = handler(job_id, payload, progress)
+    except JobError as exc:
+        db.session.rollback()
+        _finish(job_id, "failed", error=str(exc))
+    except Exception as exc:  # noqa: BLE001
+        db.session.rollback()
+        logger.exception("Job %s crashed", job_id, extra={"event_type": "analysis"})
+        _finish(job_id, "failed", error=str(exc))
+    else:
+        _finish(job_id, "done", result=result or {})
+
+
+def _worker_loop() -> None:
+    while True:
+        ran = False
+        try:
+            with _app.app_context():
+                try:
+                    _reap_stale()
+                    _schedule_periodic()
+                    job = _claim()
+                    if job is not None:
+                        ran = True
+                        run_job(job)
+                finally:
+                    db.session.remove()
+        except Exception:  # noqa: BLE001
+            logger.exception("Analysis worker error")
+        if not ran:
+            _wake.wait(ANALYSIS_JOB_POLL_SECONDS)
+            _wake.clear()
+
+
+def ensure_started() -> None:
+    """Start this process's worker threads once (safe after a fork)."""
+    global _started_pid
+    if _app is None or _started_pid == os.getpid():
+        return
+    with _start_lock:
+        if _started_pid == os.getpid():
+            return
+        for idx in range(max(ANALYSIS_WORKERS, 0)):
+            threading.Thread(
+                target=_worker_loop, name=f"analysis-worker-{idx}", daemon=True
+            ).start()
+        _started_pid = os.getpid()
+
+
+def init_app(app) -> None:
+    """Bind the queue to ``app`` and start the worker threads."""
+    global _app
+    _app = app
+    ensure_started()
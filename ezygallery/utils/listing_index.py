@@ -0,0 +1,272 @@
+"""Process-wide index of listing JSON files.
+
+Gallery pages used to walk every SEO folder and ``json.load`` every
+``*-listing.json`` on each request. This module keeps the parsed listings in
+memory, keyed by SEO folder, and only re-reads a listing when its ``mtime`` or
+size changes. New or removed folders are picked up when the mtime of the tree
+root changes, so an unchanged library costs one ``stat`` per listing.
+
+A reverse map from every filename stem/slug permutation to the folders that
+claim it lets :meth:`ListingIndex.find_seo_folder` resolve a filename with a
+dict lookup, falling back to a full refresh only on a miss.
+
+The newest processed listing (used by menus and the context processor on
+every render) is cached for ``LATEST_LISTING_TTL`` seconds and updated
+directly by :meth:`ListingIndex.record_write`.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from config import ARTWORKS_PROCESSED_DIR, ARTWORKS_FINALISED_DIR, LATEST_LISTING_TTL
+from utils.text import slugify
+
+PROCESSED = "processed"
+FINALISED = "finalised"
+
+
+@dataclass
+class ListingRecord:
+    """Parsed listing JSON plus the file metadata used for invalidation."""
+
+    seo_folder: str
+    tree: str
+    folder: Path
+    path: Path
+    mtime: float
+    size: int
+    data: Dict = field(default_factory=dict)
+    keys: FrozenSet[str] = frozenset()
+
+    @property
+    def finalised(self) -> bool:
+        return self.tree == FINALISED
+
+
+def listing_path_for(folder: Path) -> Path:
+    """Return the ``*-listing.json`` path inside an SEO folder."""
+    return folder / f"{folder.name}-listing.json"
+
+
+def lookup_keys(seo_folder: str, data: Dict) -> FrozenSet[str]:
+    """Return every stem permutation a filename may use to find this listing."""
+    filename_stem = Path(data.get("filename", "")).stem
+    seo_stem = Path(data.get("seo_filename", "")).stem
+    keys = {
+        filename_stem.lower(),
+        seo_stem.lower(),
+        seo_folder.lower(),
+        slugify(filename_stem),
+        slugify(seo_stem),
+        slugify(seo_folder),
+    }
+    keys.discard("")
+    return frozenset(keys)
+
+
+class ListingIndex:
+    """In-memory cache of every listing under the processed/finalised trees."""
+
+    def __init__(self, roots: Dict[str, Path], latest_ttl: float = LATEST_LISTING_TTL) -> None:
+        self.roots = dict(roots)
+        self.latest_ttl = latest_ttl
+        self._lock = threading.RLock()
+        self._records: Dict[str, Dict[str, ListingRecord]] = {t: {} for t in roots}
+        self._folders: Dict[str, set] = {t: set() for t in roots}
+        self._root_mtimes: Dict[str, Optional[int]] = {t: None for t in roots}
+        self._by_key: Dict[str, Set[Tuple[str, str]]] = {}
+        self._latest: Optional[ListingRecord] = None
+        self._latest_expires = 0.0
+
+    # --- Loading -----------------------------------------------------------
+
+    def _drop(self, tree: str, name: str) -> None:
+        record = self._records[tree].pop(name, None)
+        if not record:
+            return
+        for key in record.keys:
+            owners = self._by_key.get(key)
+            if owners:
+                owners.discard((tree, name))
+                if not owners:
+                    del self._by_key[key]
+
+    def _store(self, record: ListingRecord) -> None:
+        self._drop(record.tree, record.seo_folder)
+        self._records[record.tree][record.seo_folder] = record
+        for key in record.keys:
+            self._by_key.setdefault(key, set()).add((record.tree, record.seo_folder))
+
+    def _load(self, tree: str, folder: Path) -> Optional[ListingRecord]:
+        """Stat and (re)load the listing for ``folder`` if it changed."""
+        path = listing_path_for(folder)
+        try:
+            st = path.stat()
+        except OSError:
+            self._drop(tree, folder.name)
+            return None
+        current = self._records[tree].get(folder.name)
+        if current and current.mtime == st.st_mtime and current.size == st.st_size:
+            return current
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as exc:  # noqa: BLE001
+            logging.getLogger(__name__).warning("Skipping unreadable listing %s: %s", path, exc)
+            self._drop(tree, folder.name)
+            return None
+        record = ListingRecord(
+            seo_folder=folder.name,
+            tree=tree,
+            folder=folder,
+            path=path,
+            mtime=st.st_mtime,
+            size=st.st_size,
+            data=data,
+            keys=lookup_keys(folder.name, data),
+        )
+        self._store(record)
+        return record
+
+    def _sync_root(self, tree: str) -> None:
+        """Pick up added or removed SEO folders when the tree root changed."""
+        root = self.roots[tree]
+        try:
+            root_mtime = root.stat().st_mtime_ns
+        except OSError:
+            for name in list(self._records[tree]):
+                self._drop(tree, name)
+            self._folders[tree].clear()
+            self._root_mtimes[tree] = None
+            return
+        if root_mtime == self._root_mtimes[tree]:
+            return
+        names = set()
+        with os.scandir(root) as it:
+            for entry in it:
+                if entry.is_dir():
+                    names.add(entry.name)
+        for gone in self._folders[tree] - names:
+            self._drop(tree, gone)
+        for added in names - self._folders[tree]:
+            self._load(tree, root / added)
+        self._folders[tree] = names
+        self._root_mtimes[tree] = root_mtime
+
+    def refresh(self, tree: Optional[str] = None) -> None:
+        """Bring the index up to date, re-reading only changed listings."""
+        with self._lock:
+            for t in [tree] if tree else list(self.roots):
+                self._sync_root(t)
+                root = self.roots[t]
+                for name in self._folders[t]:
+                    self._load(t, root / name)
+
+    def invalidate(self) -> None:
+        """Drop everything so the next access rescans from disk."""
+        with self._lock:
+            for t in self.roots:
+                self._records[t].clear()
+                self._folders[t].clear()
+                self._root_mtimes[t] = None
+            self._by_key.clear()
+            self._latest = None
+            self._latest_expires = 0.0
+
+    def record_write(self, listing_path: Path) -> None:
+        """Update the entry for a listing that was just written, moved or removed."""
+        listing_path = Path(listing_path)
+        folder = listing_path.parent
+        with self._lock:
+            for t, root in self.roots.items():
+                if folder.parent == root:
+                    if folder.is_dir():
+                        self._folders[t].add(folder.name)
+                    record = self._load(t, folder)
+                    if t == PROCESSED:
+                        self._note_latest(folder.name, record)
+
+    def _note_latest(self, name: str, record: Optional[ListingRecord]) -> None:
+        latest = self._latest
+        if record and (latest is None or record.mtime >= latest.mtime):
+            self._latest = record
+        elif latest and latest.seo_folder == name:
+            # The cached latest was rewritten older or removed; recompute.
+            self._latest_expires = 0.0
+
+    # --- Queries -----------------------------------------------------------
+
+    def latest(self) -> Optional[ListingRecord]:
+        """Return the most recently written processed listing.
+
+        The value is shared across requests and only recomputed from disk
+        once ``latest_ttl`` has elapsed, so page renders stay scan-free.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._latest_expires:
+                self.refresh(PROCESSED)
+                records = self._records[PROCESSED].values()
+                self._latest = max(records, key=lambda r: r.mtime, default=None)
+                self._latest_expires = now + self.latest_ttl
+            return self._latest
+
+    def records(self, tree: str) -> List[ListingRecord]:
+        """Return current records for ``tree``. Treat ``data`` as read-only."""
+        self.refresh(tree)
+        with self._lock:
+            return list(self._records[tree].values())
+
+    def get(self, seo_folder: str, tree: Optional[str] = None) -> Optional[ListingRecord]:
+        """Return the record for ``seo_folder``, preferring processed over finalised."""
+        with self._lock:
+            for t in [tree] if tree else list(self.roots):
+                record = self._load(t, self.roots[t] / seo_folder)
+                if record:
+                    return record
+        return None
+
+    def _match(self, keys: Set[str]) -> Optional[str]:
+        owners: Set[Tuple[str, str]] = set()
+        for key in keys:
+            owners |= self._by_key.get(key, set())
+        candidates: List[Tuple[float, str]] = []
+        for tree, name in owners:
+            # Re-stat the hit so edits from other workers are noticed.
+            record = self._load(tree, self.roots[tree] / name)
+            if record and keys & record.keys:
+                candidates.append((record.mtime, name))
+        if not candidates:
+            return None
+        return max(candidates)[1]
+
+    def find_seo_folder(self, filename: str) -> str:
+        """Return the most recently modified SEO folder claiming ``filename``.
+
+        Raises ``FileNotFoundError`` if no listing in either tree matches.
+        """
+        basename = Path(filename).stem.lower()
+        keys = {basename, slugify(basename)}
+        with self._lock:
+            for t in self.roots:
+                self._sync_root(t)
+            match = self._match(keys)
+            if match is None:
+                self.refresh()
+                match = self._match(keys)
+        if match is None:
+            raise FileNotFoundError(f"SEO folder not found for {filename}")
+        return match
+
+
+listing_index = ListingIndex(
+    {PROCESSED: ARTWORKS_PROCESSED_DIR, FINALISED: ARTWORKS_FINALISED_DIR}
+)
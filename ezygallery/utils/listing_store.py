@@ -0,0 +1,178 @@
+"""Single write path for ``*-listing.json`` files.
+
+Listing JSONs used to be rewritten in place with ``open(path, "w")`` and
+``json.dump`` from eight different routes and helpers. A crash, or a reader
+arriving mid-write, saw a truncated file, and the listing index skipped it as
+unreadable. Every writer now goes through :func:`write`:
+
+* the document is serialised to a temporary file in the same folder, then
+  fsynced and ``os.replace``d over the listing, so readers see either the old
+  or the new file, never a partial one;
+* writes hold an exclusive ``flock`` on ``LISTING_LOCK_DIR/<seo_folder>.lock``.
+  The lock is keyed by SEO folder, so a listing that moves between the
+  processed and finalised trees keeps its lock. It is re-entrant within a
+  thread, so a helper can write while its caller holds the lock;
+* ``LISTING_JSON_COMPACT`` switches from ``indent=2`` to compact separators;
+* callbacks registered with :func:`subscribe` receive the listing path after
+  every write, and after :func:`notify` for changes made outside this module
+  (analysis scripts, folder moves). :data:`utils.listing_index.listing_index`
+  is always subscribed.
+
+Read-modify-write sequences use :func:`listing_txn`: the listing is loaded
+once under the lock, every helper mutates the same :class:`ListingData`,
+and the file is written once on exit, only if something changed. Helpers
+such as ``routes.utils.assign_or_get_sku`` accept the open transaction so
+a route can chain them without re-reading the file.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List
+
+from config import (
+    ARTWORKS_PROCESSED_DIR,
+    ARTWORKS_FINALISED_DIR,
+    LISTING_JSON_COMPACT,
+    LISTING_LOCK_DIR,
+)
+from utils.listing_index import listing_index, listing_path_for
+
+logger = logging.getLogger(__name__)
+
+Subscriber = Callable[[Path], None]
+
+_subscribers: List[Subscriber] = []
+_held = threading.local()
+
+
+def subscribe(callback: Subscriber) -> Subscriber:
+    """Call ``callback(listing_path)`` after every listing change."""
+    if callback not in _subscribers:
+        _subscribers.append(callback)
+    return callback
+
+
+def notify(listing_path: Path) -> None:
+    """Tell subscribers ``listing_path`` was written, moved or removed."""
+    listing_path = Path(listing_path)
+    for callback in list(_subscribers):
+        try:
+            callback(listing_path)
+        except Exception:  # noqa: BLE001 - one bad cache must not fail a save
+            logger.exception("Listing subscriber %r failed for %s", callback, listing_path)
+
+
+@contextlib.contextmanager
+def locked(listing_path: Path) -> Iterator[None]:
+    """Hold the exclusive per-listing lock (re-entrant within a thread)."""
+    name = Path(listing_path).parent.name
+    counts: Dict[str, int] = getattr(_held, "counts", None) or {}
+    _held.counts = counts
+    if counts.get(name):
+        counts[name] += 1
+        try:
+            yield
+        finally:
+            counts[name] -= 1
+        return
+    LISTING_LOCK_DIR.mkdir(parents=True, exist_ok=True)
+    with open(LISTING_LOCK_DIR / f"{name}.lock", "a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        counts[name] = 1
+        try:
+            yield
+        finally:
+            counts.pop(name, None)
+
+
+def read(listing_path: Path) -> dict:
+    """Load a listing. Writes are atomic renames, so no lock is needed."""
+    with open(listing_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def dumps(data: dict, compact: bool | None = None) -> str:
+    """Serialise a listing the way :func:`write` stores it."""
+    if LISTING_JSON_COMPACT if compact is None else compact:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return json.dumps(data, indent=2, ensure_ascii=False)
+
+
+def write(listing_path: Path, data: dict, *, compact: bool | None = None) -> None:
+    """Atomically replace ``listing_path`` with ``data`` and notify subscribers."""
+    listing_path = Path(listing_path)
+    payload = dumps(data, compact)
+    with locked(listing_path):
+        fd, tmp = tempfile.mkstemp(
+            dir=listing_path.parent, prefix=f".{listing_path.name}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, listing_path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        dir_fd = os.open(listing_path.parent, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    notify(listing_path)
+
+
+class ListingData(dict):
+    """Listing dict yielded by :func:`listing_txn`, aware of its file."""
+
+    def __init__(self, path: Path, data: dict) -> None:
+        super().__init__(data)
+        self.path = path
+
+    @property
+    def seo_folder(self) -> str:
+        return self.path.parent.name
+
+
+def resolve(listing: str | Path) -> Path:
+    """Return the listing path for an SEO folder name or a listing path.
+
+    SEO folder names are looked up in the processed tree, then the
+    finalised tree; ``FileNotFoundError`` is raised if neither has one.
+    """
+    if isinstance(listing, Path) or str(listing).endswith(".json"):
+        return Path(listing)
+    for root in (ARTWORKS_PROCESSED_DIR, ARTWORKS_FINALISED_DIR):
+        path = listing_path_for(root / listing)
+        if path.exists():
+            return path
+    raise FileNotFoundError(f"No listing for {listing}")
+
+
+@contextlib.contextmanager
+def listing_txn(listing: str | Path, *, compact: bool | None = None) -> Iterator[ListingData]:
+    """Load a listing once, let the block mutate it, write it back once.
+
+    ``listing`` is an SEO folder name or a listing path. The per-listing
+    lock is held for the whole block. If the block raises, nothing is
+    written; if the data is unchanged, the file is left untouched.
+    """
+    path = resolve(listing)
+    with locked(path):
+        data = ListingData(path, read(path))
+        before = dumps(data, compact)
+        yield data
+        if dumps(data, compact) != before:
+            write(path, data, compact=compact)
+
+
+subscribe(listing_index.record_write)
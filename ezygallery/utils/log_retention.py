@@ -0,0 +1,113 @@
+"""Retention for the ``log_entries`` table.
+
+Every INFO record goes through :class:`utils.db_logger.DBLogHandler`, so the
+table used to grow without bound. The ``log-retention`` job, queued every
+``LOG_RETENTION_INTERVAL_HOURS`` through :func:`utils.job_queue.every`,
+moves rows older than ``LOG_RETENTION_DAYS`` out of the database one UTC day
+at a time. It writes them to
+``LOG_ARCHIVE_DIR/log_entries-YYYY-MM-DD-<first id>.jsonl.gz``, one JSON
+object per line, and only then deletes them.
+
+Each day's rows are read through the ``timestamp`` index. An archive is
+written to a temporary file and renamed into place before the delete
+commits. If the job is interrupted after the rename, the next run rewrites
+the same file name instead of producing a duplicate. SQLite reuses the
+freed pages for new rows, so the file stops growing without a ``VACUUM``.
+"""
+
+from __future__ import annotations
+
+import datetime
+import gzip
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+from sqlalchemy import func
+
+from config import LOG_ARCHIVE_DIR, LOG_RETENTION_DAYS, LOG_RETENTION_INTERVAL_HOURS
+from models import db, LogEntry
+from utils import job_queue
+
+logger = logging.getLogger(__name__)
+
+RETENTION_KIND = "log-retention"
+
+_COLUMNS = [c.name for c in LogEntry.__table__.columns]
+
+
+def _row_dict(row) -> dict:
+    data = dict(zip(_COLUMNS, row))
+    data["timestamp"] = data["timestamp"].isoformat()
+    return data
+
+
+def _archive_day(start: datetime.datetime, end: datetime.datetime) -> int:
+    """Archive and delete rows with ``start <= timestamp < end``."""
+    table = LogEntry.__table__
+    window = (table.c.timestamp >= start) & (table.c.timestamp < end)
+    rows = db.session.execute(
+        table.select().where(window).order_by(table.c.id),
+        execution_options={"yield_per": 1000},
+    )
+    fd, tmp = tempfile.mkstemp(dir=LOG_ARCHIVE_DIR, suffix=".part")
+    first_id = last_id = None
+    count = 0
+    try:
+        with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as out:
+            for row in rows:
+                data = _row_dict(row)
+                first_id = data["id"] if first_id is None else first_id
+                last_id = data["id"]
+                out.write(json.dumps(data) + "\n")
+                count += 1
+        if not count:
+            Path(tmp).unlink()
+            return 0
+        target = LOG_ARCHIVE_DIR / f"log_entries-{start:%Y-%m-%d}-{first_id}.jsonl.gz"
+        os.replace(tmp, target)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    db.session.execute(table.delete().where(window & (table.c.id <= last_id)))
+    db.session.commit()
+    return count
+
+
+@job_queue.register(RETENTION_KIND)
+def compact_logs(job_id: int, payload: dict, progress) -> dict:
+    """Move log rows past the retention window into daily archive files."""
+    today = datetime.datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    cutoff = today - datetime.timedelta(days=LOG_RETENTION_DAYS)
+    archived = days = 0
+    first = None
+    while True:
+        oldest = (
+            db.session.query(func.min(LogEntry.timestamp))
+            .filter(LogEntry.timestamp < cutoff)
+            .scalar()
+        )
+        if oldest is None:
+            break
+        start = oldest.replace(hour=0, minute=0, second=0, microsecond=0)
+        first = first or start
+        moved = _archive_day(start, min(start + datetime.timedelta(days=1), cutoff))
+        if not moved:
+            break
+        archived += moved
+        days += 1
+        span = max((cutoff - first).days, 1)
+        progress("archiving", min(int((start - first).days * 100 / span), 99))
+    if archived:
+        logger.info(
+            "Archived %s log entries from %s day(s)",
+            archived,
+            days,
+            extra={"event_type": "logging"},
+        )
+    return {"archived": archived, "days": days}
+
+
+job_queue.every(RETENTION_KIND, LOG_RETENTION_INTERVAL_HOURS * 3600)
@@ -0,0 +1,205 @@
+"""Incrementally maintained timing histograms behind ``/api/metrics``.
+
+The metrics endpoint used to load every ``UploadEvent`` into ORM objects and
+take medians in Python on each widget poll. Durations are now folded into
+:class:`~models.MetricRollup` rows as they happen: one row per metric, UTC
+hour and log-scale duration bin, holding a count and a total. A bin spans
+``1/BINS_PER_OCTAVE`` of a doubling (about 9% wide), so percentiles read back
+from the histogram are within roughly 4.5% of the exact value. A window query
+is a single ``GROUP BY bin`` over the primary key prefix. Its cost depends
+on the length of the window, not on the number of uploads in it.
+
+Rows written before the rollup existed are folded in once by the
+``metrics-backfill`` job, queued with :func:`utils.job_queue.enqueue_once` so
+workers booting together cannot double it; the payload's cut-off keeps it
+from counting anything the live hooks already recorded.
+"""
+
+from __future__ import annotations
+
+import datetime
+import math
+from collections import defaultdict
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from models import db, MetricRollup, UploadEvent
+from utils import job_queue
+
+BACKFILL_KIND = "metrics-backfill"
+BINS_PER_OCTAVE = 8
+PERCENTILES = (50, 90, 99)
+
+Sample = Tuple[str, Optional[datetime.datetime], Optional[float]]
+
+
+def duration_bin(duration_ms: float) -> int:
+    """Return the histogram bin for a duration (sub-millisecond -> bin 0)."""
+    return int(math.floor(math.log2(max(duration_ms, 1.0)) * BINS_PER_OCTAVE))
+
+
+def bin_value(bin_: int) -> float:
+    """Geometric midpoint of a bin, in milliseconds."""
+    return 2 ** ((bin_ + 0.5) / BINS_PER_OCTAVE)
+
+
+def _hour(when: datetime.datetime) -> datetime.datetime:
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+def _upsert():
+    """Build the add-to-existing-cell upsert for the session's database.
+
+    Returns None for databases without a native upsert; :func:`_add_to_cell`
+    covers those.
+    """
+    table = MetricRollup.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("mysql", "mariadb"):
+        stmt = mysql.insert(table)
+        return stmt.on_duplicate_key_update(
+            count=table.c.count + stmt.inserted.count,
+            total_ms=table.c.total_ms + stmt.inserted.total_ms,
+        )
+    if dialect == "postgresql":
+        stmt = postgresql.insert(table)
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(table)
+    else:
+        return None
+    return stmt.on_conflict_do_update(
+        index_elements=["metric", "bucket", "bin"],
+        set_={
+            "count": table.c.count + stmt.excluded.count,
+            "total_ms": table.c.total_ms + stmt.excluded.total_ms,
+        },
+    )
+
+
+def _add_to_cell(row: dict) -> None:
+    """Update-then-insert one rollup cell where no native upsert exists."""
+    table = MetricRollup.__table__
+    update = (
+        table.update()
+        .where(
+            table.c.metric == row["metric"],
+            table.c.bucket == row["bucket"],
+            table.c.bin == row["bin"],
+        )
+        .values(
+            count=table.c.count + row["count"],
+            total_ms=table.c.total_ms + row["total_ms"],
+        )
+    )
+    if db.session.execute(update).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(table.insert().values(**row))
+    except IntegrityError:
+        # Another writer created the cell between our UPDATE and INSERT.
+        db.session.execute(update)
+
+
+def record_many(samples: Iterable[Sample]) -> None:
+    """Fold ``(metric, finished_at, duration_ms)`` samples into the rollup.
+
+    Samples without a timestamp or duration are skipped. Runs in the
+    caller's session and is committed with it.
+    """
+    totals: dict = defaultdict(lambda: [0, 0.0])
+    for metric, when, duration in samples:
+        if when is None or duration is None or duration < 0:
+            continue
+        cell = totals[(metric, _hour(when), duration_bin(duration))]
+        cell[0] += 1
+        cell[1] += duration
+    if not totals:
+        return
+    rows = [
+        {"metric": m, "bucket": b, "bin": k, "count": c, "total_ms": t}
+        for (m, b, k), (c, t) in totals.items()
+    ]
+    stmt = _upsert()
+    if stmt is None:
+        for row in rows:
+            _add_to_cell(row)
+        return
+    db.session.execute(stmt, rows)
+
+
+def record(metric: str, when: Optional[datetime.datetime], duration_ms: Optional[float]) -> None:
+    """Fold a single sample into the rollup (see :func:`record_many`)."""
+    record_many([(metric, when, duration_ms)])
+
+
+def summary(metric: str, since: Optional[datetime.datetime] = None) -> dict:
+    """Count, mean and approximate percentiles of ``metric`` since ``since``."""
+    query = db.session.query(
+        MetricRollup.bin,
+        func.sum(MetricRollup.count),
+        func.sum(MetricRollup.total_ms),
+    ).filter(MetricRollup.metric == metric)
+    if since is not None:
+        query = query.filter(MetricRollup.bucket >= _hour(since))
+    rows = query.group_by(MetricRollup.bin).order_by(MetricRollup.bin).all()
+
+    count = sum(int(n) for _, n, _ in rows)
+    total = sum(float(t) for _, _, t in rows)
+    result = {"count": count, "mean_ms": round(total / count, 1) if count else 0}
+    for pct in PERCENTILES:
+        result[f"p{pct}_ms"] = 0
+    if not count:
+        return result
+    pending = list(PERCENTILES)
+    seen = 0
+    for bin_, n, _ in rows:
+        seen += int(n)
+        while pending and seen >= count * pending[0] / 100:
+            result[f"p{pending.pop(0)}_ms"] = round(bin_value(bin_), 1)
+    return result
+
+
+@job_queue.register(BACKFILL_KIND)
+def backfill(job_id: int, payload: dict, progress) -> dict:
+    """Fold upload events recorded before the rollup existed."""
+    max_id = payload["max_id"]
+    before = datetime.datetime.fromisoformat(payload["before"])
+    query = (
+        db.session.query(
+            UploadEvent.upload_start_time,
+            UploadEvent.upload_end_time,
+            UploadEvent.analysis_start_time,
+            UploadEvent.analysis_end_time,
+        )
+        .filter(UploadEvent.id <= max_id)
+        .execution_options(yield_per=1000)
+    )
+
+    def samples():
+        for up_start, up_end, an_start, an_end in query:
+            if up_start and up_end:
+                yield "upload", up_end, (up_end - up_start).total_seconds() * 1000
+            if an_start and an_end and an_end < before:
+                yield "analysis", an_end, (an_end - an_start).total_seconds() * 1000
+
+    record_many(samples())
+    db.session.commit()
+    return {"max_id": max_id}
+
+
+def init_app(app) -> None:
+    """Queue a backfill when events exist but the rollup is still empty."""
+    with app.app_context():
+        if db.session.query(MetricRollup.metric).first() is not None:
+            return
+        max_id = db.session.query(func.max(UploadEvent.id)).scalar()
+        if max_id is None:
+            return
+        job_queue.enqueue_once(
+            BACKFILL_KIND,
+            {"max_id": max_id, "before": datetime.datetime.utcnow().isoformat()},
+        )
@@ -0,0 +1,113 @@
+"""Byte-bounded LRU cache of decoded mockup templates and their corners.
+
+The mockup library is a fixed set of a few hundred PNGs reused across every
+artwork, yet each composite re-opened the PNG, converted it to RGBA and
+re-parsed its ``COORDS_DIR/<aspect>/<stem>.json`` file. :data:`mockup_cache`
+keeps the decoded arrays instead. Entries are keyed by path plus
+``st_mtime_ns``/``st_size``, so a replaced template or re-traced corner file is
+picked up on its next use. Cached arrays are read-only and shared by every
+caller in the process.
+
+The bound is per process. The web worker and each of its
+``COMPOSITE_WORKERS`` pool processes hold their own cache, which stays warm
+because the pool is long-lived and starts from the entries the fork server
+decoded in :mod:`utils.analysis_warmup`. ``MOCKUP_CACHE_MB`` is therefore split
+evenly between them, so one web worker and its pool together stay within it.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Tuple
+
+import numpy as np
+from PIL import Image
+
+from config import COMPOSITE_WORKERS, MOCKUP_CACHE_MB
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[str, str, int, int]
+
+
+def _file_key(kind: str, path: Path) -> Key:
+    st = os.stat(path)
+    return kind, str(path), st.st_mtime_ns, st.st_size
+
+
+def _decode_mockup(path: Path) -> np.ndarray:
+    with Image.open(path) as img:
+        return np.asarray(img.convert("RGBA"))
+
+
+def _parse_corners(path: Path) -> np.ndarray:
+    """Corners in warp order; files list TL, TR, BL, BR, the warp wants TL, TR, BR, BL."""
+    with open(path, "r", encoding="utf-8") as cf:
+        c = json.load(cf)["corners"]
+    return np.float32([[c[i]["x"], c[i]["y"]] for i in (0, 1, 3, 2)])
+
+
+class MockupCache:
+    """LRU of read-only NumPy arrays bounded by their total ``nbytes``."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[Key, np.ndarray]" = OrderedDict()
+        self._stale: dict[Tuple[str, str], Key] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key: Key, loader: Callable[[Path], np.ndarray]) -> np.ndarray:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+        value = loader(Path(key[1]))
+        value.flags.writeable = False
+        with self._lock:
+            # Drop the entry for an older version of the same file.
+            old = self._stale.pop(key[:2], None)
+            if old is not None and old != key and old in self._items:
+                self.bytes -= self._items.pop(old).nbytes
+            if key not in self._items and value.nbytes <= self.max_bytes:
+                self._items[key] = value
+                self._stale[key[:2]] = key
+                self.bytes += value.nbytes
+                self._evict()
+        return value
+
+    def _evict(self) -> None:
+        while self.bytes > self.max_bytes and self._items:
+            key, value = self._items.popitem(last=False)
+            self._stale.pop(key[:2], None)
+            self.bytes -= value.nbytes
+
+    def mockup(self, path: Path) -> np.ndarray:
+        """Return the mockup at ``path`` as an RGBA ``uint8`` array."""
+        return self._get(_file_key("mockup", path), _decode_mockup)
+
+    def corners(self, path: Path) -> np.ndarray:
+        """Return the destination corners from ``path`` as a ``(4, 2)`` array."""
+        return self._get(_file_key("corners", path), _parse_corners)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._stale.clear()
+            self.bytes = 0
+
+
+# One share for the web worker, one for each composite pool process.
+mockup_cache = MockupCache(
+    int(MOCKUP_CACHE_MB * 1024 * 1024 / (max(COMPOSITE_WORKERS, 1) + 1))
+)
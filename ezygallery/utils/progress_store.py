@@ -0,0 +1,71 @@
+"""In-memory, per-job progress store with blocking waits.
+
+Replaces the single ``logs/analysis_status.json`` file that every job used to
+overwrite. Each job publishes to its own key. Readers in the same process get
+the latest state without touching disk and can block until it changes, which
+backs the long-poll and SSE endpoints. Every entry carries a ``version``
+(milliseconds since the epoch). Jobs running in another gunicorn worker fall
+back to the matching ``updated_at`` on the job row, so the ordering is the
+same for both sources.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+Entry = Tuple[int, dict]
+
+TERMINAL_STATES = {"done", "failed"}
+
+
+class ProgressStore:
+    """Thread-safe map of ``key -> (version, state)`` with change notification."""
+
+    def __init__(self, ttl: float = 3600.0) -> None:
+        self.ttl = ttl
+        self._cond = threading.Condition()
+        self._items: Dict[str, Tuple[int, dict, float]] = {}
+
+    def publish(self, key: str, state: dict) -> int:
+        """Store ``state`` for ``key``, wake any waiters and return its version."""
+        now = time.time()
+        with self._cond:
+            previous = self._items.get(key)
+            version = max(int(now * 1000), previous[0] + 1 if previous else 0)
+            self._items[key] = (version, dict(state), now + self.ttl)
+            self._prune(now)
+            self._cond.notify_all()
+        return version
+
+    def get(self, key: str) -> Optional[Entry]:
+        """Return ``(version, state)`` for ``key`` or ``None`` if unknown here."""
+        with self._cond:
+            item = self._items.get(key)
+            return (item[0], dict(item[1])) if item else None
+
+    def wait(self, key: str, since: int, timeout: float) -> Optional[Entry]:
+        """Block until ``key`` has a version newer than ``since`` or ``timeout``.
+
+        Returns the current entry either way (``None`` if the key is unknown).
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                item = self._items.get(key)
+                if item and item[0] > since:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return (item[0], dict(item[1])) if item else None
+
+    def _prune(self, now: float) -> None:
+        expired = [k for k, (_, _, exp) in self._items.items() if exp < now]
+        for key in expired:
+            del self._items[key]
+
+
+progress_store = ProgressStore()
@@ -0,0 +1,258 @@
+"""Visual similarity search over processed and finalised artworks.
+
+Each listing is reduced to a 64-bit pHash and a 48-bin RGB colour histogram.
+The pHash is the one :mod:`utils.content_index` already stores for the
+listing's folder in ``content_hashes``, so the two never disagree and
+deleted folders drop out with their rows. Histograms come from the listing's
+THUMB derivative (ANALYSE or the artwork itself when no thumb exists). The
+library is held as three NumPy arrays (folder names, ``uint64`` hashes and
+``float32`` histograms), so a query is a single vectorised XOR/popcount plus
+a histogram intersection rather than a loop over files.
+
+The arrays are rebuilt by the ``similarity-refresh`` job, which
+:func:`utils.job_queue.every` runs every ``SIMILARITY_REFRESH_SECONDS``
+across all processes. It only recomputes histograms whose source file
+changed, then writes ``SIMILARITY_INDEX_PATH`` (``.npz``) atomically.
+Requests never fingerprint anything. They reload the snapshot when its
+mtime changes, which costs one ``stat`` per query.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from config import (
+    FILENAME_TEMPLATES,
+    SIMILARITY_INDEX_PATH,
+    SIMILARITY_REFRESH_SECONDS,
+)
+from models import db, ContentHash
+from utils import job_queue
+from utils.image_hash import phash, hamming, to_unsigned
+from utils.listing_index import listing_index, PROCESSED, FINALISED
+
+logger = logging.getLogger(__name__)
+
+HIST_BINS = 16
+REFRESH_KIND = "similarity-refresh"
+
+
+def colour_histogram(img: Image.Image) -> np.ndarray:
+    """Return an L1-normalised ``3 * HIST_BINS`` RGB histogram of ``img``."""
+    small = img.convert("RGB")
+    small.thumbnail((128, 128))
+    pixels = np.asarray(small, dtype=np.uint8).reshape(-1, 3) >> 4
+    hist = np.concatenate(
+        [np.bincount(pixels[:, c], minlength=HIST_BINS) for c in range(3)]
+    ).astype(np.float32)
+    return hist / max(hist.sum(), 1.0)
+
+
+def _source_image(folder: Path, seo_folder: str) -> Optional[Path]:
+    for key in ("thumbnail", "analyse", "artwork"):
+        path = folder / FILENAME_TEMPLATES[key].format(seo_slug=seo_folder)
+        if path.exists():
+            return path
+    return None
+
+
+class SimilarityIndex:
+    """pHash + colour histogram arrays for the artwork library."""
+
+    def __init__(self, snapshot: Path) -> None:
+        self.snapshot = snapshot
+        self._lock = threading.RLock()
+        self._loaded_mtime: Optional[int] = None
+        self.folders = np.array([], dtype=object)
+        self.mtimes = np.array([], dtype=np.float64)
+        self.hashes = np.array([], dtype=np.uint64)
+        self.hists = np.zeros((0, 3 * HIST_BINS), dtype=np.float32)
+
+    # --- persistence -----------------------------------------------------
+
+    def reload(self) -> None:
+        """Load the snapshot if it changed since this process last read it."""
+        try:
+            mtime = self.snapshot.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._loaded_mtime:
+            return
+        with self._lock:
+            if mtime == self._loaded_mtime:
+                return
+            try:
+                with np.load(self.snapshot, allow_pickle=False) as data:
+                    self.folders = data["folders"].astype(object)
+                    self.mtimes = data["mtimes"]
+                    self.hashes = data["hashes"]
+                    self.hists = data["hists"]
+            except Exception as exc:  # noqa: BLE001 - the next refresh rewrites it
+                logger.warning("Ignoring unreadable similarity snapshot: %s", exc)
+            self._loaded_mtime = mtime
+
+    def _save(self, arrays: Dict[str, np.ndarray]) -> None:
+        self.snapshot.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.snapshot.parent, suffix=".npz")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                np.savez(fh, **{**arrays, "folders": arrays["folders"].astype(str)})
+            os.replace(tmp, self.snapshot)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        self._loaded_mtime = self.snapshot.stat().st_mtime_ns
+
+    # --- maintenance -----------------------------------------------------
+
+    def rebuild(self) -> dict:
+        """Sync with ``content_hashes``; recompute only changed histograms.
+
+        Runs inside the ``similarity-refresh`` job (needs an app context).
+        """
+        hashes: Dict[str, int] = {
+            folder: to_unsigned(value)
+            for folder, value in db.session.query(ContentHash.seo_folder, ContentHash.phash)
+            .filter(ContentHash.seo_folder.isnot(None))
+            .order_by(ContentHash.id)
+        }
+        self.reload()
+        with self._lock:
+            old = {
+                "folders": self.folders,
+                "mtimes": self.mtimes,
+                "hashes": self.hashes,
+                "hists": self.hists,
+            }
+        # Images are opened and hashed without the lock so queries in this
+        # process are not held up; the finished arrays are swapped in below.
+        previous = {name: i for i, name in enumerate(old["folders"])}
+        folders, mtimes, values, hists = [], [], [], []
+        seen = set()
+        computed = 0
+        for rec in listing_index.records(PROCESSED) + listing_index.records(FINALISED):
+            name = rec.seo_folder
+            if name not in hashes or name in seen:
+                continue
+            source = _source_image(rec.folder, name)
+            if source is None:
+                continue
+            try:
+                mtime = source.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            idx = previous.get(name)
+            if idx is not None and old["mtimes"][idx] == mtime:
+                hist = old["hists"][idx]
+            else:
+                try:
+                    with Image.open(source) as img:
+                        hist = colour_histogram(img)
+                except Exception as exc:  # noqa: BLE001
+                    logger.warning("Could not index %s: %s", source, exc)
+                    continue
+                computed += 1
+            seen.add(name)
+            folders.append(name)
+            mtimes.append(mtime)
+            values.append(hashes[name])
+            hists.append(hist)
+
+        new = {
+            "folders": np.array(folders, dtype=object),
+            "mtimes": np.array(mtimes, dtype=np.float64),
+            "hashes": np.array(values, dtype=np.uint64),
+            "hists": (
+                np.vstack(hists).astype(np.float32)
+                if hists
+                else np.zeros((0, 3 * HIST_BINS), dtype=np.float32)
+            ),
+        }
+        # Renames, swapped listings and changed pHashes keep the count the
+        # same, so compare the arrays themselves before skipping the save.
+        changed = computed or not all(
+            np.array_equal(new[key], old[key]) for key in ("folders", "mtimes", "hashes")
+        )
+        with self._lock:
+            self.folders = new["folders"]
+            self.mtimes = new["mtimes"]
+            self.hashes = new["hashes"]
+            self.hists = new["hists"]
+        if changed:
+            self._save(new)
+        return {"indexed": len(folders), "computed": computed, "saved": bool(changed)}
+
+    # --- queries ---------------------------------------------------------
+
+    def query(
+        self,
+        value: int,
+        hist: Optional[np.ndarray] = None,
+        limit: int = 20,
+        max_distance: int = 64,
+        exclude: str | None = None,
+    ) -> List[dict]:
+        """Return the closest artworks to a pHash (and optional histogram).
+
+        Results are ordered by Hamming distance, then by colour similarity
+        (histogram intersection, 1.0 = identical palettes).
+        """
+        self.reload()
+        with self._lock:
+            folders, hashes, hists = self.folders, self.hashes, self.hists
+        if not len(folders):
+            return []
+        distances = hamming(hashes, value)
+        colour = (
+            np.minimum(hists, hist).sum(axis=1)
+            if hist is not None
+            else np.zeros(len(folders), dtype=np.float32)
+        )
+        keep = distances <= max_distance
+        if exclude is not None:
+            keep &= folders != exclude
+        idx = np.flatnonzero(keep)
+        order = idx[np.lexsort((-colour[idx], distances[idx]))][:limit]
+        return [
+            {
+                "seo_folder": str(folders[i]),
+                "distance": int(distances[i]),
+                "colour_similarity": round(float(colour[i]), 4),
+            }
+            for i in order
+        ]
+
+    def query_folder(self, seo_folder: str, **kwargs) -> List[dict]:
+        """Find artworks similar to an indexed listing."""
+        self.reload()
+        with self._lock:
+            matches = np.flatnonzero(self.folders == seo_folder)
+            if not len(matches):
+                raise KeyError(seo_folder)
+            i = matches[0]
+            value, hist = int(self.hashes[i]), self.hists[i]
+        return self.query(value, hist, exclude=seo_folder, **kwargs)
+
+    def query_image(self, img: Image.Image, **kwargs) -> List[dict]:
+        """Find artworks similar to an arbitrary image."""
+        return self.query(phash(img), colour_histogram(img), **kwargs)
+
+
+similarity_index = SimilarityIndex(SIMILARITY_INDEX_PATH)
+
+
+@job_queue.register(REFRESH_KIND)
+def refresh_similarity_index(job_id: int, payload: dict, progress) -> dict:
+    """Rebuild the similarity snapshot from ``content_hashes``."""
+    return similarity_index.rebuild()
+
+
+job_queue.every(REFRESH_KIND, SIMILARITY_REFRESH_SECONDS)
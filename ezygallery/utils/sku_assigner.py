@@ -1,49 +1,191 @@
 # === [ ART Narrator: SKU Assigner ] ====================================
 # File: utils/sku_assigner.py  (or wherever fits your project layout)
+"""Sequential SKU allocation shared by every worker process.
 
+The tracker used to be guarded by a ``threading.Lock`` only, so two gunicorn
+workers finalising at the same time could read the same ``last_sku`` and
+hand out one SKU twice. Allocation now holds an exclusive ``flock`` on a
+sidecar ``<tracker>.lock`` file. The tracker itself is rewritten through a
+temporary file that is fsynced and then ``os.replace``d over it, so readers
+never see a half-written file and a crash cannot lose a committed bump.
+
+Each process reserves ``SKU_LEASE_SIZE`` numbers at a time and hands them out
+from memory, so only one allocation per block touches the tracker. At exit,
+unused numbers are returned. Numbers at the end of the sequence roll
+``last_sku`` back; others go to a ``free`` list that later leases draw from
+first. With the default lease size of 1, SKUs stay strictly sequential and
+gap-free. Larger leases trade that for fewer tracker writes; a crashed
+process can leave gaps of up to one lease.
+
+Tracker format: ``{"last_sku": 122, "free": [[118, 119]]}``. The ``free``
+key is optional, so older trackers load unchanged.
+"""
+
+import atexit
+import contextlib
+import fcntl
 import json
-from pathlib import Path
+import logging
+import os
+import tempfile
 import threading
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Tuple
+
+from config import SKU_LEASE_SIZE
+
+logger = logging.getLogger(__name__)
 
 SKU_PREFIX = "RJC-"
 SKU_DIGITS = 4  # e.g., 0122 for 122
 
-_LOCK = threading.Lock()  # for thread/process safety
+_LOCK = threading.Lock()  # serialises threads; flock serialises processes
+# tracker path -> (owning pid, reserved [first, last] ranges)
+_LEASES: Dict[Path, Tuple[int, Deque[List[int]]]] = {}
+
+
+def _format(num: int) -> str:
+    return f"{SKU_PREFIX}{num:0{SKU_DIGITS}d}"
+
+
+@contextlib.contextmanager
+def _locked(tracker_path: Path):
+    """Hold the cross-process tracker lock for the duration of the block."""
+    lock_path = tracker_path.with_name(tracker_path.name + ".lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        yield
+
+
+def _read(tracker_path: Path) -> dict:
+    if not tracker_path.exists():
+        return {"last_sku": 0, "free": []}
+    with open(tracker_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return {
+        "last_sku": int(data.get("last_sku", 0)),
+        "free": [[int(a), int(b)] for a, b in data.get("free", [])],
+    }
+
+
+def _write(tracker_path: Path, data: dict) -> None:
+    payload = {"last_sku": data["last_sku"]}
+    if data["free"]:
+        payload["free"] = data["free"]
+    fd, tmp = tempfile.mkstemp(dir=tracker_path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, tracker_path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def _reserve(tracker_path: Path, count: int) -> Deque[List[int]]:
+    """Move ``count`` numbers from the tracker into a new local lease."""
+    lease: Deque[List[int]] = deque()
+    with _locked(tracker_path):
+        data = _read(tracker_path)
+        free = sorted(data["free"])
+        while count and free:
+            first, last = free[0]
+            take = min(count, last - first + 1)
+            lease.append([first, first + take - 1])
+            count -= take
+            if first + take > last:
+                free.pop(0)
+            else:
+                free[0][0] = first + take
+        if count:
+            lease.append([data["last_sku"] + 1, data["last_sku"] + count])
+            data["last_sku"] += count
+        data["free"] = free
+        _write(tracker_path, data)
+    return lease
+
+
+def _release(tracker_path: Path, ranges: Deque[List[int]]) -> None:
+    """Return unused leased numbers to the tracker."""
+    with _locked(tracker_path):
+        data = _read(tracker_path)
+        pending = sorted(data["free"] + [list(r) for r in ranges])
+        free: List[List[int]] = []
+        for first, last in pending:
+            if free and first <= free[-1][1] + 1:
+                free[-1][1] = max(free[-1][1], last)
+            else:
+                free.append([first, last])
+        if free and free[-1][1] >= data["last_sku"]:
+            data["last_sku"] = min(data["last_sku"], free[-1][0] - 1)
+            free.pop()
+        data["free"] = free
+        _write(tracker_path, data)
+
+
+def _lease_for(tracker_path: Path) -> Deque[List[int]]:
+    """Return this process's lease for ``tracker_path`` (caller holds ``_LOCK``)."""
+    pid = os.getpid()
+    owner, ranges = _LEASES.get(tracker_path, (None, None))
+    if owner != pid:  # nothing reserved yet, or inherited across a fork
+        ranges = deque()
+        _LEASES[tracker_path] = (pid, ranges)
+    return ranges
+
 
 def get_next_sku(tracker_path: Path) -> str:
-    """Safely increment and return the next sequential SKU."""
-    print("[SKU DEBUG] Using tracker file:", tracker_path)
+    """Safely allocate and return the next sequential SKU."""
+    tracker_path = Path(tracker_path).resolve()
     with _LOCK:
-        # 1. Load or create tracker file
-        if tracker_path.exists():
-            with open(tracker_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                last_sku = int(data.get("last_sku", 0))
+        ranges = _lease_for(tracker_path)
+        if not ranges:
+            ranges.extend(_reserve(tracker_path, max(SKU_LEASE_SIZE, 1)))
+        first, last = ranges[0]
+        if first == last:
+            ranges.popleft()
         else:
-            last_sku = 0
+            ranges[0][0] = first + 1
+    logger.debug("Allocated SKU %s from %s", _format(first), tracker_path)
+    return _format(first)
+
 
-        # 2. Increment
-        next_sku_num = last_sku + 1
-        next_sku_str = f"{SKU_PREFIX}{next_sku_num:0{SKU_DIGITS}d}"
+def unallocated(tracker_path: Path) -> Tuple[int, List[List[int]]]:
+    """Return ``(last_sku, free ranges)`` as currently stored in the tracker.
 
-        # 3. Write back to tracker
-        data = {"last_sku": next_sku_num}
-        with open(tracker_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+    Numbers in the free ranges were leased and returned unused, so they are
+    expected holes in the sequence, not lost SKUs.
+    """
+    data = _read(Path(tracker_path))
+    return data["last_sku"], data["free"]
 
-        return next_sku_str
 
 def peek_next_sku(tracker_path: Path) -> str:
     """Return what the next SKU would be without incrementing."""
-    print("[SKU DEBUG] Peeking tracker file:", tracker_path)
-    if tracker_path.exists():
-        with open(tracker_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            last_sku = int(data.get("last_sku", 0))
-    else:
-        last_sku = 0
-
-    next_sku_num = last_sku + 1
-    next_sku_str = f"{SKU_PREFIX}{next_sku_num:0{SKU_DIGITS}d}"
-    return next_sku_str
+    tracker_path = Path(tracker_path).resolve()
+    with _LOCK:
+        ranges = _lease_for(tracker_path)
+        if ranges:
+            return _format(ranges[0][0])
+    data = _read(tracker_path)
+    if data["free"]:
+        return _format(min(first for first, _ in data["free"]))
+    return _format(data["last_sku"] + 1)
+
 
+@atexit.register
+def release_leases() -> None:
+    """Give this process's unused SKUs back to their trackers."""
+    pid = os.getpid()
+    with _LOCK:
+        for tracker_path, (owner, ranges) in list(_LEASES.items()):
+            if owner != pid or not ranges:
+                continue
+            try:
+                _release(tracker_path, ranges)
+                ranges.clear()
+            except Exception as exc:  # noqa: BLE001 - best effort at shutdown
+                logger.warning("Could not release SKUs to %s: %s", tracker_path, exc)
@@ -0,0 +1,88 @@
+"""SQLAlchemy engine construction with explicit SQLite settings.
+
+The pieces of :mod:`utils.db_engine` that do not depend on the gallery's
+``config``. Every setting is passed in as an :class:`EngineSettings`, so the
+storefront (``models/engine.py``) imports this module as
+``ezygallery.utils.sqlite_engine`` and supplies its own values, while
+:mod:`utils.db_engine` binds it to the gallery's config.
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+import sqlite3
+from dataclasses import dataclass
+
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool
+
+
+@dataclass(frozen=True)
+class EngineSettings:
+    """Connection pragmas and pool sizing for one engine."""
+
+    busy_timeout_ms: int = 5000
+    synchronous: str = "NORMAL"
+    mmap_mb: int = 64
+    pool_size: int = 5
+    pool_overflow: int = 10
+    pool_timeout: float = 30.0
+
+
+def is_file_sqlite(uri: str) -> bool:
+    url = make_url(uri)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+def engine_options(uri: str, settings: EngineSettings) -> dict:
+    """Return ``create_engine`` keyword arguments for ``uri``."""
+    if not is_file_sqlite(uri):
+        return {}
+    return {
+        "poolclass": QueuePool,
+        "pool_size": settings.pool_size,
+        "max_overflow": settings.pool_overflow,
+        "pool_timeout": settings.pool_timeout,
+        "connect_args": {
+            "timeout": settings.busy_timeout_ms / 1000,
+            "check_same_thread": False,
+        },
+    }
+
+
+def configure(engine: Engine, settings: EngineSettings) -> Engine:
+    """Apply ``settings`` to every new connection ``engine`` opens."""
+    event.listen(engine, "connect", functools.partial(_on_connect, settings))
+    event.listen(engine, "checkout", _on_checkout)
+    return engine
+
+
+def create_engine_for(uri: str, settings: EngineSettings) -> Engine:
+    """Create a configured engine for ``uri``."""
+    return configure(create_engine(uri, **engine_options(uri, settings)), settings)
+
+
+def _on_connect(settings: EngineSettings, dbapi_connection, connection_record) -> None:
+    connection_record.info["pid"] = os.getpid()
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={settings.synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.busy_timeout_ms)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.mmap_mb) * 1024 * 1024}")
+    finally:
+        cursor.close()
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+    pid = os.getpid()
+    if connection_record.info.get("pid") != pid:
+        connection_record.dbapi_connection = connection_proxy.dbapi_connection = None
+        raise exc.DisconnectionError(
+            f"Connection opened by pid {connection_record.info.get('pid')} "
+            f"checked out in pid {pid}"
+        )
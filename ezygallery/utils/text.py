@@ -0,0 +1,12 @@
+"""Small text helpers shared by the ``utils`` modules and the routes."""
+
+from __future__ import annotations
+
+import re
+
+
+def slugify(text: str) -> str:
+    """Return a slug suitable for filenames."""
+    text = re.sub(r"[^\w\- ]+", "", text)
+    text = text.strip().replace(" ", "-")
+    return re.sub("-+", "-", text).lower()
@@ -0,0 +1,270 @@
+"""Streaming ingest for uploaded artwork files.
+
+Uploads used to be read fully into memory with ``file_storage.read()``, then
+copied into a ``BytesIO`` for verification and written out again, so a batch
+of 32MB files pushed worker RSS into the hundreds of MB. :func:`spool_upload`
+copies the request stream to disk in fixed-size chunks instead and aborts as
+soon as ``MAX_UPLOAD_SIZE_MB`` is exceeded; :func:`verify_image` then checks
+the spooled file without holding its bytes in memory.
+
+:func:`build_derivatives` then produces everything the analysis step needs
+from a single decode: the thumbnail, the analyse JPEG, the aspect ratio and
+the QC metadata, plus the perceptual hashes used for duplicate detection.
+JPEG originals are decoded with ``draft()`` so libjpeg
+scales them down by 1/2, 1/4 or 1/8 during decoding when the analyse size
+allows it. The outputs are written concurrently. The analyse JPEG is sized
+to ``ANALYSE_MAX_MB`` by :func:`encode_jpeg_within`, which searches quality
+in memory and writes the chosen encoding to disk once.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import datetime
+import io
+import json
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Optional, Sequence
+
+from PIL import Image
+
+from config import (
+    UPLOAD_CHUNK_SIZE,
+    ANALYSE_MAX_DIM,
+    ANALYSE_MAX_MB,
+    THUMB_WIDTH,
+    THUMB_HEIGHT,
+    DERIVATIVE_WRITERS,
+)
+from utils.image_hash import dhash, phash
+
+_writer: Optional[ThreadPoolExecutor] = None
+_writer_lock = threading.Lock()
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured size limit mid-stream."""
+
+    def __init__(self, size: int) -> None:
+        super().__init__(f"Upload exceeds limit after {size} bytes")
+        self.size = size
+
+
+def spool_upload(
+    stream: BinaryIO,
+    dest: Path,
+    max_bytes: int,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+    digest=None,
+) -> int:
+    """Copy ``stream`` to ``dest`` in chunks and return the number of bytes.
+
+    The data lands in ``<dest>.part`` and is renamed into place only once it
+    is complete, so a rejected or broken upload never leaves a file at
+    ``dest``. Raises :class:`UploadTooLarge` past ``max_bytes``. Chunks are
+    also fed to ``digest`` (a :mod:`hashlib` object) when given.
+    """
+    part = dest.with_name(dest.name + ".part")
+    size = 0
+    try:
+        with open(part, "wb") as fh:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(size)
+                fh.write(chunk)
+                if digest is not None:
+                    digest.update(chunk)
+        os.replace(part, dest)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            part.unlink()
+        raise
+    return size
+
+
+def verify_image(path: Path) -> bool:
+    """Return ``True`` if ``path`` holds a structurally valid image."""
+    try:
+        with Image.open(path) as im:
+            im.verify()
+    except Exception:  # noqa: BLE001 - PIL raises many types for bad files
+        return False
+    return True
+
+
+@dataclass
+class Derivatives:
+    """Outputs of :func:`build_derivatives` for one upload."""
+
+    width: int
+    height: int
+    aspect: str
+    thumb_path: Path
+    analyse_path: Path
+    qc_path: Path
+    qc: dict
+    dhash: int
+    phash: int
+
+
+def _get_writer() -> ThreadPoolExecutor:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ThreadPoolExecutor(
+                max_workers=DERIVATIVE_WRITERS, thread_name_prefix="derivative"
+            )
+        return _writer
+
+
+def encode_jpeg_within(
+    img: Image.Image,
+    max_bytes: int,
+    q_max: int = 85,
+    q_min: int = 60,
+    max_steps: int = 2,
+) -> bytes:
+    """Return ``img`` as JPEG bytes at a high quality within ``max_bytes``.
+
+    Encodes into memory only. ``q_max`` is tried first; if it is too big the
+    limit is bracketed between ``q_min`` and ``q_max`` and at most
+    ``max_steps`` further qualities are tried, each predicted by interpolating
+    the bracket's encoded sizes. The best encoding that fits is returned, so a
+    call costs at most ``max_steps + 2`` encodes (the old loop needed up to
+    six) and lands within a few quality points of the best fit. If even
+    ``q_min`` is too big its encoding is returned, matching the old loop's
+    floor.
+    """
+    sizes: dict[int, bytes] = {}
+
+    def encode(q: int) -> bytes:
+        if q not in sizes:
+            buf = io.BytesIO()
+            img.save(buf, "JPEG", quality=q, optimize=True)
+            sizes[q] = buf.getvalue()
+        return sizes[q]
+
+    if len(encode(q_max)) <= max_bytes:
+        return sizes[q_max]
+    if q_min >= q_max or len(encode(q_min)) > max_bytes:
+        return encode(q_min)
+    lo, hi = q_min, q_max  # lo fits, hi does not
+    for _ in range(max_steps):
+        if hi - lo <= 1:
+            break
+        s_lo, s_hi = len(sizes[lo]), len(sizes[hi])
+        guess = lo + round((max_bytes - s_lo) * (hi - lo) / max(s_hi - s_lo, 1))
+        q = min(max(guess, lo + 1), hi - 1)
+        if len(encode(q)) <= max_bytes:
+            lo = q
+        else:
+            hi = q
+    return sizes[lo]
+
+
+def _save_analyse(img: Image.Image, path: Path) -> None:
+    path.write_bytes(encode_jpeg_within(img, ANALYSE_MAX_MB * 1024 * 1024))
+
+
+def _decode_for_analyse(path: Path) -> tuple[int, int, Image.Image]:
+    """Decode ``path`` once at (at least) the analyse size.
+
+    Returns the original dimensions and an RGB image whose long edge is at
+    most ``ANALYSE_MAX_DIM``.
+    """
+    with Image.open(path) as img:
+        width, height = img.size
+        scale = min(1.0, ANALYSE_MAX_DIM / max(width, height))
+        target = (max(1, int(width * scale)), max(1, int(height * scale)))
+        if img.format == "JPEG" and scale < 1.0:
+            # Let libjpeg reduce by a power of two, never below the target.
+            img.draft("RGB", (math.ceil(width * scale), math.ceil(height * scale)))
+        img.load()
+        frame = img if img.size == target else img.resize(target, Image.LANCZOS)
+        return width, height, frame.convert("RGB")
+
+
+_A_SERIES = math.sqrt(2)
+
+
+def _label_ratio(label: str) -> Optional[float]:
+    """Width/height ratio of an aspect label such as ``4x5``, else None."""
+    if label == "A-Series-Vertical":
+        return 1 / _A_SERIES
+    if label == "A-Series-Horizontal":
+        return _A_SERIES
+    w, sep, h = label.partition("x")
+    if sep and w.isdigit() and h.isdigit() and int(w) and int(h):
+        return int(w) / int(h)
+    return None
+
+
+def aspect_label(width: int, height: int, labels: Sequence[str]) -> str:
+    """Return the label in ``labels`` closest to ``width`` x ``height``.
+
+    Closeness is measured on the log of the ratio, so 2x3 and 3x2 are as far
+    from 1x1 as each other. Without a usable label the reduced ratio is
+    returned, e.g. ``"3x2"``.
+    """
+    target = math.log(width / height)
+    best, best_gap = None, math.inf
+    for label in labels:
+        ratio = _label_ratio(label)
+        if ratio is None:
+            continue
+        gap = abs(math.log(ratio) - target)
+        if gap < best_gap:
+            best, best_gap = label, gap
+    if best is not None:
+        return best
+    g = math.gcd(width, height)
+    return f"{width // g}x{height // g}"
+
+
+def build_derivatives(
+    orig_path: Path,
+    base: str,
+    out_dir: Path,
+    aspect_labels: Sequence[str],
+    qc_extra: dict,
+) -> Derivatives:
+    """Create THUMB, ANALYSE and QC files for ``orig_path`` in one pass.
+
+    The aspect ratio is the entry of ``aspect_labels`` nearest to the decoded
+    dimensions (see :func:`aspect_label`), so the original is never opened a
+    second time; ``qc_extra`` is merged into the QC metadata.
+    """
+    width, height, analyse = _decode_for_analyse(orig_path)
+    aspect = aspect_label(width, height, aspect_labels)
+    thumb = analyse.copy()
+    thumb.thumbnail((THUMB_WIDTH, THUMB_HEIGHT))
+    hashes = (dhash(thumb), phash(thumb))
+
+    thumb_path = out_dir / f"{base}-thumb.jpg"
+    analyse_path = out_dir / f"{base}-analyse.jpg"
+    qc_path = out_dir / f"{base}.qc.json"
+
+    writer = _get_writer()
+    thumb_job = writer.submit(thumb.save, thumb_path, "JPEG", quality=80)
+    analyse_job = writer.submit(_save_analyse, analyse, analyse_path)
+    qc = {
+        **qc_extra,
+        "image_shape": [width, height],
+        "aspect_ratio": aspect,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    qc_path.write_text(json.dumps(qc, indent=2))
+    thumb_job.result()
+    analyse_job.result()
+    return Derivatives(
+        width, height, aspect, thumb_path, analyse_path, qc_path, qc, *hashes
+    )
@@ -0,0 +1,235 @@
+"""Resumable chunked upload sessions stored on disk.
+
+A single multipart POST has to be restarted from zero when the connection
+drops, and the worker buffers the whole body. Clients instead open a session
+with the file name and size, ``PUT`` fixed-size chunks (in any order and in
+parallel) and finally complete the session, which hands the assembled file to
+the normal upload QC stage.
+
+Each session is a directory under ``UPLOAD_SESSIONS_DIR`` holding
+``meta.json`` and a ``data`` file preallocated to the final size. Chunks are
+written at their offset with ``os.pwrite`` so parallel chunks never contend;
+only the ``received`` list in ``meta.json`` is updated under an ``flock``.
+Because all state is on disk, any gunicorn worker can serve any chunk and a
+client can resume by asking which chunks are still missing.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+from config import (
+    UPLOAD_SESSIONS_DIR,
+    UPLOAD_SESSION_CHUNK_MB,
+    UPLOAD_SESSION_TTL_SECONDS,
+    UPLOAD_SESSIONS_PER_USER,
+    UPLOAD_CHUNK_SIZE,
+)
+
+_SESSION_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class UploadSessionError(ValueError):
+    """Raised for requests that do not fit the session (bad index, size...)."""
+
+
+class TooManySessions(UploadSessionError):
+    """Raised when an owner already has ``UPLOAD_SESSIONS_PER_USER`` open."""
+
+
+def _session_dir(session_id: str) -> Path:
+    if not _SESSION_ID.match(session_id or ""):
+        raise FileNotFoundError(session_id)
+    path = UPLOAD_SESSIONS_DIR / session_id
+    if not (path / "meta.json").exists():
+        raise FileNotFoundError(session_id)
+    return path
+
+
+@contextmanager
+def _locked_meta(folder: Path) -> Iterator[dict]:
+    """Yield the session metadata under an exclusive lock and save it after."""
+    with open(folder / "meta.json", "r+", encoding="utf-8") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            meta = json.load(fh)
+            yield meta
+            fh.seek(0)
+            fh.truncate()
+            json.dump(meta, fh)
+            fh.flush()
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _read_meta(folder: Path) -> dict:
+    with open(folder / "meta.json", "r", encoding="utf-8") as fh:
+        fcntl.flock(fh, fcntl.LOCK_SH)
+        try:
+            return json.load(fh)
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _status(session_id: str, meta: dict) -> dict:
+    received = set(meta["received"])
+    return {
+        "session_id": session_id,
+        "filename": meta["filename"],
+        "size": meta["size"],
+        "chunk_size": meta["chunk_size"],
+        "chunks": meta["chunks"],
+        "received": sorted(received),
+        "missing": [i for i in range(meta["chunks"]) if i not in received],
+    }
+
+
+def prune_expired(now: float | None = None) -> None:
+    """Remove sessions idle for longer than ``UPLOAD_SESSION_TTL_SECONDS``."""
+    if not UPLOAD_SESSIONS_DIR.exists():
+        return
+    cutoff = (now or time.time()) - UPLOAD_SESSION_TTL_SECONDS
+    for folder in UPLOAD_SESSIONS_DIR.iterdir():
+        try:
+            if folder.is_dir() and (folder / "meta.json").stat().st_mtime < cutoff:
+                shutil.rmtree(folder, ignore_errors=True)
+        except FileNotFoundError:
+            continue
+
+
+def _open_sessions(owner: str | None) -> int:
+    """Count sessions belonging to ``owner`` (caller holds the create lock)."""
+    count = 0
+    for meta_path in UPLOAD_SESSIONS_DIR.glob("*/meta.json"):
+        try:
+            if _read_meta(meta_path.parent)["owner"] == owner:
+                count += 1
+        except (FileNotFoundError, ValueError, KeyError):
+            continue
+    return count
+
+
+@contextmanager
+def _create_lock() -> Iterator[None]:
+    """Serialise session creation across workers so the per-user cap holds."""
+    UPLOAD_SESSIONS_DIR.mkdir(parents=True, exist_ok=True)
+    with open(UPLOAD_SESSIONS_DIR / ".create.lock", "a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        yield
+
+
+def create(filename: str, size: int, owner: str | None) -> dict:
+    """Open a new session for ``filename`` of ``size`` bytes.
+
+    Raises :class:`TooManySessions` once ``owner`` has
+    ``UPLOAD_SESSIONS_PER_USER`` sessions that are neither complete nor
+    expired.
+    """
+    if isinstance(size, bool) or not isinstance(size, int):
+        raise UploadSessionError("Missing size")
+    if size <= 0:
+        raise UploadSessionError("Empty file")
+    prune_expired()
+    chunk_size = int(UPLOAD_SESSION_CHUNK_MB * 1024 * 1024)
+    session_id = uuid.uuid4().hex
+    folder = UPLOAD_SESSIONS_DIR / session_id
+    meta = {
+        "filename": filename,
+        "size": size,
+        "chunk_size": chunk_size,
+        "chunks": -(-size // chunk_size),
+        "owner": owner,
+        "received": [],
+        "created": time.time(),
+    }
+    with _create_lock():
+        if _open_sessions(owner) >= UPLOAD_SESSIONS_PER_USER:
+            raise TooManySessions(
+                f"Too many open uploads (limit {UPLOAD_SESSIONS_PER_USER})"
+            )
+        folder.mkdir(parents=True)
+        with open(folder / "data", "wb") as fh:
+            fh.truncate(size)
+        (folder / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+    return _status(session_id, meta)
+
+
+def status(session_id: str, owner: str | None) -> dict:
+    """Return the session state including the chunk indices still missing."""
+    folder = _session_dir(session_id)
+    meta = _read_meta(folder)
+    if meta["owner"] != owner:
+        raise FileNotFoundError(session_id)
+    return _status(session_id, meta)
+
+
+def write_chunk(session_id: str, index: int, stream: BinaryIO, owner: str | None) -> dict:
+    """Write chunk ``index`` from ``stream`` at its offset in the data file.
+
+    The chunk must be exactly ``chunk_size`` bytes (the last one may be
+    shorter); anything else is rejected so a truncated request is retried
+    rather than recorded as received.
+    """
+    folder = _session_dir(session_id)
+    meta = _read_meta(folder)
+    if meta["owner"] != owner:
+        raise FileNotFoundError(session_id)
+    if index < 0 or index >= meta["chunks"]:
+        raise UploadSessionError("Chunk index out of range")
+    offset = index * meta["chunk_size"]
+    expected = min(meta["chunk_size"], meta["size"] - offset)
+
+    written = 0
+    fd = os.open(folder / "data", os.O_WRONLY)
+    try:
+        while written <= expected:
+            block = stream.read(min(UPLOAD_CHUNK_SIZE, expected + 1 - written))
+            if not block:
+                break
+            if written + len(block) > expected:
+                written += len(block)
+                break
+            os.pwrite(fd, block, offset + written)
+            written += len(block)
+    finally:
+        os.close(fd)
+
+    with _locked_meta(folder) as locked:
+        if written != expected:
+            # A failed re-send may have overwritten part of a good chunk.
+            if index in locked["received"]:
+                locked["received"].remove(index)
+        elif index not in locked["received"]:
+            locked["received"].append(index)
+        state = _status(session_id, locked)
+    if written > expected:
+        raise UploadSessionError("Chunk larger than expected")
+    if written != expected:
+        raise UploadSessionError(f"Chunk incomplete: {written}/{expected} bytes")
+    return state
+
+
+def assembled_file(session_id: str, owner: str | None) -> tuple[str, Path]:
+    """Return ``(filename, data_path)`` once every chunk has arrived."""
+    state = status(session_id, owner)
+    if state["missing"]:
+        raise UploadSessionError(f"{len(state['missing'])} chunk(s) missing")
+    return state["filename"], UPLOAD_SESSIONS_DIR / session_id / "data"
+
+
+def discard(session_id: str) -> None:
+    """Delete a session and its data."""
+    try:
+        folder = _session_dir(session_id)
+    except FileNotFoundError:
+        return
+    shutil.rmtree(folder, ignore_errors=True)
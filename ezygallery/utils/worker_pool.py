@@ -0,0 +1,169 @@
+"""Worker processes for CPU-heavy work, forked from a clean fork server.
+
+:mod:`utils.analysis_engine` and :mod:`utils.composites` used to fork their
+pools lazily from the web worker. By that time the worker already runs
+threads, such as the job queue and the DB log writer. A child forked while
+one of those threads holds a lock (a logging handler lock,
+``DBLogHandler._cond``, the allocator) inherits the lock held, and the child
+can hang on it forever.
+
+Every worker process now comes from multiprocessing's *forkserver*, which
+app.py launches through :func:`start` while booting. The server is a fresh,
+single-threaded interpreter (exec'd, not forked) that preloads
+:data:`PRELOAD`, and each worker is forked from it rather than from the web
+worker. Workers therefore start
+with NumPy, OpenCV, PIL and OpenAI already imported, and they never inherit
+the web worker's locks. Other modules add to :data:`PRELOAD` with
+:func:`preload` before :func:`start`; :mod:`utils.analysis_engine` adds
+:mod:`utils.analysis_warmup`, so the scripts, OpenAI clients and mockups are
+built once in the server rather than in every worker.
+
+* :func:`executor` returns a long-lived ``ProcessPoolExecutor`` per name,
+  for batches of short tasks such as composite slots.
+* :func:`run_isolated` runs one call in a process of its own. On timeout
+  only that process is killed, and no other caller's work is lost.
+
+Children re-import the parent's ``__main__`` while they start. Under
+gunicorn that is gunicorn's own guarded script. ``python app.py`` would boot
+a second copy of the app in every child, so app.py starts the pools disabled
+in that case. Callers catch :class:`PoolUnavailable` and fall back to a
+subprocess or to in-process work.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import forkserver
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Imported once in the fork server; every worker inherits them.
+PRELOAD = ["numpy", "cv2", "PIL.Image", "openai"]
+
+_ctx = multiprocessing.get_context("forkserver")
+_lock = threading.Lock()
+_enabled = False
+_executors: Dict[str, Tuple[int, ProcessPoolExecutor]] = {}
+
+
+class PoolUnavailable(RuntimeError):
+    """Raised when worker processes are disabled or cannot be started."""
+
+
+class WorkerCrashed(RuntimeError):
+    """Raised when a :func:`run_isolated` worker dies without a result."""
+
+    def __init__(self, exitcode: Optional[int]) -> None:
+        super().__init__(f"worker exited with code {exitcode} before returning")
+        self.exitcode = exitcode
+
+
+def preload(*modules: str) -> None:
+    """Have the fork server import ``modules``; only effective before :func:`start`."""
+    for name in modules:
+        if name not in PRELOAD:
+            PRELOAD.append(name)
+
+
+def start(enabled: bool = True) -> None:
+    """Launch the fork server, or disable worker pools for this process."""
+    global _enabled
+    _enabled = enabled
+    if not enabled:
+        logger.info("Worker pools disabled; using subprocess/in-process fallbacks")
+        return
+    _ctx.set_forkserver_preload(PRELOAD)
+    try:
+        forkserver.ensure_running()
+    except OSError as exc:
+        _enabled = False
+        logger.warning("Fork server unavailable, worker pools disabled: %s", exc)
+
+
+def _ensure() -> None:
+    if not _enabled:
+        raise PoolUnavailable("worker pools are disabled")
+    try:
+        forkserver.ensure_running()
+    except OSError as exc:
+        raise PoolUnavailable(str(exc)) from exc
+
+
+def executor(
+    name: str, max_workers: int, initializer: Optional[Callable[[], None]] = None
+) -> ProcessPoolExecutor:
+    """Return this process's long-lived pool called ``name``."""
+    _ensure()
+    pid = os.getpid()
+    with _lock:
+        owner, pool = _executors.get(name, (None, None))
+        if owner != pid or pool is None:
+            pool = ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=_ctx, initializer=initializer
+            )
+            _executors[name] = (pid, pool)
+        return pool
+
+
+def discard(name: str) -> None:
+    """Drop the pool called ``name`` so the next :func:`executor` call starts afresh."""
+    with _lock:
+        owner, pool = _executors.pop(name, (None, None))
+    if pool is not None and owner == os.getpid():
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _call(conn, func: Callable[..., Any], args: Sequence[Any]) -> None:
+    """Child side of :func:`run_isolated`: send back the result or the error."""
+    try:
+        outcome = (True, func(*args))
+    except BaseException as exc:  # noqa: BLE001 - reported to the parent
+        outcome = (False, exc)
+    try:
+        conn.send(outcome)
+    except Exception as exc:  # noqa: BLE001 - e.g. an unpicklable exception
+        conn.send((False, RuntimeError(f"{type(exc).__name__}: {exc}")))
+    finally:
+        conn.close()
+
+
+def run_isolated(func: Callable[..., Any], args: Sequence[Any], *, timeout: float) -> Any:
+    """Run ``func(*args)`` in a dedicated worker process and return its result.
+
+    Raises :class:`TimeoutError` after ``timeout`` seconds, once the worker
+    has been killed. Exceptions raised by ``func`` are re-raised here, and
+    :class:`WorkerCrashed` if the worker died first. :class:`PoolUnavailable`
+    means the worker never started, so ``func`` did not run at all.
+    """
+    _ensure()
+    receiver, sender = _ctx.Pipe(duplex=False)
+    proc = _ctx.Process(target=_call, args=(sender, func, list(args)), name="worker-pool-task")
+    try:
+        proc.start()
+    except OSError as exc:
+        receiver.close()
+        raise PoolUnavailable(str(exc)) from exc
+    finally:
+        sender.close()
+    finished = False
+    try:
+        if not receiver.poll(timeout):
+            raise TimeoutError(f"worker exceeded {timeout}s")
+        finished = True
+        ok, value = receiver.recv()
+    except EOFError:
+        ok, value = False, None
+    finally:
+        receiver.close()
+        proc.join(5 if finished else 0)
+        if proc.is_alive():
+            proc.kill()
+            proc.join()
+    if not ok:
+        raise value if value is not None else WorkerCrashed(proc.exitcode)
+    return value
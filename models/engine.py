@@ -0,0 +1,28 @@
+"""SQLite engine shared by the storefront routes and ``create_db``.
+
+Engines come from ``ezygallery/utils/sqlite_engine.py``, so the storefront
+gets the same pooled engine with WAL journaling, ``synchronous=NORMAL``, a
+busy timeout and memory-mapped reads as the gallery, and the two apps cannot
+drift apart. That module takes its settings as arguments and never imports
+the gallery's ``config``; they are read here from the same environment
+variables the gallery uses.
+"""
+import os
+
+from ezygallery.utils.sqlite_engine import EngineSettings, create_engine_for
+
+DB_URL = os.getenv('STOREFRONT_DATABASE_URI', 'sqlite:///app.db')
+
+SETTINGS = EngineSettings(
+    busy_timeout_ms=int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+    synchronous=os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL').upper(),
+    mmap_mb=int(os.getenv('SQLITE_MMAP_MB', '64')),
+    pool_size=int(os.getenv('DB_POOL_SIZE', '5')),
+    pool_overflow=int(os.getenv('DB_POOL_OVERFLOW', '10')),
+    pool_timeout=float(os.getenv('DB_POOL_TIMEOUT', '30')),
+)
+
+
+def sqlite_engine(url: str = DB_URL):
+    """Create a pooled engine for ``url`` with the shared SQLite pragmas."""
+    return create_engine_for(url, SETTINGS)
@@ -1,11 +1,11 @@
 from flask import Blueprint, render_template, abort
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from models.artwork import Artwork, Base
+from models.engine import sqlite_engine
 
 art_bp = Blueprint('art', __name__, url_prefix='/artwork')
 
-engine = create_engine('sqlite:///app.db')
+engine = sqlite_engine()
 Session = sessionmaker(bind=engine)
 
 @art_bp.route('/<seo_filename>')
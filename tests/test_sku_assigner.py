@@ -0,0 +1,44 @@
+"""Concurrent SKU allocation across processes must never repeat a SKU."""
+
+import multiprocessing
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "ezygallery"))
+
+from utils import sku_assigner  # noqa: E402
+
+PROCESSES = 8
+TASKS = 24
+PER_TASK = 25
+
+
+def _allocate(tracker: str, lease_size: int) -> list:
+    sku_assigner.SKU_LEASE_SIZE = lease_size
+    try:
+        return [sku_assigner.get_next_sku(Path(tracker)) for _ in range(PER_TASK)]
+    finally:
+        sku_assigner.release_leases()
+
+
+@pytest.mark.parametrize("lease_size", [1, 7])
+def test_concurrent_allocation_is_unique(tmp_path, lease_size):
+    tracker = tmp_path / "sku_tracker.json"
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(PROCESSES) as pool:
+        batches = pool.starmap(_allocate, [(str(tracker), lease_size)] * TASKS)
+
+    skus = [sku for batch in batches for sku in batch]
+    assert len(skus) == TASKS * PER_TASK
+    assert len(set(skus)) == len(skus)
+
+    # Every number up to last_sku is either allocated or back in the free list.
+    last, free = sku_assigner.unallocated(tracker)
+    returned = {n for first, end in free for n in range(first, end + 1)}
+    allocated = {int(sku[len(sku_assigner.SKU_PREFIX):]) for sku in skus}
+    assert allocated.isdisjoint(returned)
+    assert allocated | returned == set(range(1, last + 1))
+    if lease_size == 1:
+        assert allocated == set(range(1, len(skus) + 1))